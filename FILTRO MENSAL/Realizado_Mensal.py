@@ -1,85 +1,178 @@
-import os
+"""
+Filtro mensal do realizado (delta de produção).
+
+Remove do arquivo de produção do mês as produções cujo endereço já foi
+informado em exportações de referência (meses anteriores). Uso:
+
+    python Realizado_Mensal.py ALVO.json -r REF1.json [REF2.json ...] [-o SAIDA.json]
+
+Os endereços de cada arquivo de referência são extraídos uma única vez e
+guardados em um índice ao lado do arquivo (<nome>.indice-enderecos.json),
+reaproveitado nas execuções seguintes enquanto a referência não mudar.
+O arquivo alvo é lido contrato a contrato e a saída é gravada de forma
+compacta, sem carregar o JSON inteiro em memória.
+"""
+import argparse
 import json
+import os
+import sys
+
+# Permite reaproveitar a leitura incremental do pacote json_para_df
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_para_df.leitura_incremental import iterar_json
 
 # ================ CONFIGURAÇÃO ================
-PASTA_ENTRADA = "JSON 202509"
-CAMINHO_MAIO = os.path.join(PASTA_ENTRADA, "producao-exportacao-wbs-2025-08-11T17-30-52.json")
-CAMINHO_JUNHO = os.path.join(PASTA_ENTRADA, "producao-exportacao-wbs-2025-09-12T15-22-57.json")
-CAMINHO_SAIDA = os.path.join(PASTA_ENTRADA, "producao-2025-09-filtrado.json")
+SUFIXO_INDICE = ".indice-enderecos.json"
+# Caminho percorrido nas exportações: mes_ref -> producao (contratos) -> itens -> producao
+CAMINHO_CONTRATOS = {"producao": None}
+CAMINHO_PRODUCOES = {"producao": {"itens": {"producao": None}}}
 # ==============================================
 
-def carregar_enderecos(caminho_json):
+
+# ================ ÍNDICE DE ENDEREÇOS ================
+def caminho_indice(caminho_json, pasta_indices=None):
+    """
+    Caminho do índice de endereços de um arquivo de referência.
+    """
+    pasta = pasta_indices or os.path.dirname(os.path.abspath(caminho_json))
+    return os.path.join(pasta, os.path.basename(caminho_json) + SUFIXO_INDICE)
+
+
+def _assinatura(caminho_json):
+    info = os.stat(caminho_json)
+    return {"tamanho": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def extrair_enderecos(caminho_json):
+    """
+    Percorre o arquivo de referência e retorna o conjunto de endereços das produções.
+    """
+    enderecos = set()
+    for _, _, prod_item in iterar_json(caminho_json, CAMINHO_PRODUCOES):
+        endereco = prod_item.get("endereco") if isinstance(prod_item, dict) else None
+        if endereco:
+            enderecos.add(endereco)
+    return enderecos
+
+
+def carregar_enderecos(caminho_json, pasta_indices=None):
+    """
+    Retorna os endereços de referência, lendo do índice quando ele foi gerado
+    para a versão atual do arquivo; caso contrário extrai e grava o índice.
+    """
+    indice = caminho_indice(caminho_json, pasta_indices)
+    assinatura = _assinatura(caminho_json)
+
+    if os.path.exists(indice):
+        with open(indice, encoding="utf-8") as f:
+            dados = json.load(f)
+        if dados.get("origem") == assinatura:
+            print(f"Usando índice de endereços: {indice} ({len(dados['enderecos'])} endereços)")
+            return set(dados["enderecos"])
+
     print(f"Lendo endereços de referência em: {caminho_json}")
-    with open(caminho_json, encoding='utf-8') as f:
-        dados = json.load(f)
+    enderecos = extrair_enderecos(caminho_json)
+    temporario = indice + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump({"origem": assinatura, "enderecos": sorted(enderecos, key=str)}, f,
+                  ensure_ascii=False, separators=(",", ":"))
+    os.replace(temporario, indice)
+    print(f"Total de endereços únicos na referência: {len(enderecos)} (índice salvo em {indice})")
+    return enderecos
+
+
+def carregar_referencias(caminhos, pasta_indices=None):
+    """
+    União dos endereços de todos os arquivos de referência.
+    """
     enderecos = set()
-    for mes in dados:
-        for prod in mes.get("producao", []):
-            for item in prod.get("itens", []):
-                for prod_item in item.get("producao", []):
-                    endereco = prod_item.get("endereco")
-                    if endereco:
-                        enderecos.add(endereco)
-    print(f"Total de endereços únicos em maio: {len(enderecos)}")
+    for caminho in caminhos:
+        enderecos |= carregar_enderecos(caminho, pasta_indices)
     return enderecos
 
-def filtrar_json(caminho_junho, enderecos_maio):
-    print(f"Lendo arquivo de junho: {caminho_junho}")
-    with open(caminho_junho, encoding='utf-8') as f:
-        dados = json.load(f)
-
-    total_antes = sum(
-        len(item.get("producao", [])) 
-        for mes in dados 
-        for bloco in mes.get("producao", [])
-        for item in bloco.get("itens", [])
-    )
-
-    for mes in dados:
-        for prod in mes.get("producao", []):
-            for item in prod.get("itens", []):
-                if "producao" in item and isinstance(item["producao"], list):
-                    item["producao"] = [
-                        pr for pr in item["producao"]
-                        if pr.get("endereco") not in enderecos_maio
-                    ]
-            prod["itens"] = [
-                it for it in prod["itens"]
-                if not it.get("producao") or len(it["producao"]) > 0
+
+# ================ FILTRO ================
+def filtrar_contrato(prod, enderecos_referencia):
+    """
+    Remove das produções de cada item os endereços de referência. Os itens são
+    mantidos mesmo sem produções restantes; retorna (antes, depois).
+    """
+    antes = depois = 0
+    for item in prod.get("itens", []):
+        if "producao" in item and isinstance(item["producao"], list):
+            antes += len(item["producao"])
+            item["producao"] = [
+                pr for pr in item["producao"]
+                if pr.get("endereco") not in enderecos_referencia
             ]
-        mes["producao"] = [
-            pr for pr in mes.get("producao", [])
-            if pr.get("itens")
-        ]
-
-    dados_filtrados = [
-        m for m in dados
-        if m.get("producao")
-    ]
-
-    total_depois = sum(
-        len(item.get("producao", [])) 
-        for mes in dados_filtrados 
-        for bloco in mes.get("producao", [])
-        for item in bloco.get("itens", [])
-    )
+            depois += len(item["producao"])
+    return antes, depois
+
+
+def filtrar_json(caminho_alvo, enderecos_referencia, caminho_saida):
+    """
+    Lê o arquivo alvo contrato a contrato, filtra as produções e grava a saída.
+    Contratos sem itens e meses sem contratos são descartados.
+    """
+    print(f"Lendo arquivo alvo: {caminho_alvo}")
+    total_antes = total_depois = 0
+    mes_atual = None  # contexto do mês aberto na saída
+
+    with open(caminho_saida, "w", encoding="utf-8") as saida:
+        saida.write("[")
+        for _, contexto, prod in iterar_json(caminho_alvo, CAMINHO_CONTRATOS):
+            antes, depois = filtrar_contrato(prod, enderecos_referencia)
+            total_antes += antes
+            total_depois += depois
+            if not prod.get("itens"):
+                continue
+
+            # Cada mês tem o seu próprio dicionário de contexto
+            if contexto is not mes_atual:
+                if mes_atual is not None:
+                    saida.write("]},")
+                cabecalho = json.dumps(contexto, ensure_ascii=False, separators=(",", ":"))
+                saida.write(cabecalho[:-1] + ("," if contexto else "") + '"producao":[')
+                mes_atual = contexto
+            else:
+                saida.write(",")
+            json.dump(prod, saida, ensure_ascii=False, separators=(",", ":"))
+
+        if mes_atual is not None:
+            saida.write("]}")
+        saida.write("]")
 
     print(f"Total de produções ANTES do filtro: {total_antes}")
     print(f"Total de produções APÓS o filtro: {total_depois}")
     print(f"Total removido: {total_antes - total_depois}")
+    print(f"Arquivo final salvo em: {caminho_saida}")
+    return total_antes, total_depois
+
+
+# ================ EXECUÇÃO ================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Remove do JSON de produção as produções cujos endereços já constam nos arquivos de referência.")
+    parser.add_argument("alvo", help="Exportação de produção a ser filtrada.")
+    parser.add_argument("-r", "--referencia", nargs="+", required=True,
+                        help="Exportações de referência (meses anteriores).")
+    parser.add_argument("-o", "--saida",
+                        help="Arquivo de saída (padrão: <alvo>-filtrado.json).")
+    parser.add_argument("--indices",
+                        help="Pasta dos índices de endereços (padrão: a pasta de cada referência).")
+    return parser.parse_args(argv)
+
 
-    return dados_filtrados
+def main(argv=None):
+    args = parse_args(argv)
+    saida = args.saida or os.path.splitext(args.alvo)[0] + "-filtrado.json"
+    if args.indices:
+        os.makedirs(args.indices, exist_ok=True)
 
-def salvar_json(dados, caminho_saida):
-    print(f"Salvando resultado em: {caminho_saida}")
-    with open(caminho_saida, "w", encoding="utf-8") as f:
-        json.dump(dados, f, ensure_ascii=False, indent=2)
-    print("Arquivo final salvo com sucesso!")
+    enderecos_referencia = carregar_referencias(args.referencia, args.indices)
+    filtrar_json(args.alvo, enderecos_referencia, saida)
 
-def main():
-    enderecos_maio = carregar_enderecos(CAMINHO_MAIO)
-    dados_filtrados = filtrar_json(CAMINHO_JUNHO, enderecos_maio)
-    salvar_json(dados_filtrados, CAMINHO_SAIDA)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,7 +2,15 @@ import streamlit as st
 from json_para_df.planejado import process_planejado
 from json_para_df.previsto import process_previsto
 from json_para_df.producao import process_production
-import pandas as pd
+from json_para_df.consulta_erros import (LIMITE_MEMORIA_INDICES, TAMANHO_PAGINA, TTL_INDICES, CacheIndices,
+                                         IndiceErros)
+from json_para_df.saida_parquet import (TABELA_PLANEJADO, TABELAS_PREVISTO, TABELAS_PRODUCAO,
+                                        escrever_resultados, ler_tabela)
+import hashlib
+import logging
+import math
+import os
+import shutil
 
 st.set_page_config(layout="wide")
 
@@ -25,44 +33,173 @@ PREVISTO_FILE = r"C:\Users\AndréTakeoLoschnerFu\OneDrive - TPF-EGC\Documentos\E
 PRODUCAO_FILE = r"C:\Users\AndréTakeoLoschnerFu\OneDrive - TPF-EGC\Documentos\Entregas-json\jsons-07-04-2025\producao-exportacao-wbs-2025-04-07T15-37-17.json"
 PLANEJADO_FILE = r"C:\Users\AndréTakeoLoschnerFu\OneDrive - TPF-EGC\Documentos\Entregas-json\jsons-07-04-2025\planejado-exportacao-wbs-2025-04-07T15-37-17.json"
 
-
-def get_erros(df: pd.DataFrame, titulo=None, colunas =None):
+# Snapshots em Parquet dos resultados já processados (um por versão de arquivo)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", ".snapshots")
+# Incrementar quando o formato dos snapshots mudar, para que os antigos sejam refeitos
+VERSAO_SNAPSHOT = 2
+
+# Limites dos resultados mantidos em memória (ver json_para_df.consulta_erros.CacheIndices)
+TTL_RESULTADOS = int(os.getenv("TTL_RESULTADOS", TTL_INDICES))
+LIMITE_MEMORIA_RESULTADOS = int(os.getenv("LIMITE_MEMORIA_RESULTADOS_MB", LIMITE_MEMORIA_INDICES // 1024**2)) * 1024**2
+
+# Função de processamento e nomes dos datasets de cada arquivo
+PROCESSAMENTOS = {
+    "PRODUÇÃO": ("producao", process_production, TABELAS_PRODUCAO),
+    "PREVISTO": ("previsto", process_previsto, TABELAS_PREVISTO),
+    "PLANEJADO": ("planejado", process_planejado, (TABELA_PLANEJADO,)),
+}
+
+
+def _diretorio_snapshot(prefixo, caminho, tamanho, mtime_ns):
+    chave = f"{VERSAO_SNAPSHOT}|{os.path.abspath(caminho)}|{tamanho}|{mtime_ns}"
+    chave = hashlib.sha256(chave.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(SNAPSHOT_DIR, f"{prefixo}-{chave}")
+
+
+def _salvar_snapshot(prefixo, diretorio, nomes, tabelas):
+    """
+    Grava o snapshot em um diretório temporário e só então o publica,
+    removendo os snapshots anteriores do mesmo arquivo.
+    """
+    temporario = diretorio + ".tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+    escrever_resultados(temporario, nomes, tabelas)
+    for entrada in os.scandir(SNAPSHOT_DIR):
+        if entrada.is_dir() and entrada.name.startswith(prefixo + "-") and entrada.path != temporario:
+            shutil.rmtree(entrada.path, ignore_errors=True)
+    os.rename(temporario, diretorio)
+
+
+def carregar_resultado(arquivo, caminho, tamanho, mtime_ns):
+    """
+    Retorna a tupla de DataFrames processados do arquivo. O resultado é lido
+    do snapshot em Parquet da versão do arquivo (caminho, tamanho e data de
+    modificação) quando existe, com os mesmos dtypes e ordem das linhas, e
+    gravado nele após o processamento.
+    """
+    prefixo, processar, nomes = PROCESSAMENTOS[arquivo]
+    diretorio = _diretorio_snapshot(prefixo, caminho, tamanho, mtime_ns)
+
+    try:
+        if os.path.isdir(diretorio):
+            return tuple(ler_tabela(diretorio, nome) for nome in nomes)
+    except Exception as e:
+        logging.warning(f"Snapshot {diretorio} não pôde ser lido, reprocessando o arquivo: {e}")
+
+    resultado = processar(caminho)
+    tabelas = resultado if isinstance(resultado, tuple) else (resultado,)
+
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        _salvar_snapshot(prefixo, diretorio, nomes, tabelas)
+    except Exception as e:
+        logging.warning(f"Snapshot de {arquivo} não gravado: {e}")
+    return tabelas
+
+
+# Critério das linhas exibidas, quando não for apenas is_ok falso
+MASCARAS = {
+    "producao_codigos": lambda df: (~df['is_ok']) | (df['duplicado'] == True),
+}
+
+
+def montar_indices(arquivo, caminho, tamanho, mtime_ns):
+    """
+    Monta o índice de erros (ver json_para_df.consulta_erros) de cada
+    DataFrame do arquivo.
+    """
+    _, _, nomes = PROCESSAMENTOS[arquivo]
+    with st.spinner("Carregando dados..."):
+        tabelas = carregar_resultado(arquivo, caminho, tamanho, mtime_ns)
+        indices = []
+        for nome, df in zip(nomes, tabelas):
+            mascara = MASCARAS[nome](df) if nome in MASCARAS and not df.empty else None
+            indices.append(IndiceErros(df, mascara))
+    return tuple(indices)
+
+
+@st.cache_resource
+def cache_indices():
+    """
+    Cache dos índices compartilhado pelas sessões, limitado pela idade e pela
+    memória dos DataFrames (e não pelo número de entradas).
+    """
+    return CacheIndices(TTL_RESULTADOS, LIMITE_MEMORIA_RESULTADOS)
+
+
+def carregar_indices(arquivo, caminho, tamanho, mtime_ns):
+    """
+    Índices do arquivo, montados uma vez por versão do arquivo enquanto
+    couberem no cache.
+    """
+    return cache_indices().obter((arquivo, os.path.abspath(caminho), tamanho, mtime_ns),
+                                 lambda: montar_indices(arquivo, caminho, tamanho, mtime_ns))
+
+
+def obter_resultado(arquivo, caminho):
+    info = os.stat(caminho)
+    return carregar_indices(arquivo, caminho, info.st_size, info.st_mtime_ns)
+
+
+def get_erros(indice: IndiceErros, titulo=None, colunas =None):
     st.markdown(f"## {titulo}")
-    if df.empty or df[~df['is_ok']].copy().empty:
+    if not len(indice):
         return st.markdown("#### sem erros")
-    if not colunas:
-        return st.dataframe(df[~df['is_ok']].copy())
-    return st.dataframe(df[~df['is_ok']].copy()[colunas])
+    return mostrar_pagina(indice, f"{selected_arquivo}-{titulo}", colunas)
+
+
+def mostrar_pagina(indice: IndiceErros, chave, colunas=None):
+    """
+    Exibe os filtros (contrato, código e campo com erro) e apenas a página
+    selecionada das linhas com erro.
+    """
+    todos = lambda valor: "Todos" if valor is None else valor
+    filtro_contrato, filtro_codigo, filtro_campo = st.columns(3)
+    filtros = {
+        'contrato': filtro_contrato.selectbox("Contrato", [None] + indice.opcoes('contrato'),
+                                              format_func=todos, key=f"{chave}-contrato"),
+        'codigo': filtro_codigo.text_input("Código", key=f"{chave}-codigo").strip() or None,
+        'campo': filtro_campo.selectbox("Campo com erro", [None] + indice.campos,
+                                        format_func=todos, key=f"{chave}-campo"),
+    }
+
+    total = len(indice.filtrar(**filtros))
+    paginas = max(1, math.ceil(total / TAMANHO_PAGINA))
+    pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, step=1, key=f"{chave}-pagina")
+    df_pagina, _ = indice.pagina(int(pagina) - 1, colunas=colunas, **filtros)
+
+    st.caption(f"{total} linhas com erro - página {int(pagina)} de {paginas}")
+    return st.dataframe(df_pagina)
 
 # Processa os dados de acordo com a seleção
 if selected_arquivo == "PRODUÇÃO":
-    df_codes, df_trechos, df_ramais, df_localizadas = process_production(PRODUCAO_FILE)
+    indice_codes, indice_trechos, indice_ramais, indice_localizadas = obter_resultado(selected_arquivo, PRODUCAO_FILE)
 
     st.markdown(f"# Produção (Códigos WBS PAI)")
-    df_codes[(~df_codes['is_ok']) | (df_codes['duplicado'])]
+    mostrar_pagina(indice_codes, f"{selected_arquivo}-codigos")
 
     st.markdown("# Trechos")
-    print(df_trechos.columns)
-    get_erros(df_trechos, "Lineares", ['contrato', 'codigo', 'tipo', 'jusante', 'montante', 'extensao',
+    get_erros(indice_trechos, "Lineares", ['contrato', 'codigo', 'tipo', 'jusante', 'montante', 'extensao',
        'diametro', 'material', 'metodo_exec', 'endereco'])
 
-    get_erros(df_ramais, "Ramais")
-    get_erros(df_localizadas, "Localizadas")
+    get_erros(indice_ramais, "Ramais")
+    get_erros(indice_localizadas, "Localizadas")
 
 
 
 
 elif selected_arquivo == "PREVISTO":
-    df_linear, df_linear_trechos, df_localizada, df_ramais, df_economias = process_previsto(PREVISTO_FILE)
+    (indice_linear, indice_linear_trechos, indice_localizada,
+     indice_ramais, indice_economias) = obter_resultado(selected_arquivo, PREVISTO_FILE)
     st.markdown("# Previsto")
-    get_erros(df_linear, "Lineares")
-    get_erros(df_linear_trechos, "Trechos Lineares")
-    get_erros(df_localizada, "Localizadas")
-    get_erros(df_ramais, "Ramais")
-    get_erros(df_economias, "Economias")
+    get_erros(indice_linear, "Lineares")
+    get_erros(indice_linear_trechos, "Trechos Lineares")
+    get_erros(indice_localizada, "Localizadas")
+    get_erros(indice_ramais, "Ramais")
+    get_erros(indice_economias, "Economias")
     
 elif selected_arquivo == "PLANEJADO":
-    df_planejado = process_planejado(PLANEJADO_FILE)
+    indice_planejado, = obter_resultado(selected_arquivo, PLANEJADO_FILE)
     st.markdown("# Planejado")
-    get_erros(df_planejado, "")
+    get_erros(indice_planejado, "")
 
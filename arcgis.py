@@ -1,9 +1,70 @@
 import requests
+import hashlib
+import os
+import pickle
+import time
 import urllib.parse
+import numpy as np
 import pandas as pd
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import Optional, List
 
 
+class ErroConsultaArcGIS(Exception):
+    """
+    Falha definitiva ao consultar uma camada ArcGIS (após as novas tentativas).
+    """
+
+
+# Campo usado para ordenar as páginas de uma consulta
+CAMPO_ORDEM = "OBJECTID"
+
+
+def _montar_url(base_url: str, where: str, out_fields: str, geometry: str, **extras) -> str:
+    query_url = (
+        f"{base_url}/query?"
+        f"f=json&"
+        f"where={urllib.parse.quote(where)}&"
+        f"outFields={urllib.parse.quote(out_fields)}&"
+        f"returnGeometry={geometry}&"
+    )
+    query_url += "".join(f"{chave}={valor}&" for chave, valor in extras.items())
+    return query_url + "spatialRel=esriSpatialRelIntersects"
+
+
+def _criar_sessao(max_workers: int) -> requests.Session:
+    """
+    Sessão com conexões keep-alive reaproveitadas por até max_workers threads.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(max_workers, 1))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _get_json(session: requests.Session, url: str, timeout: int, retries: int, backoff: float) -> dict:
+    """
+    Faz o GET e devolve o JSON, tentando novamente (com espera exponencial:
+    backoff, 2*backoff, 4*backoff...) em erros de rede, HTTP ou respostas
+    com "error" do ArcGIS.
+    """
+    for tentativa in range(retries + 1):
+        try:
+            response = session.get(url, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+            if "error" in data:
+                raise ErroConsultaArcGIS(f"Erro retornado pelo ArcGIS: {data['error']}")
+            return data
+        except (requests.RequestException, ValueError, ErroConsultaArcGIS) as e:
+            if tentativa == retries:
+                raise ErroConsultaArcGIS(f"Falha ao consultar {url} após {retries + 1} tentativas: {e}") from e
+            time.sleep(backoff * 2 ** tentativa)
+
+
 def consultar_arcgis_camada(
     base_url: str,
     where: str = "1=1",
@@ -11,11 +72,24 @@ def consultar_arcgis_camada(
     include_geometry: bool = False,
     batch_size: int = 1000,
     verbose: bool = True,
-    timeout: int = 30
+    timeout: int = 30,
+    max_workers: int = 1,
+    retries: int = 3,
+    backoff: float = 0.5,
+    order_by: str = CAMPO_ORDEM
 ) -> pd.DataFrame:
     """
     Consulta uma camada ArcGIS paginada e retorna um DataFrame com todos os registros.
 
+    Todas as páginas são pedidas ordenadas por `order_by`, para que os offsets
+    de requisições diferentes se refiram à mesma ordem de registros.
+
+    Com max_workers > 1, a quantidade de registros é consultada primeiro e os
+    lotes são buscados em paralelo (até max_workers requisições simultâneas,
+    em uma sessão keep-alive compartilhada) e remontados na ordem dos offsets.
+    Em ambos os modos uma página que falhe após as novas tentativas interrompe
+    a consulta com ErroConsultaArcGIS, em vez de devolver dados incompletos.
+
     Parâmetros:
     - base_url (str): URL base da camada (sem /query).
     - where (str): Cláusula WHERE da consulta.
@@ -24,82 +98,285 @@ def consultar_arcgis_camada(
     - batch_size (int): Número de registros por lote.
     - verbose (bool): Se True, imprime logs de progresso.
     - timeout (int): Tempo limite para cada requisição em segundos.
+    - max_workers (int): Requisições simultâneas (1 = lotes em sequência).
+    - retries (int): Novas tentativas por requisição com falha.
+    - backoff (float): Espera, em segundos, antes da primeira nova tentativa.
+    - order_by (str): Campo de ordenação das páginas (único por registro).
 
     Retorna:
     - pd.DataFrame com os registros consultados.
     """
-    offset = 0
-    all_features = []
-    where_encoded = urllib.parse.quote(where)
     out_fields = "*" if fields is None else ",".join(fields)
     geometry = "true" if include_geometry else "false"
 
-    while True:
-        query_url = (
-            f"{base_url}/query?"
-            f"f=json&"
-            f"where={where_encoded}&"
-            f"outFields={urllib.parse.quote(out_fields)}&"
-            f"returnGeometry={geometry}&"
-            f"resultOffset={offset}&"
-            f"resultRecordCount={batch_size}&"
-            f"spatialRel=esriSpatialRelIntersects"
-        )
+    with _criar_sessao(max_workers) as session:
+        if max_workers > 1:
+            all_features = _consultar_em_paralelo(session, base_url, where, out_fields, geometry, order_by,
+                                                  batch_size, verbose, timeout, max_workers, retries, backoff)
+        else:
+            all_features = _consultar_em_sequencia(session, base_url, where, out_fields, geometry, order_by,
+                                                   batch_size, verbose, timeout, retries, backoff)
 
-        try:
-            response = requests.get(query_url, timeout=timeout)
-            response.raise_for_status()
-            data = response.json()
+    if not all_features:
+        print("⚠️ Nenhum dado retornado.")
+        return pd.DataFrame()
 
-            features = data.get("features", [])
-            if not features:
-                break
+    # Extrair atributos
+    return pd.DataFrame([f["attributes"] for f in all_features])
+
+
+def _consultar_em_sequencia(session, base_url, where, out_fields, geometry, order_by,
+                            batch_size, verbose, timeout, retries, backoff) -> list:
+    offset = 0
+    all_features = []
 
-            all_features.extend(features)
-            offset += batch_size
+    while True:
+        query_url = _montar_url(base_url, where, out_fields, geometry,
+                                orderByFields=urllib.parse.quote(order_by),
+                                resultOffset=offset, resultRecordCount=batch_size)
 
-            if verbose:
-                print(f"✓ Lote com {len(features)} registros carregado (offset {offset})")
+        data = _get_json(session, query_url, timeout, retries, backoff)
 
-        except requests.RequestException as e:
-            print(f"⚠️ Erro ao consultar camada: {e}")
+        features = data.get("features", [])
+        if not features:
             break
 
-    if not all_features:
-        print("⚠️ Nenhum dado retornado.")
-        return pd.DataFrame()
+        all_features.extend(features)
+        offset += batch_size
 
-    # Extrair atributos
-    return pd.DataFrame([f["attributes"] for f in all_features])
+        if verbose:
+            print(f"✓ Lote com {len(features)} registros carregado (offset {offset})")
+
+    return all_features
+
+
+def _consultar_em_paralelo(session, base_url, where, out_fields, geometry, order_by,
+                           batch_size, verbose, timeout, max_workers, retries, backoff) -> list:
+    count_url = _montar_url(base_url, where, out_fields, geometry, returnCountOnly="true")
+    total = _get_json(session, count_url, timeout, retries, backoff).get("count", 0)
+    if verbose:
+        print(f"✓ {total} registros na camada, {-(-total // batch_size)} lotes")
+
+    def buscar_lote(offset):
+        query_url = _montar_url(base_url, where, out_fields, geometry,
+                                orderByFields=urllib.parse.quote(order_by),
+                                resultOffset=offset, resultRecordCount=batch_size)
+        features = _get_json(session, query_url, timeout, retries, backoff).get("features", [])
+        if verbose:
+            print(f"✓ Lote com {len(features)} registros carregado (offset {offset})")
+        return features
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        lotes = list(executor.map(buscar_lote, range(0, total, batch_size)))
+
+    all_features = [feature for lote in lotes for feature in lote]
+    if len(all_features) != total:
+        # Ex.: batch_size maior que o maxRecordCount do serviço
+        raise ErroConsultaArcGIS(
+            f"Esperados {total} registros, recebidos {len(all_features)}; "
+            f"verifique se batch_size não excede o limite de registros por consulta do serviço.")
+    return all_features
+
+
+# CACHE LOCAL DAS CAMADAS
+
+ARCGIS_CACHE_DIR = os.getenv("ARCGIS_CACHE_DIR", ".cache_arcgis")
+TTL_CACHE = 24 * 3600               # segundos até a próxima atualização incremental
+TTL_CACHE_COMPLETO = 7 * 24 * 3600  # segundos até recarregar a camada inteira
+# Campos de controle procurados nos atributos (editor tracking do ArcGIS e IDs)
+CAMPOS_EDICAO = ("EditDate", "last_edited_date")
+CAMPOS_ID = ("OBJECTID", "FID")
+
+
+def _campo_existente(df: pd.DataFrame, candidatos) -> Optional[str]:
+    colunas = {str(col).lower(): col for col in df.columns}
+    for candidato in candidatos:
+        if candidato.lower() in colunas:
+            return colunas[candidato.lower()]
+    return None
+
+
+def _caminho_cache(base_url: str, where: str, fields: Optional[List[str]]) -> str:
+    chave = hashlib.sha256(f"{base_url}|{where}|{fields}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(ARCGIS_CACHE_DIR, f"camada-{chave}.pkl")
+
+
+def _salvar_cache(caminho: str, snapshot: dict) -> None:
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporario, caminho)
+
+
+def _filtro_incremental(df: pd.DataFrame, where: str) -> Optional[str]:
+    """
+    Cláusula WHERE que traz apenas as feições editadas (ou criadas) depois do
+    snapshot: pela data de edição, se a camada tiver editor tracking, ou
+    pelo maior ID. Retorna None se a camada não tiver nenhum dos campos.
+    """
+    campo_edicao = _campo_existente(df, CAMPOS_EDICAO)
+    if campo_edicao is not None:
+        ultima_edicao = pd.to_numeric(df[campo_edicao], errors="coerce").max()
+        if pd.notna(ultima_edicao):
+            # Datas do ArcGIS vêm em milissegundos UTC; >= no segundo para não perder edições
+            instante = datetime.fromtimestamp(ultima_edicao / 1000, tz=timezone.utc)
+            return f"({where}) AND {campo_edicao} >= TIMESTAMP '{instante:%Y-%m-%d %H:%M:%S}'"
+
+    campo_id = _campo_existente(df, CAMPOS_ID)
+    if campo_id is not None:
+        ultimo_id = pd.to_numeric(df[campo_id], errors="coerce").max()
+        if pd.notna(ultimo_id):
+            return f"({where}) AND {campo_id} > {int(ultimo_id)}"
+    return None
+
+
+def consultar_camada_em_cache(
+    base_url: str,
+    where: str = "1=1",
+    fields: Optional[List[str]] = None,
+    ttl: float = TTL_CACHE,
+    ttl_completo: float = TTL_CACHE_COMPLETO,
+    **kwargs
+) -> pd.DataFrame:
+    """
+    Versão de consultar_arcgis_camada com snapshot local (pickle em
+    ARCGIS_CACHE_DIR) de cada consulta.
+
+    - Snapshot com menos de `ttl` segundos: é usado diretamente.
+    - Snapshot mais antigo: só as feições com data de edição (ou ID) mais
+      nova que a do snapshot são consultadas e mescladas a ele, substituindo
+      as versões anteriores pelo ID.
+    - Snapshot com mais de `ttl_completo` segundos, inexistente ou sem campos
+      de controle: a camada é consultada inteira (o que também descarta as
+      feições excluídas no serviço).
+
+    Se a atualização falhar (ErroConsultaArcGIS), o snapshot existente é
+    devolvido com um aviso, sem alterar a data da última atualização; sem
+    snapshot, o erro é propagado.
+
+    Os demais argumentos são repassados a consultar_arcgis_camada.
+    """
+    caminho = _caminho_cache(base_url, where, fields)
+    agora = time.time()
+
+    snapshot = None
+    if os.path.exists(caminho):
+        try:
+            with open(caminho, "rb") as f:
+                snapshot = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            print(f"⚠️ Cache da camada inválido, consultando novamente: {e}")
+
+    if snapshot is not None:
+        if agora - snapshot["atualizado_em"] < ttl:
+            return snapshot["df"]
+
+        df = snapshot["df"]
+        where_incremental = _filtro_incremental(df, where)
+        if agora - snapshot["completo_em"] < ttl_completo and where_incremental is not None:
+            try:
+                novos = consultar_arcgis_camada(base_url, where=where_incremental, fields=fields, **kwargs)
+            except ErroConsultaArcGIS as e:
+                return _snapshot_desatualizado(snapshot, e)
+            if not novos.empty:
+                campo_id = _campo_existente(df, CAMPOS_ID)
+                df = pd.concat([df, novos], ignore_index=True)
+                if campo_id is not None:
+                    df = df.drop_duplicates(subset=campo_id, keep="last", ignore_index=True)
+            if kwargs.get("verbose", True):
+                print(f"✓ Cache da camada atualizado com {len(novos)} feições novas ou editadas")
+            _salvar_cache(caminho, {**snapshot, "df": df, "atualizado_em": agora})
+            return df
+
+    try:
+        df = consultar_arcgis_camada(base_url, where=where, fields=fields, **kwargs)
+    except ErroConsultaArcGIS as e:
+        if snapshot is None:
+            raise
+        return _snapshot_desatualizado(snapshot, e)
+    if not df.empty:
+        _salvar_cache(caminho, {"df": df, "atualizado_em": agora, "completo_em": agora})
+    return df
+
+
+def _snapshot_desatualizado(snapshot: dict, erro: Exception) -> pd.DataFrame:
+    """
+    Devolve o snapshot quando a atualização falha. O arquivo não é regravado,
+    de modo que a próxima chamada tenta atualizar de novo.
+    """
+    atualizado_em = datetime.fromtimestamp(snapshot["atualizado_em"])
+    print(f"⚠️ Falha ao atualizar a camada, usando o cache de {atualizado_em:%d/%m/%Y %H:%M}: {erro}")
+    return snapshot["df"]
 
 
 # EXEMPLOS ESPECÍFICOS
 
+# Requisições simultâneas ao consultar as camadas dos contratos
+MAX_WORKERS_ARCGIS = 4
+
 def create_df_RMSP():
     url = "https://services9.arcgis.com/dXZLSzC33uzjAmXl/arcgis/rest/services/Contratos_RMSP_R46_R1_WEB/FeatureServer/1"
-    return consultar_arcgis_camada(url, where="WBS_TEXT IS NOT NULL AND WBS_TEXT <> ''")
+    return consultar_camada_em_cache(url, where="WBS_TEXT IS NOT NULL AND WBS_TEXT <> ''", max_workers=MAX_WORKERS_ARCGIS)
 
 
 def create_df_RMBS():
     url = "https://services9.arcgis.com/dXZLSzC33uzjAmXl/arcgis/rest/services/Contratos_R5_R2_20240918_WEB/FeatureServer/0"
-    return consultar_arcgis_camada(url, where="WBS_TEXT IS NOT NULL AND WBS_TEXT <> ''")
-
-def endereco_generation(row):
-    result = ""
-    for part in [row['MUNICIPIO'], row["BAIRRO"], row['LOGRADOURO']]:
-        if pd.isna(part):
-            continue
-        if part == "":
-            continue
-        if result != "":
-            result += ", "
-        result += str(part)
-    return result
+    return consultar_camada_em_cache(url, where="WBS_TEXT IS NOT NULL AND WBS_TEXT <> ''", max_workers=MAX_WORKERS_ARCGIS)
+
+COLUNAS_ENDERECO = ['MUNICIPIO', 'BAIRRO', 'LOGRADOURO']
+
+# Normalização das chaves de endereço
+_ACENTOS = r'[\u0300-\u036f]'
+_ESPACOS = r'\s+'
+_VIRGULAS = r'\s*,\s*'
+
+
+def compor_enderecos(df: pd.DataFrame, colunas: List[str] = COLUNAS_ENDERECO, separador: str = ", ") -> pd.Series:
+    """
+    Endereço por extenso de cada linha: junta as colunas com o separador,
+    ignorando valores nulos e textos vazios.
+    """
+    resultado = np.full(len(df), "", dtype=object)
+    preenchido = np.zeros(len(df), dtype=bool)
+    for coluna in colunas:
+        valores = df[coluna]
+        valido = (valores.notna() & (valores != "")).to_numpy()
+        partes = valores.astype(str).to_numpy(dtype=object)
+
+        juntar = valido & preenchido
+        resultado[juntar] = resultado[juntar] + separador + partes[juntar]
+        iniciar = valido & ~preenchido
+        resultado[iniciar] = partes[iniciar]
+        preenchido |= valido
+    return pd.Series(resultado, index=df.index, dtype=object)
+
+
+def normalizar_endereco(enderecos: pd.Series) -> pd.Series:
+    """
+    Chave de comparação de endereços: minúsculas, sem acentos, espaços
+    repetidos colapsados e vírgulas padronizadas (", "). Cada endereço
+    distinto é normalizado uma única vez. Nulos continuam nulos.
+    """
+    codigos, unicos = pd.factorize(enderecos)
+    chaves = (pd.Series(unicos, dtype=object).astype(str)
+              .str.normalize('NFKD')
+              .str.replace(_ACENTOS, '', regex=True)
+              .str.casefold()
+              .str.replace(_VIRGULAS, ', ', regex=True)
+              .str.replace(_ESPACOS, ' ', regex=True)
+              .str.strip()
+              .to_numpy(dtype=object))
+    resultado = np.full(len(enderecos), None, dtype=object)
+    validos = codigos >= 0
+    resultado[validos] = chaves[codigos[validos]]
+    return pd.Series(resultado, index=enderecos.index, dtype=object)
+
 
 def create_enderecos_df():
 
     df = pd.concat([create_df_RMSP(), create_df_RMBS()], ignore_index=True)
-    df['ENDERECO'] = df.apply(endereco_generation, axis=1)
+    df['ENDERECO'] = compor_enderecos(df)
     
 
     return df
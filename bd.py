@@ -1,45 +1,226 @@
 import os
 import json
 import logging
-import pyodbc
+import queue
+import threading
+import time
+from collections import OrderedDict
 import pandas as pd
 from decimal import Decimal
 from datetime import datetime
 import requests
 import urllib.parse
+from contextlib import contextmanager
+
+try:
+    import pyodbc
+except ImportError:  # driver ODBC ausente: o pool ainda pode usar outra fábrica de conexões (ex.: sqlite3)
+    pyodbc = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+STRING_CONEXAO = (
+    'DRIVER={ODBC Driver 17 for SQL Server};'
+    'SERVER=HWC-HWP-5176900;'
+    'DATABASE=SABESP_BI_EM;'
+    'UID=sabesp_bi_em;'
+    'PWD=39QZPbQL2c0;'
+)
+TAMANHO_POOL = 4
+TIMEOUT_POOL = 60          # segundos aguardando uma conexão livre
+TAMANHO_LOTE = 5000        # linhas por fetchmany
+TTL_CONSULTAS = 15 * 60    # segundos que um resultado fica no cache
+MAXIMO_CONSULTAS = 64      # resultados guardados no cache
+
+
+def _nova_conexao():
+    if pyodbc is None:
+        raise ImportError("O pacote 'pyodbc' (e o driver ODBC) é necessário para conectar no banco de dados.")
+    return pyodbc.connect(STRING_CONEXAO)
+
 
-def conectar_bd() -> pyodbc.Connection:
+def conectar_bd() -> "pyodbc.Connection":
     try:
-        conexao = pyodbc.connect(
-            'DRIVER={ODBC Driver 17 for SQL Server};'
-            'SERVER=HWC-HWP-5176900;'
-            'DATABASE=SABESP_BI_EM;'
-            'UID=sabesp_bi_em;'
-            'PWD=39QZPbQL2c0;'
-        )
+        conexao = _nova_conexao()
         logger.info("Conexão com o banco de dados estabelecida com sucesso.")
         return conexao
     except Exception as e:
         logger.error(f"Falha ao conectar no banco de dados: {e}")
         return None
 
-def executar_select(consulta_sql: str, conexao: pyodbc.Connection) -> pd.DataFrame:
+
+def _executar(cursor, consulta_sql: str, parametros=None):
+    if parametros:
+        cursor.execute(consulta_sql, tuple(parametros))
+    else:
+        cursor.execute(consulta_sql)
+
+
+def _ler_cursor(cursor, tamanho_lote: int = TAMANHO_LOTE) -> pd.DataFrame:
+    """
+    Lê o resultado do cursor em lotes de fetchmany, acumulando os valores
+    direto em listas por coluna, e monta o DataFrame a partir delas.
+    """
+    nomes = [desc[0] for desc in cursor.description]
+    colunas = [[] for _ in nomes]
+    while True:
+        lote = cursor.fetchmany(tamanho_lote)
+        if not lote:
+            break
+        for coluna, valores in zip(colunas, zip(*lote)):
+            coluna.extend(valores)
+    df = pd.DataFrame({i: coluna for i, coluna in enumerate(colunas)})
+    df.columns = nomes
+    return df
+
+
+def executar_select(consulta_sql: str, conexao: "pyodbc.Connection", parametros=None) -> pd.DataFrame:
     if conexao is None:
         logger.error("Conexão com o banco não fornecida. Não é possível executar a consulta.")
         return None
 
     try:
         cursor = conexao.cursor()
-        cursor.execute(consulta_sql)
-        resultado = cursor.fetchall()
-        colunas = [desc[0] for desc in cursor.description]
-        df = pd.DataFrame.from_records(resultado, columns=colunas)
+        _executar(cursor, consulta_sql, parametros)
+        df = _ler_cursor(cursor)
         cursor.close()
         return df
     except Exception as e:
         logger.error(f"Erro ao executar SELECT: {e}")
         return None
+
+
+# =============================================================================
+# Pool de Conexões e Cache de Consultas
+# =============================================================================
+class PoolConexoes:
+    """
+    Mantém até `tamanho_maximo` conexões abertas para reaproveitamento; com
+    todas emprestadas, novos pedidos aguardam até `timeout` segundos por uma
+    devolução e então falham com TimeoutError.
+    `fabrica` cria uma nova conexão (por padrão, pyodbc com STRING_CONEXAO).
+    """
+    def __init__(self, fabrica=_nova_conexao, tamanho_maximo: int = TAMANHO_POOL, timeout: float = TIMEOUT_POOL):
+        self.fabrica = fabrica
+        self.timeout = timeout
+        self._livres = queue.LifoQueue(maxsize=tamanho_maximo)
+        self._disponiveis = threading.BoundedSemaphore(tamanho_maximo)
+
+    @contextmanager
+    def conexao(self):
+        """
+        Empresta uma conexão do pool. Se a consulta falhar a conexão é
+        descartada, para não devolver ao pool uma conexão em estado inválido.
+        """
+        if not self._disponiveis.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Nenhuma conexão do pool foi liberada em {self.timeout} segundos.")
+        try:
+            try:
+                conexao = self._livres.get_nowait()
+            except queue.Empty:
+                conexao = self.fabrica()
+                logger.info("Nova conexão com o banco de dados aberta para o pool.")
+            try:
+                yield conexao
+            except Exception:
+                self._fechar(conexao)
+                raise
+            self._livres.put_nowait(conexao)
+        finally:
+            self._disponiveis.release()
+
+    @staticmethod
+    def _fechar(conexao):
+        try:
+            conexao.close()
+        except Exception:
+            pass
+
+    def fechar(self):
+        """
+        Fecha as conexões livres do pool.
+        """
+        while True:
+            try:
+                self._fechar(self._livres.get_nowait())
+            except queue.Empty:
+                return
+
+
+class CacheConsultas:
+    """
+    Resultados de consultas indexados pelo texto SQL e pelos parâmetros,
+    válidos por `ttl` segundos. A cada inserção os resultados expirados são
+    removidos e, acima de `maximo_entradas`, os menos usados são descartados.
+    """
+    def __init__(self, pool: PoolConexoes, ttl: float = TTL_CONSULTAS, maximo_entradas: int = MAXIMO_CONSULTAS,
+                 relogio=time.monotonic):
+        self.pool = pool
+        self.ttl = ttl
+        self.maximo_entradas = maximo_entradas
+        self._relogio = relogio
+        self._resultados = OrderedDict()  # chave -> (expira, df), do menos para o mais recente
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._resultados)
+
+    def consultar(self, consulta_sql: str, parametros=(), ttl: float = None) -> pd.DataFrame:
+        """
+        Retorna uma cópia do resultado da consulta, executando-a apenas se
+        não houver resultado válido no cache. Erros do banco são propagados.
+        """
+        chave = (consulta_sql, tuple(parametros))
+        agora = self._relogio()
+        with self._lock:
+            guardado = self._resultados.get(chave)
+            if guardado is not None and guardado[0] > agora:
+                self._resultados.move_to_end(chave)
+                return guardado[1].copy()
+
+        with self.pool.conexao() as conexao:
+            cursor = conexao.cursor()
+            try:
+                _executar(cursor, consulta_sql, parametros)
+                df = _ler_cursor(cursor)
+            finally:
+                cursor.close()
+
+        with self._lock:
+            self._resultados[chave] = (agora + (self.ttl if ttl is None else ttl), df)
+            self._resultados.move_to_end(chave)
+            self._remover_excedentes(self._relogio())
+        return df.copy()
+
+    def _remover_excedentes(self, agora):
+        for chave in [chave for chave, (expira, _) in self._resultados.items() if expira <= agora]:
+            del self._resultados[chave]
+        while len(self._resultados) > self.maximo_entradas:
+            self._resultados.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._resultados.clear()
+
+
+_cache_padrao = None
+_lock_padrao = threading.Lock()
+
+
+def obter_cache() -> CacheConsultas:
+    """
+    Cache de consultas (e pool de conexões) padrão do processo, criado no primeiro uso.
+    """
+    global _cache_padrao
+    with _lock_padrao:
+        if _cache_padrao is None:
+            _cache_padrao = CacheConsultas(PoolConexoes())
+        return _cache_padrao
+
+
+def consultar(consulta_sql: str, parametros=(), ttl: float = None) -> pd.DataFrame:
+    """
+    Executa a consulta pelo pool de conexões padrão, com cache de resultados.
+    """
+    return obter_cache().consultar(consulta_sql, parametros, ttl)
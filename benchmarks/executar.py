@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark do processamento das exportações WBS.
+
+Mede, separadamente, process_production, process_previsto, process_planejado
+e a escrita do Excel (ExcelCreator, com as mesmas planilhas de main.py) sobre
+os arquivos gerados por benchmarks/gerar_exportacoes.py. Cada etapa roda em
+um processo novo, para que o pico de memória de uma não contamine o das
+outras; o tempo registrado é o menor entre as repetições.
+
+Para cada etapa são registrados o tempo, a vazão (MB/s do JSON e linhas/s),
+o pico de memória do processo e uma assinatura dos DataFrames gerados
+(linhas, colunas, tipos, erros e hash do conteúdo). Com --baseline, o
+resultado é comparado a uma execução anterior gravada com --gravar-baseline:
+qualquer diferença nos resultados, ou tempo/memória acima da tolerância,
+é apontada e o script termina com código 1. Uso:
+
+    python benchmarks/gerar_exportacoes.py dados_bench --tamanho 50MB
+    python benchmarks/executar.py dados_bench --baseline baseline.json --gravar-baseline
+    ... (alterações no código) ...
+    python benchmarks/executar.py dados_bench --baseline baseline.json
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: o pico de memória é medido com tracemalloc
+    resource = None
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.gerar_exportacoes import ARQUIVO_PARAMETROS, ARQUIVOS
+
+# =============================================================================
+# Configurações Globais
+# =============================================================================
+ETAPAS = ['producao', 'previsto', 'planejado', 'excel']
+TOLERANCIA_TEMPO = 0.25    # fração acima da baseline considerada regressão
+TOLERANCIA_MEMORIA = 0.25
+
+
+# =============================================================================
+# Etapas (executadas no processo filho)
+# =============================================================================
+def _como_tupla(resultado):
+    return resultado if isinstance(resultado, tuple) else (resultado,)
+
+
+def _funcao_etapa(etapa):
+    """
+    Função que executa a etapa. Os módulos são importados aqui, fora da
+    medida de tempo.
+    """
+    if etapa == 'excel':
+        from main import ExcelCreator, process_planejado_data, process_previsto_data, process_producao
+
+        def escrever_excel(resultados, pasta_resultados):
+            # Mesmas planilhas de main.py; retorna (nome, última linha) de cada uma
+            excel_creator = ExcelCreator(os.path.join(pasta_resultados, 'checagens.xlsx'))
+            process_producao(excel_creator, resultados['producao'])
+            process_previsto_data(excel_creator, resultados['previsto'])
+            process_planejado_data(excel_creator, resultados['planejado'])
+            planilhas = [[ws.name, ws.dim_rowmax] for ws in excel_creator.workbook.worksheets()]
+            excel_creator.save()
+            return planilhas
+        return escrever_excel
+
+    if etapa == 'producao':
+        from json_para_df.producao import process_production as processar
+    elif etapa == 'previsto':
+        from json_para_df.previsto import process_previsto as processar
+    else:
+        from json_para_df.planejado import process_planejado as processar
+    return lambda dados, _: processar(os.path.join(dados, ARQUIVOS[etapa]))
+
+
+def _preparar_excel(pasta_resultados):
+    resultados = {}
+    for etapa in ('producao', 'previsto', 'planejado'):
+        with open(os.path.join(pasta_resultados, etapa + '.pkl'), 'rb') as f:
+            resultados[etapa] = pickle.load(f)
+    return resultados
+
+
+def assinatura_dataframe(df):
+    """
+    Resumo comparável de um DataFrame: tamanho, colunas, tipos, quantidade
+    de linhas com erro e hash do conteúdo (como texto).
+    """
+    import pandas as pd
+    conteudo = pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes()
+    return {
+        'linhas': len(df),
+        'colunas': [str(col) for col in df.columns],
+        'tipos': [str(tipo) for tipo in df.dtypes],
+        'com_erro': int((~df['is_ok'].astype(bool)).sum()) if 'is_ok' in df.columns else None,
+        'hash': hashlib.sha256(conteudo).hexdigest(),
+    }
+
+
+def _pico_memoria_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+
+def medir_etapa(etapa, dados, pasta_resultados, repeticoes=1):
+    """
+    Executa a etapa `repeticoes` vezes no processo atual e retorna as medidas.
+    Os resultados das etapas de processamento são gravados em
+    `pasta_resultados` para a etapa do Excel.
+    """
+    os.chdir(RAIZ)  # municipios.json é lido do diretório atual
+    logging.disable(logging.INFO)
+
+    executar = _funcao_etapa(etapa)
+    if etapa == 'excel':
+        entrada = _preparar_excel(pasta_resultados)
+        linhas = sum(len(df) for resultado in entrada.values() for df in _como_tupla(resultado))
+    else:
+        entrada = dados
+
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        resultado = None  # não mantém o resultado anterior durante a medida
+        inicio = time.perf_counter()
+        resultado = executar(entrada, pasta_resultados)
+        tempos.append(time.perf_counter() - inicio)
+
+    if resource is not None:
+        pico = _pico_memoria_mb()
+    else:
+        # Repetição extra, fora da medida de tempo, só para o pico de memória
+        import tracemalloc
+        tracemalloc.start()
+        executar(entrada, pasta_resultados)
+        pico = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+
+    if etapa == 'excel':
+        assinatura = resultado
+    else:
+        if resultado is None:
+            raise RuntimeError(f"A etapa '{etapa}' falhou (veja o log).")
+        with open(os.path.join(pasta_resultados, etapa + '.pkl'), 'wb') as f:
+            pickle.dump(resultado, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tabelas = _como_tupla(resultado)
+        linhas = sum(len(df) for df in tabelas)
+        assinatura = [assinatura_dataframe(df) for df in tabelas]
+
+    segundos = min(tempos)
+    medidas = {
+        'segundos': round(segundos, 4),
+        'linhas': linhas,
+        'linhas_por_s': round(linhas / segundos, 1),
+        'pico_mb': round(pico, 1),
+        'assinatura': assinatura,
+    }
+    if etapa != 'excel':
+        tamanho = os.path.getsize(os.path.join(dados, ARQUIVOS[etapa])) / 1024 ** 2
+        medidas['mb_por_s'] = round(tamanho / segundos, 2)
+    return medidas
+
+
+# =============================================================================
+# Execução e Comparação
+# =============================================================================
+def _preparar_snapshot_integra(pasta, parametros):
+    """
+    Grava o snapshot de contratos integra usado por process_previsto, para
+    que o benchmark não dependa do banco de dados.
+    """
+    caminho = os.path.join(pasta, 'contratos_integra.json')
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({'atualizado_em': time.time(), 'contratos': parametros['contratos_integra']}, f)
+    os.environ['CONTRATOS_INTEGRA_SNAPSHOT'] = caminho
+
+
+def executar_benchmark(dados, etapas=ETAPAS, repeticoes=1):
+    """
+    Executa as etapas, cada uma em um processo novo, e retorna o relatório.
+    """
+    dados = os.path.abspath(dados)
+    with open(os.path.join(dados, ARQUIVO_PARAMETROS), 'r', encoding='utf-8') as f:
+        parametros = json.load(f)
+
+    relatorio = {
+        'parametros': {chave: valor for chave, valor in parametros.items() if chave != 'contratos_integra'},
+        'ambiente': _ambiente(),
+        'etapas': {},
+    }
+    with tempfile.TemporaryDirectory() as pasta_resultados:
+        _preparar_snapshot_integra(pasta_resultados, parametros)
+        # A etapa do Excel usa os resultados das demais
+        ordem = ETAPAS if 'excel' in etapas else [etapa for etapa in ETAPAS if etapa in etapas]
+        contexto = multiprocessing.get_context('spawn')
+        for etapa in ordem:
+            with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+                medidas = executor.submit(medir_etapa, etapa, dados, pasta_resultados, repeticoes).result()
+            if etapa in etapas:
+                relatorio['etapas'][etapa] = medidas
+                print(_linha_relatorio(etapa, medidas))
+    return relatorio
+
+
+def _ambiente():
+    import numpy as np
+    import pandas as pd
+    return {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'plataforma': platform.platform(), 'processador': platform.processor() or platform.machine()}
+
+
+def _linha_relatorio(etapa, medidas):
+    vazao = f"{medidas['mb_por_s']:8.2f} MB/s" if 'mb_por_s' in medidas else " " * 13
+    return (f"{etapa:<10} {medidas['segundos']:9.3f} s  {vazao}  {medidas['linhas_por_s']:12.0f} linhas/s"
+            f"  pico {medidas['pico_mb']:8.1f} MB")
+
+
+def comparar(relatorio, baseline, tolerancia_tempo=TOLERANCIA_TEMPO, tolerancia_memoria=TOLERANCIA_MEMORIA):
+    """
+    Compara o relatório com a baseline e retorna a lista de regressões.
+    """
+    if relatorio['parametros'] != baseline['parametros']:
+        return ["Os dados não são os mesmos da baseline (parâmetros do gerador diferentes)."]
+
+    regressoes = []
+    for etapa, medidas in relatorio['etapas'].items():
+        anterior = baseline['etapas'].get(etapa)
+        if anterior is None:
+            continue
+        if medidas['assinatura'] != anterior['assinatura']:
+            regressoes.append(f"{etapa}: resultado diferente da baseline.")
+        if medidas['segundos'] > anterior['segundos'] * (1 + tolerancia_tempo):
+            regressoes.append(f"{etapa}: {medidas['segundos']:.3f} s (baseline {anterior['segundos']:.3f} s).")
+        if medidas['pico_mb'] > anterior['pico_mb'] * (1 + tolerancia_memoria):
+            regressoes.append(f"{etapa}: pico de {medidas['pico_mb']:.1f} MB (baseline {anterior['pico_mb']:.1f} MB).")
+    return regressoes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da validação das exportações WBS.")
+    parser.add_argument("dados", help="Pasta gerada por benchmarks/gerar_exportacoes.py.")
+    parser.add_argument("--etapas", nargs="+", choices=ETAPAS, default=ETAPAS, help="Etapas medidas (padrão: todas).")
+    parser.add_argument("--repeticoes", type=int, default=1, help="Repetições de cada etapa (vale a menor).")
+    parser.add_argument("--baseline", help="Arquivo JSON da baseline para comparação.")
+    parser.add_argument("--gravar-baseline", action="store_true",
+                        help="Grava o resultado como nova baseline em vez de comparar.")
+    parser.add_argument("--tolerancia-tempo", type=float, default=TOLERANCIA_TEMPO,
+                        help=f"Aumento de tempo tolerado, em fração (padrão: {TOLERANCIA_TEMPO}).")
+    parser.add_argument("--tolerancia-memoria", type=float, default=TOLERANCIA_MEMORIA,
+                        help=f"Aumento do pico de memória tolerado, em fração (padrão: {TOLERANCIA_MEMORIA}).")
+    parser.add_argument("--saida", help="Grava o relatório completo em JSON.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    relatorio = executar_benchmark(args.dados, args.etapas, args.repeticoes)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+    if args.baseline and args.gravar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"Baseline gravada em {args.baseline}.")
+    elif args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressoes = comparar(relatorio, baseline, args.tolerancia_tempo, args.tolerancia_memoria)
+        if regressoes:
+            print("\nREGRESSÕES em relação à baseline:")
+            for regressao in regressoes:
+                print(f"  - {regressao}")
+            sys.exit(1)
+        print("\nSem regressões em relação à baseline.")
+
+
+if __name__ == "__main__":
+    main()
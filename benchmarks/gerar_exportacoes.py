@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Gerador de exportações WBS sintéticas para os benchmarks.
+
+Gera producao.json, previsto.json e planejado.json com a mesma estrutura das
+exportações do sistema:
+
+    producao:  mes_ref -> producao (contratos) -> itens -> producao (trechos, ramais e localizadas)
+    previsto:  contratos -> linear (-> trechos), localizada, ramais, economias
+    planejado: mes_ref -> itens (contratos) -> projecao_prod -> meses
+
+O tamanho de cada arquivo é configurável (de alguns MB a vários GB) e o
+conteúdo depende apenas dos parâmetros (semente, tamanho, taxa de erros), de
+modo que a mesma chamada gera sempre os mesmos arquivos. Uma fração dos
+valores é gerada inválida (nula, vazia, negativa, de outro tipo ou fora das
+opções), para que as regras de validação sejam exercitadas.
+
+Os arquivos são gravados contrato a contrato, sem montar o JSON inteiro em
+memória. Os parâmetros e a lista de contratos integra ficam em
+parametros.json, lido por benchmarks/executar.py. Uso:
+
+    python benchmarks/gerar_exportacoes.py DESTINO --tamanho 50MB [--semente 42]
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import argparse
+import json
+import os
+import random
+import re
+
+# =============================================================================
+# Configurações Globais
+# =============================================================================
+VERSAO_GERADOR = 1
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ARQUIVO_PARAMETROS = 'parametros.json'
+ARQUIVOS = {'producao': 'producao.json', 'previsto': 'previsto.json', 'planejado': 'planejado.json'}
+
+MESES = ['jan', 'fev', 'mar', 'abr', 'mai', 'jun', 'jul', 'ago', 'set', 'out', 'nov', 'dez']
+MATERIAIS = ['PVC', 'PEAD', 'CA', 'MBV', 'FoFo', 'ACO']
+METODOS = ['VCA', 'MND', 'AE']
+DETALHES_METODO = ['HDD', 'VCA', 'FD', 'TC', 'NATM', 'TL', 'TRAVESSIA', 'APOIADO', 'AE']
+TIPOS_CONDUTO = ["RCE", "CT", "IT", "EM", "LR", "IN", "AD", "RD"]
+TIPOS_RAMAL = ['PA', 'TA', 'E', 'TO', 'PO']
+DIAMETROS = [100.0, 150.0, 200.0, 250.0, 300.0, 400.0]
+BAIRROS = ['CENTRO', 'JARDIM AMAZONAS', 'VILA NOVA', 'PARQUE INDUSTRIAL', 'JARDIM DAS FLORES']
+RUAS = ['R. CAMINHO DO PINHEIRINHO', 'R. MACAUBAL', 'AV. BRASIL', 'R. DAS PALMEIRAS', 'R. SETE', 'TV. DO SOL']
+
+_UNIDADES = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def tamanho_em_bytes(texto):
+    """
+    Converte tamanhos como '10MB', '1.5GB' ou '500000' em bytes.
+    """
+    achado = re.fullmatch(r'\s*([\d.]+)\s*([KMG]B)?\s*', texto.upper())
+    if not achado:
+        raise argparse.ArgumentTypeError(f"Tamanho inválido: {texto!r} (ex.: 10MB, 2GB)")
+    return int(float(achado.group(1)) * _UNIDADES.get(achado.group(2), 1))
+
+
+def _carregar_municipios():
+    with open(os.path.join(RAIZ, 'municipios.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# =============================================================================
+# Gerador
+# =============================================================================
+class GeradorExportacoes:
+    """
+    Gera os contratos de cada exportação a partir de um random.Random com
+    semente fixa.
+    """
+    def __init__(self, semente=42, taxa_erros=0.05):
+        self.rng = random.Random(semente)
+        self.taxa_erros = taxa_erros
+        municipios = _carregar_municipios()
+        self.municipios = sorted(municipios)
+        self.cidades = [municipios[cod] for cod in self.municipios]
+
+    def valor(self, valido, invalidos):
+        """
+        Retorna o valor válido ou, com probabilidade taxa_erros, um dos inválidos.
+        """
+        if self.rng.random() < self.taxa_erros:
+            return self.rng.choice(invalidos)
+        return valido
+
+    def contrato(self, numero):
+        return f"{numero + 1:05d}/{24 + numero % 2}"
+
+    def codigo(self, contrato, sequencia):
+        """
+        Código WBS de 20 dígitos: item(8) + D2(2) + D3(2) + Municipio(3) + sequência(5).
+        """
+        municipio = self.municipios[int(contrato[:5]) % len(self.municipios)] if self.rng.random() < 0.8 else "000"
+        item = self.rng.randint(1, 9)
+        return f"{item:02d}010101{item:02d}{self.rng.randint(1, 3):02d}{municipio}{sequencia:05d}"
+
+    def endereco(self):
+        rng = self.rng
+        return f"{rng.choice(self.cidades)}, {rng.choice(BAIRROS)}, {rng.choice(RUAS)}, {rng.randint(1, 2000)}"
+
+    def poco(self):
+        return {"id": f"PV-{self.rng.randint(1, 500)}"}
+
+    # ------------------------------------------------------------------
+    # Produção
+    # ------------------------------------------------------------------
+    def producao_trecho(self):
+        v, rng = self.valor, self.rng
+        return {
+            "jusante": v(self.poco(), [None, "", {"id": 3}]),
+            "montante": v(self.poco(), [None, " "]),
+            "extensao": v(round(rng.uniform(1, 120), 2), [None, -3.0, "x"]),
+            "diametro": v(rng.choice(DIAMETROS), [None, -1, "d"]),
+            "material": v(rng.choice(MATERIAIS), ["XX", None, ""]),
+            "metodo_exec": v(rng.choice(METODOS), ["Q", None, ""]),
+            "endereco": v(self.endereco(), ["", None, 7]),
+        }
+
+    def producao_ramal(self):
+        v = self.valor
+        return {
+            "posicao": v(self.rng.choice(["E", "D"]), [None, "", 1]),
+            "completo": self.rng.random() < 0.5,
+            "endereco": v(self.endereco(), [None, "", 2]),
+        }
+
+    def producao_localizada(self):
+        v = self.valor
+        return {
+            "descricao": v("EEE", [None, "", " ", 4]),
+            "num_inventario": v(str(self.rng.randint(1, 99999)), [None, "", 5]),
+        }
+
+    def contrato_producao(self, numero):
+        rng, v = self.rng, self.valor
+        contrato = self.contrato(numero)
+        itens = []
+        for sequencia in range(rng.randint(1, 30)):
+            detalhes = []
+            for _ in range(rng.choice([0, 0, 1, 2, 3, 5, 8, 15])):
+                sorteio = rng.random()
+                if sorteio < 0.8:
+                    detalhes.append(self.producao_trecho())
+                elif sorteio < 0.9:
+                    detalhes.append(self.producao_ramal())
+                else:
+                    detalhes.append(self.producao_localizada())
+            # O código do item não é validado por tipo (entra na chave 'merged'), então só varia para vazio
+            itens.append({
+                "codigo": v(self.codigo(contrato, sequencia), [""]),
+                "executado": v(round(rng.uniform(0, 1000), 2), [None, -1, -0.0001]),
+                "concluido": rng.random() < 0.3,
+                "producao": detalhes,
+            })
+        return {"contrato": contrato, "itens": itens}
+
+    # ------------------------------------------------------------------
+    # Previsto
+    # ------------------------------------------------------------------
+    def previsto_trecho(self):
+        v, rng = self.valor, self.rng
+        return {
+            "jusante": v(self.poco(), [None, "", {"id": 3}]),
+            "montante": v(self.poco(), [None, " "]),
+            "extensao": v(round(rng.uniform(1, 120), 2), [None, -0.0001, -3, "q"]),
+            "diametro": v(rng.choice(DIAMETROS), [None, -1, "d"]),
+            "material": v(rng.choice(MATERIAIS), ["XX", None, ""]),
+            "metodo_exec": v(rng.choice(METODOS), ["Q", None]),
+            "detalhe_metodo": v(rng.choice(DETALHES_METODO), ["W", None]),
+            "endereco": v(self.endereco(), ["", None, 7]),
+        }
+
+    def contrato_previsto(self, numero):
+        rng, v = self.rng, self.valor
+        contrato = self.contrato(numero)
+        linear = [{
+            "codigo": v(self.codigo(contrato, i), [None, "", 5]),
+            "descricao": v("Rede coletora", ["", None, 3]),
+            "unidade": v("m", [None, 1]),
+            "quant_prevista": v(round(rng.uniform(1, 5000), 2), [None, -1, "x"]),
+            "tipo_conduto": v(rng.choice(TIPOS_CONDUTO), ["ZZ", None, ""]),
+            "PEP": v(f"PEP-{rng.randint(1, 99)}", ["", None]),
+            "valor": v(round(rng.uniform(1, 1e6), 2), [None, -2.0, "a"]),
+            "trechos": [self.previsto_trecho() for _ in range(rng.randint(0, 20))],
+        } for i in range(rng.randint(1, 30))]
+        localizada = [{
+            "codigo": v(self.codigo(contrato, i), [None, ""]),
+            "descricao": v("EEE", ["", None]),
+            "itens": [rng.randint(1, 9) for _ in range(rng.randint(0, 4))],
+            "endereco": v(self.endereco(), [None, ""]),
+            "PEP": f"PEP-{rng.randint(1, 99)}",
+        } for i in range(rng.randint(0, 10))]
+        ramais = [{
+            "codigo": v(self.codigo(contrato, i), [None, ""]),
+            "tipo": v(rng.choice(TIPOS_RAMAL), ["ZZ", None, ""]),
+            "completa": rng.random() < 0.5,
+            "descricao": v("Ramal predial", ["", None]),
+            "quant_prevista": v(rng.randint(1, 500), [None, -1, "x"]),
+            "PEP": f"PEP-{rng.randint(1, 99)}",
+            "valor": v(round(rng.uniform(1, 1e5), 2), [None, -1, "a"]),
+        } for i in range(rng.randint(0, 10))]
+        economias = [{
+            "codigo": v(self.codigo(contrato, i), [None, ""]),
+            "quant_prevista": v(rng.randint(1, 500), [None, -1, "x", 2.5]),
+        } for i in range(rng.randint(0, 10))]
+        return {"contrato": contrato, "linear": linear, "localizada": localizada,
+                "ramais": ramais, "economias": economias}
+
+    # ------------------------------------------------------------------
+    # Planejado
+    # ------------------------------------------------------------------
+    def contrato_planejado(self, numero):
+        rng, v = self.rng, self.valor
+        contrato = self.contrato(numero)
+        projecao_prod = []
+        for i in range(rng.randint(1, 60)):
+            inicio = rng.randrange(len(MESES))
+            meses = [{
+                "mes": v(f"{MESES[(inicio + k) % 12]}/{25 + (inicio + k) // 12}", [None, "", 3]),
+                "quant_projetada": v(round(rng.uniform(0, 500), 2), [None, -5.0, "x"]),
+            } for k in range(rng.choice([1, 1, 2, 3, 4, 6, 12, 24]))]
+            projecao_prod.append({"codigo": self.codigo(contrato, i), "meses": meses})
+        return {"contrato": contrato, "projecao_prod": projecao_prod, "datas_marco": []}
+
+
+# =============================================================================
+# Escrita dos Arquivos
+# =============================================================================
+def escrever_exportacao(caminho, tamanho, gerar_contrato, chave=None, meses_ref=(None,)):
+    """
+    Grava a exportação acrescentando contratos até o arquivo atingir
+    `tamanho` bytes. Com `chave`, os contratos ficam na lista `chave` de um
+    bloco por mes_ref (o tamanho é dividido entre os blocos); sem `chave`,
+    a raiz é a própria lista de contratos. Retorna o número de contratos.
+    """
+    escritos = 0
+    total_contratos = 0
+    with open(caminho, 'wb') as f:
+        def escrever(texto):
+            nonlocal escritos
+            escritos += f.write(texto.encode('utf-8'))
+
+        escrever("[\n")
+        for i, mes_ref in enumerate(meses_ref):
+            if chave is not None:
+                escrever(("," if i else "") + '{"mes_ref": ' + json.dumps(mes_ref, ensure_ascii=False)
+                         + f', "{chave}": [\n')
+            limite = tamanho * (i + 1) / len(meses_ref)
+            numero = 0
+            while numero == 0 or escritos < limite:
+                escrever(("," if numero else "") + json.dumps(gerar_contrato(numero), ensure_ascii=False, indent=4))
+                numero += 1
+            if chave is not None:
+                escrever("]}\n")
+            total_contratos += numero
+        escrever("]\n")
+    return total_contratos
+
+
+def gerar(destino, tamanho, semente=42, taxa_erros=0.05, meses_ref=1, fracao_integra=0.3):
+    """
+    Gera as três exportações e o parametros.json em `destino`. Retorna os parâmetros.
+    """
+    os.makedirs(destino, exist_ok=True)
+    gerador = GeradorExportacoes(semente, taxa_erros)
+    blocos = [f"{MESES[i % 12]}/{25 + i // 12}" for i in range(meses_ref)]
+
+    contratos = {
+        'producao': escrever_exportacao(os.path.join(destino, ARQUIVOS['producao']), tamanho,
+                                        gerador.contrato_producao, 'producao', blocos),
+        'previsto': escrever_exportacao(os.path.join(destino, ARQUIVOS['previsto']), tamanho,
+                                        gerador.contrato_previsto),
+        'planejado': escrever_exportacao(os.path.join(destino, ARQUIVOS['planejado']), tamanho,
+                                         gerador.contrato_planejado, 'itens', blocos),
+    }
+    maior = max(contratos.values())
+    integra = [gerador.contrato(n) for n in range(maior) if gerador.rng.random() < fracao_integra]
+
+    parametros = {
+        'versao_gerador': VERSAO_GERADOR,
+        'semente': semente,
+        'tamanho': tamanho,
+        'taxa_erros': taxa_erros,
+        'meses_ref': meses_ref,
+        'contratos': contratos,
+        'bytes': {nome: os.path.getsize(os.path.join(destino, arquivo)) for nome, arquivo in ARQUIVOS.items()},
+        'contratos_integra': integra,
+    }
+    with open(os.path.join(destino, ARQUIVO_PARAMETROS), 'w', encoding='utf-8') as f:
+        json.dump(parametros, f, ensure_ascii=False, indent=2)
+    return parametros
+
+
+# =============================================================================
+# Execução
+# =============================================================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gera exportações WBS sintéticas (produção, previsto e planejado).")
+    parser.add_argument("destino", help="Pasta onde os arquivos serão gravados.")
+    parser.add_argument("--tamanho", type=tamanho_em_bytes, default=tamanho_em_bytes("10MB"),
+                        help="Tamanho aproximado de cada arquivo (ex.: 10MB, 2GB). Padrão: 10MB.")
+    parser.add_argument("--semente", type=int, default=42, help="Semente do gerador (padrão: 42).")
+    parser.add_argument("--taxa-erros", type=float, default=0.05,
+                        help="Fração dos valores gerados inválidos (padrão: 0.05).")
+    parser.add_argument("--meses-ref", type=int, default=1,
+                        help="Blocos de mes_ref na produção e no planejado (padrão: 1).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    parametros = gerar(args.destino, args.tamanho, args.semente, args.taxa_erros, args.meses_ref)
+    for nome, tamanho in parametros['bytes'].items():
+        print(f"{nome}: {tamanho / 1024 ** 2:.1f} MB, {parametros['contratos'][nome]} contratos")
+
+
+if __name__ == "__main__":
+    main()
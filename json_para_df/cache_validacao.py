@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cache em disco da validação por contrato.
+
+As exportações diárias repetem quase todos os contratos. Cada bloco de
+contrato é identificado por um hash estável do seu conteúdo (e da versão das
+regras de validação); se o mesmo bloco já foi validado em uma execução
+anterior, os DataFrames com 'errors'/'is_ok' são reaproveitados do disco e
+só os contratos alterados são processados novamente.
+
+O cache tem tamanho máximo em bytes e descarta as entradas usadas há mais
+tempo (LRU, pela data de modificação dos arquivos).
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+from json_para_df.instrumentacao import contar, medir
+from json_para_df.paralelo import concatenar_resultados, processar_individualmente
+
+# =============================================================================
+# Configurações Globais
+# =============================================================================
+TAMANHO_MAXIMO_PADRAO = 512 * 1024 * 1024  # bytes
+EXTENSAO = '.pkl'
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+class CacheValidacao:
+    """
+    Guarda tuplas de DataFrames em arquivos pickle nomeados pelo hash do
+    conteúdo que as originou.
+    """
+    def __init__(self, diretorio, tamanho_maximo=TAMANHO_MAXIMO_PADRAO):
+        self.diretorio = diretorio
+        self.tamanho_maximo = tamanho_maximo
+        os.makedirs(diretorio, exist_ok=True)
+        self._tamanho_atual = sum(tamanho for _, _, tamanho in self._entradas())
+
+    @staticmethod
+    def chave(*partes):
+        """
+        Hash estável (independe da ordem das chaves dos dicionários) das partes informadas.
+        """
+        texto = json.dumps(partes, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave + EXTENSAO)
+
+    def _entradas(self):
+        """
+        Lista (caminho, mtime, tamanho) das entradas do cache.
+        """
+        entradas = []
+        for entrada in os.scandir(self.diretorio):
+            if entrada.is_file() and entrada.name.endswith(EXTENSAO):
+                info = entrada.stat()
+                entradas.append((entrada.path, info.st_mtime, info.st_size))
+        return entradas
+
+    def obter(self, chave):
+        """
+        Retorna o valor guardado para a chave, ou None se não existir.
+        """
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, 'rb') as f:
+                valor = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            logging.warning(f"Entrada de cache inválida descartada ({caminho}): {e}")
+            self._remover(caminho)
+            return None
+        # Marca a entrada como usada recentemente
+        os.utime(caminho)
+        return valor
+
+    def guardar(self, chave, valor):
+        """
+        Grava o valor no cache e descarta as entradas menos usadas se o
+        tamanho máximo for ultrapassado.
+        """
+        caminho = self._caminho(chave)
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+        anterior = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+        os.replace(temporario, caminho)
+        self._tamanho_atual += os.path.getsize(caminho) - anterior
+
+        if self._tamanho_atual > self.tamanho_maximo:
+            self.liberar_espaco()
+
+    def liberar_espaco(self):
+        """
+        Remove as entradas usadas há mais tempo até o cache caber no tamanho máximo.
+        """
+        entradas = sorted(self._entradas(), key=lambda entrada: entrada[1])
+        self._tamanho_atual = sum(tamanho for _, _, tamanho in entradas)
+        for caminho, _, tamanho in entradas:
+            if self._tamanho_atual <= self.tamanho_maximo:
+                break
+            self._remover(caminho)
+
+    def _remover(self, caminho):
+        try:
+            tamanho = os.path.getsize(caminho)
+            os.remove(caminho)
+            self._tamanho_atual -= tamanho
+        except FileNotFoundError:
+            pass
+
+
+# =============================================================================
+# Processamento com Cache
+# =============================================================================
+def processar_com_cache(cache, versao, blocos, funcao, workers=1):
+    """
+    Equivalente a json_para_df.paralelo.processar_por_contrato, mas reaproveita
+    do cache os contratos cujo conteúdo (e `versao` das regras) não mudou.
+    Os contratos restantes são validados um a um (em até `workers` processos)
+    e gravados no cache.
+    """
+    if not blocos:
+        return funcao(blocos)
+
+    with medir('cache_leitura', len(blocos)):
+        chaves = [cache.chave(versao, bloco) for bloco in blocos]
+        resultados = [cache.obter(chave) for chave in chaves]
+    faltantes = [i for i, resultado in enumerate(resultados) if resultado is None]
+
+    logging.info(f"Cache de validação: {len(blocos) - len(faltantes)} de {len(blocos)} contratos reaproveitados.")
+    contar('cache_validacao.reaproveitados', len(blocos) - len(faltantes))
+    contar('cache_validacao.processados', len(faltantes))
+
+    novos = processar_individualmente(funcao, [blocos[i] for i in faltantes], workers)
+    for i, resultado in zip(faltantes, novos):
+        cache.guardar(chaves[i], resultado)
+        resultados[i] = resultado
+
+    return concatenar_resultados(resultados)
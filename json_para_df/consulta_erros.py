@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Consulta paginada das linhas com erro.
+
+O IndiceErros é montado uma vez por DataFrame: guarda as posições das
+linhas com erro, os códigos (factorize) de contrato e codigo dessas linhas e,
+para cada campo citado nos erros, a máscara das linhas em que ele aparece.
+Cada consulta combina essas máscaras e devolve só a página pedida, de modo
+que o custo de exibir uma página não depende do total de erros.
+
+O CacheIndices guarda os índices já montados em memória, limitados pela
+idade e pelo tamanho total dos DataFrames.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# Configurações Globais
+# =============================================================================
+TAMANHO_PAGINA = 100
+TTL_INDICES = 60 * 60                 # segundos até um índice ser descartado
+LIMITE_MEMORIA_INDICES = 2 * 1024**3  # bytes somados dos DataFrames em cache
+COLUNAS_FILTRO = ('contrato', 'codigo')
+
+# Mensagens de previsto/planejado: 'Campo: <nome>, ...' ou 'Campo: <nome> não pode ser nulo'
+_CAMPO_MENSAGEM = re.compile(r'^Campo: ([^,\s]+)')
+
+
+def campo_do_erro(erro):
+    """
+    Nome do campo de um erro, nos formatos de produção (dicionário com
+    'campo') e de previsto/planejado (mensagem 'Campo: <nome>, ...').
+    """
+    if isinstance(erro, dict):
+        return erro.get('campo')
+    achado = _CAMPO_MENSAGEM.match(str(erro))
+    return achado.group(1) if achado else None
+
+
+# =============================================================================
+# Índice de Erros
+# =============================================================================
+class IndiceErros:
+    """
+    Índice das linhas com erro de um DataFrame validado.
+
+    Por padrão as linhas selecionadas são as com is_ok falso; `mascara`
+    permite outro critério (ex.: erros ou duplicados).
+    """
+    def __init__(self, df, mascara=None):
+        self.df = df
+        if mascara is None:
+            mascara = ~df['is_ok'] if 'is_ok' in df.columns else np.zeros(len(df), dtype=bool)
+        self.posicoes = np.flatnonzero(np.asarray(mascara, dtype=bool))
+
+        # Códigos por valor de contrato e codigo, apenas nas linhas com erro
+        self._codigos = {}
+        self._valores = {}
+        for coluna in COLUNAS_FILTRO:
+            if coluna in df.columns:
+                codigos, unicos = pd.factorize(df[coluna].to_numpy(dtype=object)[self.posicoes])
+                self._codigos[coluna] = codigos
+                self._valores[coluna] = {valor: i for i, valor in enumerate(unicos)}
+
+        self._campos = self._indexar_campos()
+
+    def _indexar_campos(self):
+        """
+        Máscara, sobre as linhas com erro, de cada campo citado nos erros.
+        """
+        if 'errors' not in self.df.columns:
+            return {}
+        linhas = {}
+        erros = self.df['errors'].to_numpy(dtype=object)[self.posicoes]
+        for i, erros_linha in enumerate(erros):
+            if erros_linha is None or (isinstance(erros_linha, float) and np.isnan(erros_linha)):
+                continue
+            for erro in erros_linha:
+                campo = campo_do_erro(erro)
+                if campo is not None:
+                    linhas.setdefault(campo, []).append(i)
+
+        campos = {}
+        for campo, indices in linhas.items():
+            mascara = np.zeros(len(self.posicoes), dtype=bool)
+            mascara[indices] = True
+            campos[campo] = mascara
+        return campos
+
+    def __len__(self):
+        return len(self.posicoes)
+
+    def memoria(self):
+        """
+        Bytes ocupados pelo DataFrame e pelas estruturas do índice.
+        """
+        tamanho = int(self.df.memory_usage(deep=True).sum()) + self.posicoes.nbytes
+        tamanho += sum(codigos.nbytes for codigos in self._codigos.values())
+        return tamanho + sum(mascara.nbytes for mascara in self._campos.values())
+
+    def opcoes(self, coluna):
+        """
+        Valores distintos de contrato/codigo nas linhas com erro, ordenados.
+        """
+        return sorted(self._valores.get(coluna, {}), key=str)
+
+    @property
+    def campos(self):
+        """
+        Campos citados nos erros, ordenados.
+        """
+        return sorted(self._campos)
+
+    def filtrar(self, contrato=None, codigo=None, campo=None):
+        """
+        Posições (no DataFrame original) das linhas com erro que atendem aos
+        filtros informados; None ignora o filtro.
+        """
+        selecao = np.ones(len(self.posicoes), dtype=bool)
+        for coluna, valor in zip(COLUNAS_FILTRO, (contrato, codigo)):
+            if valor is None:
+                continue
+            codigo_valor = self._valores.get(coluna, {}).get(valor)
+            if codigo_valor is None:
+                return self.posicoes[:0]
+            selecao &= self._codigos[coluna] == codigo_valor
+        if campo is not None:
+            if campo not in self._campos:
+                return self.posicoes[:0]
+            selecao &= self._campos[campo]
+        return self.posicoes[selecao]
+
+    def pagina(self, numero=0, tamanho=TAMANHO_PAGINA, colunas=None, **filtros):
+        """
+        Retorna (DataFrame da página `numero`, total de linhas filtradas).
+        Apenas as linhas da página são copiadas do DataFrame original.
+        """
+        posicoes = self.filtrar(**filtros)
+        inicio = max(numero, 0) * tamanho
+        df_pagina = self.df.iloc[posicoes[inicio:inicio + tamanho]]
+        if colunas:
+            df_pagina = df_pagina[colunas]
+        return df_pagina, len(posicoes)
+
+
+# =============================================================================
+# Cache dos Índices
+# =============================================================================
+class CacheIndices:
+    """
+    Cache em memória de tuplas de IndiceErros, do mais para o menos recente.
+    As entradas expiram após `ttl` segundos e as menos usadas são descartadas
+    quando a memória somada (IndiceErros.memoria) passa de `limite_bytes`; a
+    entrada mais recente é mantida mesmo se sozinha passar do limite.
+    """
+    def __init__(self, ttl=TTL_INDICES, limite_bytes=LIMITE_MEMORIA_INDICES, relogio=time.monotonic):
+        self.ttl = ttl
+        self.limite_bytes = limite_bytes
+        self._relogio = relogio
+        self._entradas = OrderedDict()  # chave -> (expira, tamanho, indices)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    @property
+    def memoria(self):
+        return sum(tamanho for _, tamanho, _ in self._entradas.values())
+
+    def obter(self, chave, montar):
+        """
+        Retorna os índices da chave, chamando montar() (fora do lock) se não
+        estiverem em cache ou tiverem expirado.
+        """
+        with self._lock:
+            self._remover_expiradas()
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                return self._entradas[chave][2]
+
+        indices = montar()
+        tamanho = sum(indice.memoria() for indice in indices)
+        with self._lock:
+            self._entradas[chave] = (self._relogio() + self.ttl, tamanho, indices)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > 1 and self.memoria > self.limite_bytes:
+                self._entradas.popitem(last=False)
+        return indices
+
+    def _remover_expiradas(self):
+        agora = self._relogio()
+        for chave in [chave for chave, (expira, _, _) in self._entradas.items() if expira <= agora]:
+            del self._entradas[chave]
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Verificação dos endereços da produção contra o cadastro do ArcGIS.
+
+Os endereços da produção têm o formato "MUNICÍPIO, BAIRRO, LOGRADOURO,
+NÚMERO" (às vezes sem o bairro ou sem o número), enquanto o cadastro tem
+MUNICIPIO, BAIRRO e LOGRADOURO em colunas separadas e sem número. Por isso
+a comparação é feita só por município + logradouro, normalizados do mesmo
+jeito dos dois lados (ver chave_logradouro): sem acentos e pontuação, sem o
+tipo do logradouro no início ("R.", "Av.", "Estrada"...) e sem o número.
+
+O índice guarda, como hashes de 64 bits ordenados, essas chaves e os pares
+(WBS, chave). Ele é montado uma vez a partir de arcgis.create_enderecos_df
+e gravado em disco; a cada execução os trechos e ramais são verificados em
+bloco, com uma busca binária por linha.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import logging
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from arcgis import ARCGIS_CACHE_DIR, TTL_CACHE, create_enderecos_df, normalizar_endereco
+
+# =============================================================================
+# Configurações Globais
+# =============================================================================
+CAMINHO_INDICE = os.path.join(ARCGIS_CACHE_DIR, "indice_enderecos.npz")
+# Incrementar quando as chaves mudarem, para que índices antigos sejam refeitos
+VERSAO_INDICE = 2
+SEPARADOR_PAR = "\x1f"
+SEPARADOR_CHAVE = "|"
+
+# Tipos de logradouro (já normalizados, sem pontuação) removidos do início do nome
+TIPOS_LOGRADOURO = ['r', 'rua', 'av', 'avenida', 'estr', 'est', 'estrada', 'tv', 'trav', 'travessa', 'al',
+                    'alameda', 'pc', 'pca', 'praca', 'rod', 'rodovia', 'vl', 'viela', 'ps', 'pass', 'passagem',
+                    'lg', 'largo', 'vd', 'viaduto']
+_TIPO_LOGRADOURO = re.compile(r'^(?:%s)\s+' % '|'.join(TIPOS_LOGRADOURO))
+# Número da casa: "12", "12a", "n 12", "s/n"
+_NUMERO = r'(?:n\s*)?\d+[a-z]?|s\s*/?\s*n'
+_PARTE_NUMERO = re.compile(r'^(?:%s)$' % _NUMERO)
+_NUMERO_FINAL = re.compile(r'(?<=\S)\s+(?:%s)$' % _NUMERO)
+_PONTUACAO = re.compile(r'[.:;]')
+
+# Valores da coluna de resultado
+MESMO_WBS = "encontrado no WBS"
+OUTRO_WBS = "encontrado em outro WBS"
+NAO_ENCONTRADO = "não encontrado"
+INCOMPLETO = "endereço incompleto"
+
+
+# =============================================================================
+# Funções Auxiliares
+# =============================================================================
+def normalizar_wbs(codigos):
+    """
+    Códigos WBS só com letras e números (remove pontos, traços e espaços).
+    """
+    return pd.Series(codigos, dtype=object).astype(str).str.replace(r'[^0-9A-Za-z]', '', regex=True)
+
+
+def chave_logradouro(logradouro):
+    """
+    Nome do logradouro já normalizado (arcgis.normalizar_endereco) sem
+    pontuação, sem o tipo no início e sem o número no fim.
+    ("r. camillo zanotti 299" e "rua camillo zanotti" -> "camillo zanotti").
+    """
+    texto = " ".join(_PONTUACAO.sub(" ", logradouro).split())
+    texto = _TIPO_LOGRADOURO.sub("", texto, count=1)
+    return _NUMERO_FINAL.sub("", texto).strip()
+
+
+def _chave(municipio, logradouro):
+    logradouro = chave_logradouro(logradouro)
+    return municipio + SEPARADOR_CHAVE + logradouro if municipio and logradouro else ""
+
+
+def _chave_producao(endereco):
+    """
+    Chave de um endereço da produção normalizado ("municipio, bairro,
+    logradouro, numero"): as partes finais que são números são descartadas e
+    o logradouro é a última parte restante. Sem logradouro identificável
+    (ex.: só "municipio" ou "municipio, bairro") a chave é "".
+    """
+    partes = [parte.strip() for parte in endereco.split(",")]
+    numeros = 0
+    while partes and _PARTE_NUMERO.match(partes[-1]):
+        partes.pop()
+        numeros += 1
+    if len(partes) < 3 and not (len(partes) == 2 and numeros):
+        return ""
+    return _chave(partes[0], partes[-1])
+
+
+def _aplicar_unicos(valores, funcao):
+    """
+    Aplica `funcao` uma vez por valor distinto (não nulo) de `valores`.
+    """
+    codigos, unicos = pd.factorize(pd.Series(valores, dtype=object))
+    resultados = np.array([funcao(valor) for valor in unicos] + [None], dtype=object)
+    return resultados[codigos]
+
+
+def chaves_producao(enderecos):
+    """
+    Chaves (municipio|logradouro) dos endereços da produção: None para
+    endereços nulos ou vazios e "" para endereços sem logradouro.
+    """
+    normalizados = normalizar_endereco(pd.Series(enderecos, dtype=object))
+    normalizados = normalizados.where(normalizados != "", None)
+    return _aplicar_unicos(normalizados, _chave_producao)
+
+
+def chaves_cadastro(municipios, logradouros):
+    """
+    Chaves (municipio|logradouro) das linhas do cadastro ("" sem município
+    ou logradouro).
+    """
+    municipios = normalizar_endereco(pd.Series(municipios, dtype=object)).fillna("").to_numpy(dtype=object)
+    logradouros = normalizar_endereco(pd.Series(logradouros, dtype=object)).fillna("").to_numpy(dtype=object)
+    pares = municipios + SEPARADOR_PAR + logradouros
+    return _aplicar_unicos(pares, lambda par: _chave(*par.split(SEPARADOR_PAR)))
+
+
+def _hashes(chaves):
+    return pd.util.hash_array(np.asarray(chaves, dtype=object))
+
+
+def _hashes_pares(codigos, chaves):
+    pares = normalizar_wbs(codigos).to_numpy(dtype=object) + SEPARADOR_PAR + np.asarray(chaves, dtype=object)
+    return _hashes(pares)
+
+
+def _contem(ordenados, hashes):
+    """
+    Máscara dos hashes presentes no array ordenado.
+    """
+    if len(ordenados) == 0:
+        return np.zeros(len(hashes), dtype=bool)
+    posicoes = np.minimum(np.searchsorted(ordenados, hashes), len(ordenados) - 1)
+    return ordenados[posicoes] == hashes
+
+
+# =============================================================================
+# Índice de Endereços
+# =============================================================================
+class IndiceEnderecos:
+    """
+    Hashes ordenados das chaves dos endereços cadastrados e dos pares
+    (WBS, chave).
+    """
+    def __init__(self, enderecos, pares):
+        self.enderecos = np.asarray(enderecos, dtype=np.uint64)
+        self.pares = np.asarray(pares, dtype=np.uint64)
+
+    @classmethod
+    def de_dataframe(cls, df, coluna_municipio='MUNICIPIO', coluna_logradouro='LOGRADOURO',
+                     coluna_wbs='WBS_TEXT'):
+        """
+        Monta o índice a partir do DataFrame de create_enderecos_df.
+        """
+        chaves = chaves_cadastro(df[coluna_municipio], df[coluna_logradouro])
+        validos = chaves != ""
+        chaves = chaves[validos]
+        enderecos = np.unique(_hashes(chaves))
+        if coluna_wbs in df.columns:
+            pares = np.unique(_hashes_pares(df[coluna_wbs].to_numpy(dtype=object)[validos], chaves))
+        else:
+            pares = np.empty(0, dtype=np.uint64)
+        return cls(enderecos, pares)
+
+    def salvar(self, caminho=CAMINHO_INDICE):
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        temporario = caminho + ".tmp.npz"
+        np.savez(temporario, enderecos=self.enderecos, pares=self.pares, versao=VERSAO_INDICE)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho=CAMINHO_INDICE):
+        """
+        Lê o índice gravado; retorna None se ele for de outra VERSAO_INDICE.
+        """
+        with np.load(caminho) as dados:
+            if 'versao' not in dados or int(dados['versao']) != VERSAO_INDICE:
+                return None
+            return cls(dados['enderecos'], dados['pares'])
+
+    def verificar(self, df, coluna_endereco='endereco', coluna_codigo='codigo'):
+        """
+        Retorna a situação de cada endereço do DataFrame no cadastro:
+        MESMO_WBS, OUTRO_WBS, NAO_ENCONTRADO ou INCOMPLETO, quando não há
+        logradouro para comparar (None para endereços nulos ou vazios, que já
+        são apontados pela validação dos campos).
+        """
+        resultado = np.full(len(df), None, dtype=object)
+        if df.empty or coluna_endereco not in df.columns:
+            return pd.Series(resultado, index=df.index, dtype=object)
+
+        chaves = chaves_producao(df[coluna_endereco])
+        resultado[chaves == ""] = INCOMPLETO
+        validos = np.array([chave is not None and chave != "" for chave in chaves], dtype=bool)
+        chaves = chaves[validos]
+
+        situacao = np.full(len(chaves), NAO_ENCONTRADO, dtype=object)
+        situacao[_contem(self.enderecos, _hashes(chaves))] = OUTRO_WBS
+        if coluna_codigo in df.columns:
+            codigos = df[coluna_codigo].to_numpy(dtype=object)[validos]
+            situacao[_contem(self.pares, _hashes_pares(codigos, chaves))] = MESMO_WBS
+
+        resultado[validos] = situacao
+        return pd.Series(resultado, index=df.index, dtype=object)
+
+
+def carregar_indice_enderecos(caminho=CAMINHO_INDICE, ttl=TTL_CACHE):
+    """
+    Carrega o índice gravado, ou o reconstrói a partir das camadas do ArcGIS
+    (que têm cache próprio) se ele não existir ou tiver mais de `ttl` segundos.
+    """
+    if os.path.exists(caminho) and time.time() - os.path.getmtime(caminho) < ttl:
+        indice = IndiceEnderecos.carregar(caminho)
+        if indice is not None:
+            return indice
+
+    logging.info("Montando o índice de endereços do cadastro ArcGIS.")
+    indice = IndiceEnderecos.de_dataframe(create_enderecos_df())
+    indice.salvar(caminho)
+    logging.info(f"Índice de endereços gravado em {caminho} ({len(indice.enderecos)} endereços).")
+    return indice
+
+
+def marcar_enderecos(indice, *tabelas, coluna='endereco_cadastro'):
+    """
+    Acrescenta a coluna com a situação do endereço no cadastro em cada
+    DataFrame (ex.: trechos e ramais de produção).
+    """
+    for df in tabelas:
+        if not df.empty:
+            df[coluna] = indice.verificar(df)
+    return tabelas
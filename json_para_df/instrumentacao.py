@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Instrumentação das etapas do processamento.
+
+Cada etapa (carga do JSON, extração, montagem dos DataFrames, validação,
+duplicados, consulta ao banco, planilhas do Excel...) é envolvida por
+medir(nome), ou decorada com instrumentar(nome), que registra o tempo de
+relógio, as linhas processadas e, opcionalmente, o pico de memória alocada
+(tracemalloc). Etapas aninhadas são nomeadas pelo caminho (ex.:
+'producao/validacao'), e chamadas repetidas da mesma etapa são somadas.
+contar(nome) mantém contadores avulsos.
+
+A instrumentação fica desligada por padrão: medir() devolve então um objeto
+nulo compartilhado e contar() retorna de imediato, de modo que o custo é o
+de uma chamada de função. Com ativar(), o resumo da execução pode ser gravado
+em JSON (gravar_json) e no formato textfile do Prometheus (gravar_prometheus).
+
+Só as etapas executadas no processo atual são registradas: com workers > 1,
+o que roda nos processos auxiliares entra apenas no tempo da etapa externa.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# =============================================================================
+# Configurações Globais
+# =============================================================================
+PREFIXO_PROMETHEUS = 'verificador_json'
+SEPARADOR = '/'
+
+_estado = {'ativo': False, 'memoria': False, 'tracemalloc_proprio': False, 'inicio': None}
+_etapas = {}
+_contadores = {}
+_trava = threading.Lock()
+_local = threading.local()
+
+
+def _pilha():
+    pilha = getattr(_local, 'pilha', None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    return pilha
+
+
+# =============================================================================
+# Ativação
+# =============================================================================
+def ativar(memoria=False):
+    """
+    Liga a instrumentação. Com memoria=True o pico de memória de cada etapa é
+    medido com tracemalloc, o que deixa o processamento bem mais lento (os
+    tempos registrados passam a incluir esse custo).
+    """
+    _estado['ativo'] = True
+    _estado['memoria'] = memoria
+    if _estado['inicio'] is None:
+        _estado['inicio'] = time.time()
+    if memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _estado['tracemalloc_proprio'] = True
+
+
+def desativar():
+    _estado['ativo'] = False
+    if _estado['tracemalloc_proprio']:
+        tracemalloc.stop()
+        _estado['tracemalloc_proprio'] = False
+
+
+def ativo():
+    return _estado['ativo']
+
+
+def reiniciar():
+    """
+    Descarta as medidas e os contadores acumulados.
+    """
+    with _trava:
+        _etapas.clear()
+        _contadores.clear()
+        _estado['inicio'] = time.time() if _estado['ativo'] else None
+
+
+# =============================================================================
+# Medidas
+# =============================================================================
+class _MedidaNula:
+    """
+    Usada quando a instrumentação está desligada.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def adicionar_linhas(self, quantidade):
+        pass
+
+
+_MEDIDA_NULA = _MedidaNula()
+
+
+class _Medida:
+    __slots__ = ('nome', 'linhas', 'inicio', 'memoria_inicial', 'pico')
+
+    def __init__(self, nome, linhas=None):
+        self.nome = nome
+        self.linhas = linhas
+        self.memoria_inicial = None
+        self.pico = 0
+
+    def adicionar_linhas(self, quantidade):
+        self.linhas = (self.linhas or 0) + quantidade
+
+    def __enter__(self):
+        pilha = _pilha()
+        if pilha:
+            self.nome = pilha[-1].nome + SEPARADOR + self.nome
+        if _estado['memoria'] and tracemalloc.is_tracing():
+            atual, pico = tracemalloc.get_traced_memory()
+            # O pico é global: guarda o da etapa externa antes de reiniciá-lo
+            if pilha:
+                pilha[-1].pico = max(pilha[-1].pico, pico)
+            tracemalloc.reset_peak()
+            self.memoria_inicial = self.pico = atual
+        pilha.append(self)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self.inicio
+        pilha = _pilha()
+        pilha.pop()
+        pico_bytes = None
+        if self.memoria_inicial is not None and tracemalloc.is_tracing():
+            pico = max(self.pico, tracemalloc.get_traced_memory()[1])
+            pico_bytes = pico - self.memoria_inicial
+            if pilha:
+                pilha[-1].pico = max(pilha[-1].pico, pico)
+        _registrar(self.nome, segundos, self.linhas, pico_bytes)
+        return False
+
+
+def _registrar(nome, segundos, linhas, pico_bytes):
+    with _trava:
+        etapa = _etapas.get(nome)
+        if etapa is None:
+            etapa = _etapas[nome] = {'chamadas': 0, 'segundos': 0.0, 'linhas': None, 'pico_bytes': None}
+        etapa['chamadas'] += 1
+        etapa['segundos'] += segundos
+        if linhas is not None:
+            etapa['linhas'] = (etapa['linhas'] or 0) + linhas
+        if pico_bytes is not None:
+            etapa['pico_bytes'] = max(etapa['pico_bytes'] or 0, pico_bytes)
+
+
+def medir(nome, linhas=None):
+    """
+    Context manager que mede a etapa `nome`. As linhas processadas podem ser
+    informadas já na entrada (`linhas`) ou durante a etapa, com
+    adicionar_linhas() no objeto devolvido:
+
+        with medir('extracao') as medida:
+            ...
+            medida.adicionar_linhas(len(linhas))
+    """
+    if not _estado['ativo']:
+        return _MEDIDA_NULA
+    return _Medida(nome, linhas)
+
+
+def instrumentar(nome):
+    """
+    Decorador equivalente a envolver toda a função em medir(nome).
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not _estado['ativo']:
+                return funcao(*args, **kwargs)
+            with _Medida(nome):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def contar(nome, quantidade=1):
+    """
+    Soma `quantidade` ao contador `nome`.
+    """
+    if not _estado['ativo']:
+        return
+    with _trava:
+        _contadores[nome] = _contadores.get(nome, 0) + quantidade
+
+
+# =============================================================================
+# Resumo da Execução
+# =============================================================================
+def resumo():
+    """
+    Dicionário com o início e a duração da execução, as etapas (chamadas,
+    segundos, linhas, linhas por segundo e pico de memória) e os contadores.
+    """
+    with _trava:
+        etapas = {nome: dict(dados) for nome, dados in _etapas.items()}
+        contadores = dict(_contadores)
+    for dados in etapas.values():
+        dados['segundos'] = round(dados['segundos'], 6)
+        if dados['linhas'] is not None and dados['segundos'] > 0:
+            dados['linhas_por_s'] = round(dados['linhas'] / dados['segundos'], 1)
+
+    inicio = _estado['inicio']
+    return {
+        'inicio': datetime.fromtimestamp(inicio).isoformat(timespec='seconds') if inicio else None,
+        'duracao_s': round(time.time() - inicio, 3) if inicio else None,
+        'memoria': _estado['memoria'],
+        'etapas': etapas,
+        'contadores': contadores,
+    }
+
+
+def _gravar(caminho, texto):
+    # Gravação atômica, para que o coletor nunca leia um arquivo pela metade
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(temporario, caminho)
+
+
+def gravar_json(caminho):
+    _gravar(caminho, json.dumps(resumo(), ensure_ascii=False, indent=2))
+
+
+def _rotulo(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def formato_prometheus(dados=None):
+    """
+    Resumo no formato de exposição de texto do Prometheus (para o textfile
+    collector do node_exporter).
+    """
+    dados = dados or resumo()
+    metricas = [
+        ('etapa_segundos', 'Tempo de relógio acumulado da etapa, em segundos.', 'segundos'),
+        ('etapa_chamadas', 'Quantidade de execuções da etapa.', 'chamadas'),
+        ('etapa_linhas', 'Linhas processadas pela etapa.', 'linhas'),
+        ('etapa_pico_memoria_bytes', 'Maior pico de memória alocada pela etapa (tracemalloc).', 'pico_bytes'),
+    ]
+    linhas = []
+    for nome, ajuda, chave in metricas:
+        valores = [(etapa, d[chave]) for etapa, d in dados['etapas'].items() if d.get(chave) is not None]
+        if not valores:
+            continue
+        linhas += [f"# HELP {PREFIXO_PROMETHEUS}_{nome} {ajuda}", f"# TYPE {PREFIXO_PROMETHEUS}_{nome} gauge"]
+        linhas += [f'{PREFIXO_PROMETHEUS}_{nome}{{etapa="{_rotulo(etapa)}"}} {valor}' for etapa, valor in valores]
+
+    if dados['contadores']:
+        linhas += [f"# HELP {PREFIXO_PROMETHEUS}_contador Contadores da execução.",
+                   f"# TYPE {PREFIXO_PROMETHEUS}_contador gauge"]
+        linhas += [f'{PREFIXO_PROMETHEUS}_contador{{nome="{_rotulo(nome)}"}} {valor}'
+                   for nome, valor in dados['contadores'].items()]
+
+    if dados['duracao_s'] is not None:
+        linhas += [f"# HELP {PREFIXO_PROMETHEUS}_execucao_segundos Duração da execução, em segundos.",
+                   f"# TYPE {PREFIXO_PROMETHEUS}_execucao_segundos gauge",
+                   f"{PREFIXO_PROMETHEUS}_execucao_segundos {dados['duracao_s']}",
+                   f"# HELP {PREFIXO_PROMETHEUS}_execucao_timestamp_segundos Fim da execução (Unix).",
+                   f"# TYPE {PREFIXO_PROMETHEUS}_execucao_timestamp_segundos gauge",
+                   f"{PREFIXO_PROMETHEUS}_execucao_timestamp_segundos {time.time():.0f}"]
+    return "\n".join(linhas) + "\n"
+
+
+def gravar_prometheus(caminho):
+    _gravar(caminho, formato_prometheus())
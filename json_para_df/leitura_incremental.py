@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Leitura incremental de exportações JSON.
+
+Em vez de carregar o arquivo inteiro com json.load, o arquivo é lido em
+pedaços e apenas os registros folha da hierarquia (ex.: os itens de cada
+contrato) são decodificados, um de cada vez. Os campos escalares dos níveis
+superiores (mes_ref, contrato, ...) são repassados como contexto.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import json
+import re
+
+import pandas as pd
+
+# =============================================================================
+# Configurações Globais
+# =============================================================================
+TAMANHO_LEITURA = 1 << 16      # caracteres lidos do arquivo por vez
+TAMANHO_BLOCO_PADRAO = 50_000  # linhas acumuladas antes de virar DataFrame
+
+_NAO_ESPACO = re.compile(r'\S')
+
+
+# =============================================================================
+# Leitor Incremental
+# =============================================================================
+class LeitorIncremental:
+    """
+    Percorre um documento JSON cuja raiz é uma lista, descendo apenas pelas
+    chaves indicadas em `caminho` e devolvendo os registros folha.
+
+    `caminho` é um dicionário aninhado: cada chave é o nome de uma lista a ser
+    percorrida e o valor é o caminho dentro de cada elemento dessa lista
+    (None indica que os elementos são os registros a serem devolvidos). Ex.:
+
+        {'producao': {'itens': None}}
+
+    percorre mes_ref -> producao -> itens e devolve cada item.
+
+    Os campos escalares só entram no contexto se aparecerem antes da lista
+    percorrida no objeto, como acontece nas exportações do sistema.
+    """
+    def __init__(self, arquivo, tamanho_leitura=TAMANHO_LEITURA):
+        self._arquivo = arquivo
+        self._tamanho_leitura = tamanho_leitura
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._fim = False
+
+    def _carregar(self, tamanho=None):
+        """
+        Lê mais um pedaço do arquivo, descartando o que já foi consumido.
+        Retorna False quando o arquivo termina.
+        """
+        if self._fim:
+            return False
+        pedaco = self._arquivo.read(tamanho or self._tamanho_leitura)
+        if not pedaco:
+            self._fim = True
+            return False
+        self._buffer = self._buffer[self._pos:] + pedaco
+        self._pos = 0
+        return True
+
+    def _espiar(self):
+        """
+        Retorna o próximo caractere que não seja espaço, sem consumi-lo
+        (None no fim do arquivo).
+        """
+        while True:
+            achado = _NAO_ESPACO.search(self._buffer, self._pos)
+            if achado:
+                self._pos = achado.start()
+                return self._buffer[self._pos]
+            self._pos = len(self._buffer)
+            if not self._carregar():
+                return None
+
+    def _consumir(self, esperado):
+        char = self._espiar()
+        if char != esperado:
+            raise json.JSONDecodeError(f"Esperado '{esperado}', encontrado {char!r}", self._buffer, self._pos)
+        self._pos += 1
+
+    def ler_valor(self):
+        """
+        Decodifica o próximo valor JSON completo, lendo mais do arquivo enquanto
+        o valor estiver incompleto no buffer.
+        """
+        self._espiar()
+        while True:
+            try:
+                valor, fim = self._decoder.raw_decode(self._buffer, self._pos)
+                # Um número no final do buffer pode continuar no próximo pedaço
+                if fim < len(self._buffer) or self._fim:
+                    self._pos = fim
+                    return valor
+            except json.JSONDecodeError:
+                if self._fim:
+                    raise
+            # Dobra a leitura para que valores grandes não sejam redecodificados muitas vezes
+            self._carregar(max(self._tamanho_leitura, len(self._buffer)))
+
+    def _percorrer_lista(self, caminho, chave, contexto):
+        self._consumir('[')
+        if self._espiar() == ']':
+            self._pos += 1
+            return
+        while True:
+            if caminho is None:
+                yield chave, contexto, self.ler_valor()
+            else:
+                yield from self._percorrer_objeto(caminho, contexto)
+
+            separador = self._espiar()
+            self._pos += 1
+            if separador == ']':
+                return
+            if separador != ',':
+                raise json.JSONDecodeError("Esperado ',' ou ']'", self._buffer, self._pos - 1)
+
+    def _percorrer_objeto(self, caminho, contexto):
+        contexto = dict(contexto)
+        self._consumir('{')
+        if self._espiar() == '}':
+            self._pos += 1
+            return
+        while True:
+            chave = self.ler_valor()
+            self._consumir(':')
+            if chave in caminho and self._espiar() == '[':
+                yield from self._percorrer_lista(caminho[chave], chave, contexto)
+            else:
+                valor = self.ler_valor()
+                if not isinstance(valor, (dict, list)):
+                    contexto[chave] = valor
+
+            separador = self._espiar()
+            self._pos += 1
+            if separador == '}':
+                return
+            if separador != ',':
+                raise json.JSONDecodeError("Esperado ',' ou '}'", self._buffer, self._pos - 1)
+
+    def percorrer(self, caminho):
+        """
+        Gera tuplas (chave, contexto, registro) para cada registro folha.
+        """
+        yield from self._percorrer_lista(caminho, None, {})
+
+
+def iterar_json(file_path, caminho, encoding='utf-8'):
+    """
+    Abre o arquivo e gera tuplas (chave, contexto, registro) conforme o
+    `caminho` (ver LeitorIncremental). Apenas um registro folha e um pedaço
+    do arquivo ficam em memória por vez.
+    """
+    with open(file_path, 'r', encoding=encoding) as f:
+        yield from LeitorIncremental(f).percorrer(caminho)
+
+
+# =============================================================================
+# Acumulação em Blocos
+# =============================================================================
+class AcumuladorBlocos:
+    """
+    Substituto de uma lista de dicionários: acumula as linhas e, a cada
+    `tamanho_bloco` linhas, converte-as em um DataFrame com `converter` e
+    descarta os dicionários, mantendo a memória limitada.
+
+    Os tipos das colunas são inferidos uma única vez, sobre o conjunto dos
+    blocos: inferidos bloco a bloco, uma coluna só numérica em um bloco e
+    com tipos misturados em outro terminaria diferente do processamento
+    sequencial (ex.: None virando NaN). Por isso `converter` deve manter as
+    colunas como object (ver dataframe_validado, inferir_tipos=False).
+    """
+    def __init__(self, tamanho_bloco=TAMANHO_BLOCO_PADRAO, converter=pd.DataFrame):
+        self.tamanho_bloco = tamanho_bloco
+        self.converter = converter
+        self.linhas = []
+        self.blocos = []
+
+    def append(self, linha):
+        self.linhas.append(linha)
+        if len(self.linhas) >= self.tamanho_bloco:
+            self.descarregar()
+
+    def descarregar(self):
+        if self.linhas:
+            self.blocos.append(self.converter(self.linhas))
+            self.linhas = []
+
+    def dataframe(self):
+        """
+        Retorna um único DataFrame com todos os blocos acumulados.
+        """
+        self.descarregar()
+        if not self.blocos:
+            return pd.DataFrame()
+        if len(self.blocos) == 1:
+            return self.blocos[0].infer_objects()
+        return pd.concat(self.blocos, ignore_index=True).infer_objects()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Processamento paralelo por contrato.
+
+Divide a lista de blocos de contrato em fatias contíguas, processa cada
+fatia em um processo separado e junta os DataFrames resultantes na mesma
+ordem, de modo que o resultado é idêntico ao do processamento sequencial.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+# Fatias por processo: mais fatias equilibram melhor contratos de tamanhos
+# muito diferentes, ao custo de mais DataFrames para concatenar
+FATIAS_POR_WORKER = 4
+
+
+# =============================================================================
+# Funções Auxiliares
+# =============================================================================
+def dividir_em_fatias(blocos, n_fatias, peso=len):
+    """
+    Divide `blocos` em até `n_fatias` fatias contíguas com pesos parecidos,
+    preservando a ordem original.
+    """
+    if not blocos:
+        return []
+    pesos = np.cumsum([max(peso(bloco), 1) for bloco in blocos])
+    limites = np.searchsorted(pesos, pesos[-1] * np.arange(1, n_fatias) / n_fatias, side='right')
+    inicios = np.unique(np.concatenate(([0], limites, [len(blocos)])))
+    return [blocos[inicio:fim] for inicio, fim in zip(inicios[:-1], inicios[1:])]
+
+
+def concatenar_resultados(resultados):
+    """
+    Junta, posição a posição, as tuplas de DataFrames devolvidas por cada fatia.
+    """
+    tabelas = []
+    for partes in zip(*resultados):
+        partes = [df for df in partes if not df.empty]
+        if not partes:
+            tabelas.append(pd.DataFrame())
+        else:
+            # As fatias chegam com dtype object; os tipos são inferidos sobre o
+            # conjunto, como no processamento sequencial
+            tabelas.append(pd.concat(partes, ignore_index=True).infer_objects())
+    return tuple(tabelas)
+
+
+def processar_por_contrato(funcao, blocos, workers, peso=len):
+    """
+    Aplica `funcao` (que recebe uma lista de blocos e devolve uma tupla de
+    DataFrames) sobre fatias de `blocos` em até `workers` processos e devolve
+    a tupla de DataFrames concatenados na ordem original.
+
+    `funcao` precisa ser definida no nível do módulo, para poder ser enviada
+    aos processos, e aceitar o argumento inferir_tipos (ver
+    json_para_df.validacao.dataframe_validado).
+    """
+    fatias = dividir_em_fatias(blocos, workers * FATIAS_POR_WORKER, peso)
+    if workers <= 1 or len(fatias) <= 1:
+        return funcao(blocos)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        resultados = executor.map(partial(funcao, inferir_tipos=False), fatias)
+        return concatenar_resultados(list(resultados))
+
+
+def processar_individualmente(funcao, blocos, workers):
+    """
+    Aplica `funcao` a cada bloco separadamente (em até `workers` processos) e
+    devolve a lista de tuplas de DataFrames, uma por bloco, na ordem original.
+    Os DataFrames ficam com dtype object (ver concatenar_resultados).
+    """
+    funcao = partial(funcao, inferir_tipos=False)
+    unitarios = [[bloco] for bloco in blocos]
+    if workers <= 1 or len(unitarios) <= 1:
+        return [funcao(unitario) for unitario in unitarios]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tamanho_lote = max(1, len(unitarios) // (workers * FATIAS_POR_WORKER))
+        return list(executor.map(funcao, unitarios, chunksize=tamanho_lote))
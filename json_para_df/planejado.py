@@ -13,12 +13,18 @@ Referências:
 # ------------------------------------------------------------------------------
 import os
 import json
+import codecs
 import logging
 from dotenv import load_dotenv
 
+import numpy as np
 import pandas as pd
 import chardet
 
+from json_para_df.instrumentacao import instrumentar, medir
+from json_para_df.leitura_incremental import TAMANHO_BLOCO_PADRAO, iterar_json
+from json_para_df.validacao import NAO_NUMERO, NAO_TEXTO, NEGATIVO, NULO, VAZIO, dataframe_validado, validador_do_campo
+
 # ------------------------------------------------------------------------------
 # Configurações Iniciais
 # ------------------------------------------------------------------------------
@@ -31,35 +37,105 @@ PLANEJADO_JSON_PATH = os.getenv('PLANEJADO_JSON_PATH')
 # ------------------------------------------------------------------------------
 # Funções Auxiliares
 # ------------------------------------------------------------------------------
+# Quantidade de bytes usada para detectar o encoding
+TAMANHO_AMOSTRA_ENCODING = 64 * 1024
+
+# BOMs conhecidos (os de UTF-32 antes dos de UTF-16, que são seus prefixos)
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Encodings já detectados, por (caminho, mtime)
+_encodings_detectados = {}
+
+
+def _chave_encoding(file_path):
+    return os.path.abspath(file_path), os.stat(file_path).st_mtime_ns
+
+
+def detectar_encoding_amostra(amostra):
+    """
+    Detecta o encoding a partir de uma amostra de bytes: primeiro pelo BOM,
+    depois tentando UTF-8 estrito e, só em último caso, com o chardet.
+
+    :param amostra: Bytes iniciais do arquivo.
+    :return: Encoding detectado.
+    """
+    for bom, encoding in BOMS:
+        if amostra.startswith(bom):
+            return encoding
+    try:
+        # final=False: a amostra pode terminar no meio de um caractere multibyte
+        codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return chardet.detect(amostra)['encoding']
+
+
 def detect_encoding(file_path):
     """
-    Detecta o encoding de um arquivo.
+    Detecta o encoding de um arquivo lendo apenas uma amostra do início.
+    O resultado fica em cache enquanto o arquivo não for modificado.
     
     :param file_path: Caminho do arquivo.
     :return: Encoding detectado.
     """
-    logging.info(f"Detectando encoding do arquivo: {file_path}")
-    with open(file_path, 'rb') as file:
-        raw_data = file.read()
-        result = chardet.detect(raw_data)
-    encoding = result['encoding']
-    logging.info(f"Encoding detectado: {encoding}")
-    return encoding
+    chave = _chave_encoding(file_path)
+    if chave not in _encodings_detectados:
+        logging.info(f"Detectando encoding do arquivo: {file_path}")
+        with open(file_path, 'rb') as file:
+            amostra = file.read(TAMANHO_AMOSTRA_ENCODING)
+        _encodings_detectados[chave] = detectar_encoding_amostra(amostra)
+        logging.info(f"Encoding detectado: {_encodings_detectados[chave]}")
+    return _encodings_detectados[chave]
+
+
+def decodificar(raw_data, encoding, chave=None):
+    """
+    Decodifica os bytes do arquivo. Se o encoding detectado pela amostra
+    falhar mais adiante no arquivo, detecta novamente a partir do trecho
+    em que ocorreu o erro e atualiza o cache.
+    """
+    try:
+        return raw_data.decode(encoding)
+    except UnicodeDecodeError as e:
+        inicio = max(e.start - TAMANHO_AMOSTRA_ENCODING // 2, 0)
+        novo_encoding = chardet.detect(raw_data[inicio:inicio + TAMANHO_AMOSTRA_ENCODING])['encoding']
+        if not novo_encoding or novo_encoding == encoding:
+            raise
+        logging.warning(f"Encoding {encoding} falhou na posição {e.start}; usando {novo_encoding}.")
+        if chave is not None:
+            _encodings_detectados[chave] = novo_encoding
+        return raw_data.decode(novo_encoding)
+
 
 def load_json(file_path, encoding=None):
     """
-    Carrega um arquivo JSON utilizando o encoding apropriado.
+    Carrega um arquivo JSON utilizando o encoding apropriado. O arquivo é
+    lido uma única vez e o encoding é detectado sobre os bytes já lidos.
     
     :param file_path: Caminho do arquivo JSON.
     :param encoding: Encoding a ser utilizado. Se None, detecta automaticamente.
     :return: Dados do JSON carregados.
     """
-    if encoding is None:
-        encoding = detect_encoding(file_path)
     try:
         logging.info(f"Carregando JSON do arquivo: {file_path}")
-        with open(file_path, 'r', encoding=encoding) as file:
-            data = json.load(file)
+        with open(file_path, 'rb') as file:
+            raw_data = file.read()
+
+        chave = None
+        if encoding is None:
+            chave = _chave_encoding(file_path)
+            if chave not in _encodings_detectados:
+                _encodings_detectados[chave] = detectar_encoding_amostra(raw_data[:TAMANHO_AMOSTRA_ENCODING])
+            encoding = _encodings_detectados[chave]
+            logging.info(f"Encoding detectado: {encoding}")
+
+        data = json.loads(decodificar(raw_data, encoding, chave))
         logging.info("JSON carregado com sucesso.")
         return data
     except FileNotFoundError:
@@ -82,123 +158,140 @@ class Campo:
         self.tipo = tipo
         self.obrigatorio = obrigatorio
 
-    def validar(self, valor, pattern=None):
+    def validar(self, valor):
+        """
+        Retorna a lista de erros do valor (ver regras).
+        """
+        return validador_do_campo(self)(valor)
+
+    def regras(self):
         """
-        Valida o valor de acordo com o tipo e retorna uma lista de erros (se houver).
+        Pares (verificação, mensagem) aplicados ao valor do campo, em ordem
+        (ver json_para_df.validacao).
         """
+        erro_tipo = lambda valor: f'Campo: {self.nome}, tipo errado {self.tipo} -> {type(valor)}'
         if self.tipo in [int, float]:
-            return self.validar_numero(valor)
+            return [(NULO, lambda valor: f'Campo: {self.nome}, valor é NaN'),
+                    (NAO_NUMERO, erro_tipo),
+                    (NEGATIVO, lambda valor: f'Campo: {self.nome}, valor negativo')]
         elif self.tipo == str:
-            return self.validar_texto(valor, pattern)
+            regras = [(NAO_TEXTO, erro_tipo)]
+            if self.obrigatorio:
+                regras.append((VAZIO, lambda valor: f'Campo: {self.nome}, está vazio'))
+            return regras
         return []
 
-    def validar_numero(self, valor):
-        erros = []
-        if pd.isna(valor):
-            erros.append(f'Campo: {self.nome}, valor é NaN')
-            return erros
-
-        if not isinstance(valor, (int, float)):
-            erros.append(f'Campo: {self.nome}, tipo errado {self.tipo} -> {type(valor)}')
-        
-        if round(valor, 3) < 0:
-            erros.append(f'Campo: {self.nome}, valor negativo')
-        return erros
-
-    def validar_texto(self, valor, pattern=None):
-        erros = []
-        if pattern:
-            # Implementar validação com regex se necessário
-            print('regex')
-
-        if not isinstance(valor, str):
-            erros.append(f'Campo: {self.nome}, tipo errado {self.tipo} -> {type(valor)}')
-            return erros
-        
-        if self.obrigatorio and valor.strip() == "":
-            erros.append(f'Campo: {self.nome}, está vazio')
-        return erros
-
-class Mes:
-    """
-    Representa um mês com seus dados de projeção.
-    """
-    def __init__(self, contrato, codigo, data):
-        self.contrato = contrato
-        self.codigo = codigo
-        self.mes = data['mes']
-        self.quant_projetada = data['quant_projetada']
-        self.erros, self.is_ok = self.validate()
-    
-    def to_dict(self):
-        return {
-            'contrato': self.contrato,
-            'codigo': self.codigo,
-            'mes': self.mes,
-            'quant_projetada': self.quant_projetada,
-            'errors': self.erros,
-            'is_ok': self.is_ok
-        }
-    
-    def validate(self):
-        erros = []
-        campo_mes = Campo('mes', str, True)
-        campo_quant_projetada = Campo('quant_projetada', float, True)
+# Campos de cada mês projetado (colunas 'mes' e 'quant_projetada' do DataFrame)
+CAMPOS_PLANEJADO = [
+    Campo('mes', str, True),
+    Campo('quant_projetada', float, True),
+]
 
-        erros.extend(campo_mes.validar(self.mes))
-        erros.extend(campo_quant_projetada.validar(self.quant_projetada))
-        return erros, len(erros) == 0 
+class Planejado:
+    """
+    Processa os dados planejados e os transforma em um DataFrame.
+    Todos os blocos de mes_ref são considerados; os meses são achatados
+    direto em colunas (ver achatar_projecoes) e validados por coluna
+    (ver json_para_df.validacao).
+    """
+    def __init__(self, data):
+        self.mes_ref = data[0]['mes_ref'] if data else None
+        self.df = dataframe_validado(achatar_projecoes(projecoes_do_json(data)), CAMPOS_PLANEJADO)
 
-class ProjecaoProd:
+# ------------------------------------------------------------------------------
+# Achatamento em Colunas
+# ------------------------------------------------------------------------------
+COLUNAS_PLANEJADO = ['mes_ref', 'contrato', 'codigo', 'mes', 'quant_projetada']
+
+
+def projecoes_do_json(data):
     """
-    Representa a projeção de produção para um determinado contrato.
+    Gera tuplas (mes_ref, contrato, projecao_prod) de todos os blocos de
+    mes_ref do JSON já carregado.
     """
-    def __init__(self, contrato, projecao_prod):
-        self.contrato = contrato
-        self.codigo = projecao_prod['codigo']
-        self.meses = projecao_prod['meses']
-    
-    def to_dict(self):
-        return [Mes(self.contrato, self.codigo, mes).to_dict() for mes in self.meses]
+    for bloco in data:
+        mes_ref = bloco['mes_ref']
+        for item in bloco['itens']:
+            contrato = item['contrato']
+            for projecao_prod in item['projecao_prod']:
+                yield mes_ref, contrato, projecao_prod
 
-class Contrato:
+
+def achatar_projecoes(projecoes):
     """
-    Representa um contrato contendo uma lista de projeções de produção.
+    Converte as tuplas (mes_ref, contrato, projecao_prod) em um dicionário
+    de colunas (arrays object pré-alocados), com uma linha por mês. As
+    colunas são preenchidas em uma única passada, sem criar objetos
+    intermediários por mês.
     """
-    def __init__(self, contrato, list_projecao_prod):
-        self.contrato = contrato
-        self.list_projecao_prod = list_projecao_prod
+    projecoes = list(projecoes)
+    n = sum(len(projecao_prod['meses']) for _, _, projecao_prod in projecoes)
+    colunas = {nome: np.empty(n, dtype=object) for nome in COLUNAS_PLANEJADO}
+    col_mes_ref, col_contrato, col_codigo = colunas['mes_ref'], colunas['contrato'], colunas['codigo']
+    col_mes, col_quant = colunas['mes'], colunas['quant_projetada']
 
-    def to_dict(self):
-        result = []
-        for projecao_prod in self.list_projecao_prod:
-            result.extend(ProjecaoProd(self.contrato, projecao_prod).to_dict())
-        return result
+    with medir('extracao', n):
+        i = 0
+        for mes_ref, contrato, projecao_prod in projecoes:
+            meses = projecao_prod['meses']
+            fim = i + len(meses)
+            col_mes_ref[i:fim] = mes_ref
+            col_contrato[i:fim] = contrato
+            col_codigo[i:fim] = projecao_prod['codigo']
+            for mes in meses:
+                col_mes[i] = mes['mes']
+                col_quant[i] = mes['quant_projetada']
+                i += 1
+    return colunas
 
-class Planejado:
+
+def iterar_projecoes(file_path, encoding=None):
     """
-    Processa os dados planejados e os transforma em um DataFrame.
+    Percorre o arquivo de planejado de forma incremental, gerando tuplas
+    (mes_ref, contrato, projecao_prod) sem carregar o JSON inteiro em memória.
     """
-    def __init__(self, data):
-        self.mes_ref = data[0]['mes_ref']
-        self.itens = data[0]['itens']
-        self.df = pd.DataFrame(self.to_dict())
+    if encoding is None:
+        encoding = detect_encoding(file_path)
+    caminho = {'itens': {'projecao_prod': None}}
+    for _, contexto, projecao_prod in iterar_json(file_path, caminho, encoding=encoding):
+        yield contexto.get('mes_ref'), contexto.get('contrato'), projecao_prod
 
-    def to_dict(self):
-        result = []
-        for item in self.itens:
-            contrato = item['contrato']
-            projecao_produtos = item['projecao_prod']
-            result.extend(Contrato(contrato, projecao_produtos).to_dict())
-        return result
+
+def planejado_incremental(file_path, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Versão incremental de Planejado: lê o arquivo aos poucos e converte as
+    projeções em DataFrame a cada `tamanho_bloco` meses (aproximadamente,
+    já que uma projeção não é dividida entre blocos). Assim como Planejado,
+    considera todos os blocos de mes_ref.
+    """
+    converter = lambda lote: dataframe_validado(achatar_projecoes(lote), CAMPOS_PLANEJADO, inferir_tipos=False)
+    blocos = []
+    lote, meses = [], 0
+    for projecao in iterar_projecoes(file_path):
+        lote.append(projecao)
+        meses += len(projecao[2]['meses'])
+        if meses >= tamanho_bloco:
+            blocos.append(converter(lote))
+            lote, meses = [], 0
+    if lote:
+        blocos.append(converter(lote))
+
+    if not blocos:
+        return pd.DataFrame()
+    return pd.concat(blocos, ignore_index=True).infer_objects()
 
 # ------------------------------------------------------------------------------
 # Execução Principal
 # ------------------------------------------------------------------------------
-def process_planejado(path):
+@instrumentar('planejado')
+def process_planejado(path, streaming=False, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
     try:
+        if streaming:
+            return planejado_incremental(path, tamanho_bloco)
+
         # Carrega o JSON utilizando o caminho definido na variável de ambiente
-        planejado_data = load_json(path)
+        with medir('carregar_json'):
+            planejado_data = load_json(path)
         planejado = Planejado(planejado_data)
         df = planejado.df
         # Exibe as primeiras linhas do DataFrame
@@ -11,10 +11,20 @@ nas classes: Campo, Linear, Trecho, Localizada, Ramal e Economia.
 # =============================================================================
 import json
 import logging
+import numpy as np
 import pandas as pd
 import os
+import time
+from functools import partial
 from dotenv import load_dotenv
 
+from json_para_df.leitura_incremental import AcumuladorBlocos, TAMANHO_BLOCO_PADRAO, iterar_json
+from json_para_df.cache_validacao import CacheValidacao, processar_com_cache
+from json_para_df.instrumentacao import instrumentar, medir
+from json_para_df.paralelo import processar_por_contrato
+from json_para_df.validacao import (FORA_OPCOES, FORA_OPCOES_NAO_VAZIO, NAO_NUMERO, NAO_TEXTO_NEM_NULO, NEGATIVO, NULO,
+                                    VAZIO, compilar_validador, dataframe_validado, validador_do_campo)
+
 # ------------------------------------------------------------------------------
 # Configurações Iniciais
 # ------------------------------------------------------------------------------
@@ -27,6 +37,9 @@ load_dotenv()
 # =============================================================================
 # Configurações Globais
 # =============================================================================
+# Incrementar quando a extração dos registros mudar, para invalidar o cache de validação
+VERSAO_CACHE = 1
+
 #PREVISTO_JSON_FILE = r"C:\Users\AndréTakeoLoschnerFu\OneDrive - TPF-EGC\Documentos\Entregas-json\jsons-07-04-2025\previsto-exportacao-wbs-2025-04-07T15-37-17.json"
 
 #PREVISTO_JSON_FILE = os.getenv('PREVISTO_JSON_FILE')
@@ -47,49 +60,33 @@ class Campo:
         self.pode_nulo = pode_nulo
         self.opcoes = opcoes
 
-    def validar(self, valor, pattern=None):
-        erros = []
-        # Verifica se o valor é nulo (NaN ou None) usando pd.isna
-        if pd.isna(valor):
-            if not self.pode_nulo:
-                erros.append(f'Campo: {self.nome} não pode ser nulo')
-            return erros
-        
-        # Validação específica de acordo com o tipo do campo
+    def validar(self, valor):
+        """
+        Retorna a lista de erros do valor (ver regras).
+        """
+        return validador_do_campo(self)(valor)
+
+    def regras(self):
+        """
+        Pares (verificação, mensagem) aplicados ao valor do campo, em ordem
+        (ver json_para_df.validacao).
+        """
+        regras = []
+        if not self.pode_nulo:
+            regras.append((NULO, lambda valor: f'Campo: {self.nome} não pode ser nulo'))
+
+        erro_tipo = lambda valor: f'Campo: {self.nome}, tipo errado {self.tipo} -> {type(valor)}'
         if self.tipo in [int, float]:
-            erros.extend(self.validar_numero(valor))
+            regras += [(NAO_NUMERO, erro_tipo),
+                       (NEGATIVO, lambda valor: f'Campo: {self.nome}, valor negativo')]
         elif self.tipo == str:
-            erros.extend(self.validar_texto(valor, pattern))
-        
-        return erros
-
-    def validar_numero(self, valor):
-        erros = []
-        # Aqui, a verificação de nulo já foi feita na função 'validar'
-        if not isinstance(valor, (int, float)):
-            erros.append(f'Campo: {self.nome}, tipo errado {self.tipo} -> {type(valor)}')
-        else:
-            if round(valor, 3) < 0:
-                erros.append(f'Campo: {self.nome}, valor negativo')
-        return erros
-
-    def validar_texto(self, valor, pattern=None):
-        erros = []
-        if pattern:
-            # Aqui pode ser implementada a validação com regex, se necessário
-            print('regex')
-        
-        if not isinstance(valor, str):
-            erros.append(f'Campo: {self.nome}, tipo errado {self.tipo} -> {type(valor)}')
-
-        elif self.obrigatorio and valor.strip() == "":
-            erros.append(f'Campo: {self.nome}, está vazio')
-
-        elif self.opcoes and valor not in self.opcoes:
-            erros.append(f'Campo: {self.nome}, valor não permitido -> {valor} (opções: {self.opcoes})')
-        
-        return erros
-
+            regras.append((NAO_TEXTO_NEM_NULO, erro_tipo))
+            if self.obrigatorio:
+                regras.append((VAZIO, lambda valor: f'Campo: {self.nome}, está vazio'))
+            if self.opcoes:
+                regras.append((FORA_OPCOES_NAO_VAZIO if self.obrigatorio else FORA_OPCOES,
+                               lambda valor: f'Campo: {self.nome}, valor não permitido -> {valor} (opções: {self.opcoes})'))
+        return regras
 
 
 class Linear:
@@ -97,7 +94,23 @@ class Linear:
     Representa um item linear com atributos como código, descrição, unidade,
     quantidade prevista, tipo de conduto, PEP e valor.
     """
-    def __init__(self, data, contrato=None):
+    CAMPOS = [
+        Campo('codigo', str, True),
+        Campo('descricao', str, True),
+        Campo('unidade', str, False),
+        Campo('quant_prevista', float, True),
+        #^(rce)|(ct)|(it)|(em)|(lr)|(in)|(ad)|(rd)
+        Campo('tipo_conduto', str, False, False, ["RCE", "CT", "IT", "EM", "LR", "IN", "AD", "RD"]),
+        Campo('PEP', str, True),
+        Campo('valor', float, False),
+    ]
+    _validar = staticmethod(compilar_validador(CAMPOS, 'validar_linear'))
+    COLUNAS = ('contrato', 'codigo', 'descricao', 'unidade', 'quant_prevista', 'tipo_conduto', 'PEP',
+               'valor', 'errors', 'is_ok')
+    __slots__ = ('contrato', 'codigo', 'descricao', 'unidade', 'quant_prevista', 'tipo_conduto', 'PEP',
+                 'valor', 'errors', 'is_ok')
+
+    def __init__(self, data, contrato=None, validar=True):
         self.contrato = contrato
         self.codigo = data.get("codigo")
         self.descricao = data.get("descricao")
@@ -106,7 +119,14 @@ class Linear:
         self.tipo_conduto = data.get("tipo_conduto")
         self.PEP = data.get("PEP")
         self.valor = data.get("valor")
-        self.errors, self.is_ok = self.validate()
+        self.errors, self.is_ok = self.validate() if validar else (None, None)
+
+    def linha(self):
+        """
+        Valores do registro na ordem de COLUNAS (ver dataframe_validado).
+        """
+        return (self.contrato, self.codigo, self.descricao, self.unidade, self.quant_prevista, self.tipo_conduto,
+                self.PEP, self.valor, self.errors, self.is_ok)
 
     def to_dict(self):
         return {
@@ -123,17 +143,7 @@ class Linear:
         }
 
     def validate(self):
-        errors = []
-        errors.extend(Campo('codigo', str, True).validar(self.codigo))
-        errors.extend(Campo('descricao', str, True).validar(self.descricao))
-        errors.extend(Campo('unidade', str, False).validar(self.unidade))
-        errors.extend(Campo('quant_prevista', float, True).validar(self.quant_prevista))
-
-        #^(rce)|(ct)|(it)|(em)|(lr)|(in)|(ad)|(rd)
-        errors.extend(Campo('tipo_conduto', str, False, False, ["RCE", "CT", "IT", "EM", "LR", "IN", "AD", "RD"]).validar(self.tipo_conduto))
-        errors.extend(Campo('PEP', str, True).validar(self.PEP))
-        errors.extend(Campo('valor', float, False).validar(self.valor))
-        return errors, len(errors) == 0
+        return self._validar(self)
 
 
 class Trecho:
@@ -141,7 +151,23 @@ class Trecho:
     Representa um trecho linear previsto, com dados de jusante, montante, extensão,
     diâmetro, material, método de execução e endereço.
     """
-    def __init__(self, data, contrato=None, codigo=None):
+    CAMPOS = [
+        Campo('jusante', str, True),
+        Campo('montante', str, True),
+        Campo('extensao', float, True, False),
+        Campo('diametro', int, False, True),
+        Campo('material', str, False, True, ['PVC', 'PEAD', 'CA', 'MBV', 'FoFo', 'ACO']),
+        Campo('metodo_exec', str, False, True, ['VCA', 'MND', 'AE', 'AEREO']),
+        Campo('detalhe_metodo', str, False, True, ['HDD', 'VCA','FD', 'TC', 'NATM', 'TL', 'TRAVESSIA', 'APOIADO', 'AE']),
+        Campo('endereco', str, True),
+    ]
+    _validar = staticmethod(compilar_validador(CAMPOS, 'validar_trecho'))
+    COLUNAS = ('contrato', 'codigo', 'jusante', 'montante', 'extensao', 'diametro', 'material',
+               'metodo_exec', 'detalhe_metodo', 'endereco', 'errors', 'is_ok', 'merged')
+    __slots__ = ('contrato', 'codigo', 'jusante', 'montante', 'extensao', 'diametro', 'material',
+                 'metodo_exec', 'detalhe_metodo', 'endereco', 'errors', 'is_ok')
+
+    def __init__(self, data, contrato=None, codigo=None, validar=True):
         self.contrato = contrato
         self.codigo = codigo
         self.jusante = data['jusante']['id'] if isinstance(data.get('jusante'), dict) else data.get('jusante')
@@ -152,7 +178,16 @@ class Trecho:
         self.metodo_exec = data.get('metodo_exec')
         self.detalhe_metodo = data.get('detalhe_metodo')
         self.endereco = data.get('endereco')
-        self.errors, self.is_ok = self.validate()
+        self.errors, self.is_ok = self.validate() if validar else (None, None)
+
+    def linha(self):
+        """
+        Valores do registro na ordem de COLUNAS (ver dataframe_validado).
+        """
+        return (self.contrato, self.codigo, self.jusante, self.montante, self.extensao, self.diametro, self.material,
+                self.metodo_exec, self.detalhe_metodo, self.endereco, self.errors, self.is_ok,
+                str(self.contrato) + " | " + str(self.codigo) + " | " + str(self.jusante) + " | " +
+                str(self.montante) + " | " + str(self.material) + " | " + str(self.metodo_exec))
 
     def to_dict(self):
         return {
@@ -173,16 +208,7 @@ class Trecho:
         }
     
     def validate(self):
-        errors = []
-        errors.extend(Campo('jusante', str, True).validar(self.jusante))
-        errors.extend(Campo('montante', str, True).validar(self.montante))
-        errors.extend(Campo('extensao', float, True, False).validar(self.extensao))
-        errors.extend(Campo('diametro', int, False, True).validar(self.diametro))
-        errors.extend(Campo('material', str, False, True, ['PVC', 'PEAD', 'CA', 'MBV', 'FoFo', 'ACO']).validar(self.material))
-        errors.extend(Campo('metodo_exec', str, False, True, ['VCA', 'MND', 'AE', 'AEREO']).validar(self.metodo_exec))
-        errors.extend(Campo('detalhe_metodo', str, False, True, ['HDD', 'VCA','FD', 'TC', 'NATM', 'TL', 'TRAVESSIA', 'APOIADO', 'AE']).validar(self.detalhe_metodo))
-        errors.extend(Campo('endereco', str, True).validar(self.endereco))
-        return errors, len(errors) == 0
+        return self._validar(self)
 
 
 class Localizada:
@@ -190,14 +216,31 @@ class Localizada:
     Representa uma localização prevista, com código, descrição, endereço,
     número de itens e PEP.
     """
-    def __init__(self, data, contrato=None):
+    CAMPOS = [
+        Campo('codigo', str, True),
+        Campo('descricao', str, True),
+        Campo('endereco', str, True),
+        # Se necessário, adicionar validação para PEP.
+    ]
+    _validar = staticmethod(compilar_validador(CAMPOS, 'validar_localizada'))
+    COLUNAS = ('contrato', 'codigo', 'descricao', 'endereco', 'PEP', 'itens', 'errors', 'is_ok')
+    __slots__ = ('contrato', 'codigo', 'descricao', 'itens', 'endereco', 'PEP', 'errors', 'is_ok')
+
+    def __init__(self, data, contrato=None, validar=True):
         self.contrato = contrato
         self.codigo = data.get('codigo')
         self.descricao = data.get('descricao')
         self.itens = len(data.get('itens'))
         self.endereco = data.get('endereco')
         self.PEP = data.get('PEP')
-        self.errors, self.is_ok = self.validate()
+        self.errors, self.is_ok = self.validate() if validar else (None, None)
+
+    def linha(self):
+        """
+        Valores do registro na ordem de COLUNAS (ver dataframe_validado).
+        """
+        return (self.contrato, self.codigo, self.descricao, self.endereco, self.PEP, self.itens, self.errors,
+                self.is_ok)
 
     def to_dict(self):
         return {
@@ -212,12 +255,7 @@ class Localizada:
         }
 
     def validate(self):
-        errors = []
-        errors.extend(Campo('codigo', str, True).validar(self.codigo))
-        errors.extend(Campo('descricao', str, True).validar(self.descricao))
-        errors.extend(Campo('endereco', str, True).validar(self.endereco))
-        # Se necessário, adicionar validação para PEP.
-        return errors, len(errors) == 0
+        return self._validar(self)
 
 
 class Ramal:
@@ -225,7 +263,22 @@ class Ramal:
     Representa um ramal previsto com atributos como código, tipo, status,
     descrição, quantidade prevista, PEP e valor.
     """
-    def __init__(self, data, contrato=None):
+    CAMPOS = [
+        Campo('codigo', str, True),
+        Campo('tipo', str, True, ['PA', 'TA', 'E', 'TO', 'PO']),
+        # A validação para 'completa' pode ser implementada se necessário.
+        Campo('descricao', str, True),
+        Campo('quant_prevista', int, False),
+        # Se necessário, adicionar validação para PEP.
+        Campo('valor', float, True),
+    ]
+    _validar = staticmethod(compilar_validador(CAMPOS, 'validar_ramal'))
+    COLUNAS = ('contrato', 'codigo', 'tipo', 'completa', 'descricao', 'quant_prevista', 'PEP', 'valor',
+               'errors', 'is_ok')
+    __slots__ = ('contrato', 'codigo', 'tipo', 'completa', 'descricao', 'quant_prevista', 'PEP', 'valor',
+                 'errors', 'is_ok')
+
+    def __init__(self, data, contrato=None, validar=True):
         self.contrato = contrato
         self.codigo = data.get('codigo')
         self.tipo = data.get('tipo')
@@ -234,7 +287,14 @@ class Ramal:
         self.quant_prevista = data.get('quant_prevista')
         self.PEP = data.get('PEP')
         self.valor = data.get('valor')
-        self.errors, self.is_ok = self.validate()
+        self.errors, self.is_ok = self.validate() if validar else (None, None)
+
+    def linha(self):
+        """
+        Valores do registro na ordem de COLUNAS (ver dataframe_validado).
+        """
+        return (self.contrato, self.codigo, self.tipo, self.completa, self.descricao, self.quant_prevista, self.PEP,
+                self.valor, self.errors, self.is_ok)
 
     def to_dict(self):
         return {
@@ -251,26 +311,32 @@ class Ramal:
         }
     
     def validate(self):
-        errors = []
-        errors.extend(Campo('codigo', str, True).validar(self.codigo))
-        errors.extend(Campo('tipo', str, True, ['PA', 'TA', 'E', 'TO', 'PO']).validar(self.tipo))
-        # A validação para 'completa' pode ser implementada se necessário.
-        errors.extend(Campo('descricao', str, True).validar(self.descricao))
-        errors.extend(Campo('quant_prevista', int, False).validar(self.quant_prevista))
-        # Se necessário, adicionar validação para PEP.
-        errors.extend(Campo('valor', float, True).validar(self.valor))
-        return errors, len(errors) == 0
+        return self._validar(self)
 
 
 class Economia:
     """
     Representa um item de economia previsto contendo código e quantidade prevista.
     """
-    def __init__(self, data, contrato=None):
+    CAMPOS = [
+        Campo('codigo', str, True),
+        Campo('quant_prevista', int, True),
+    ]
+    _validar = staticmethod(compilar_validador(CAMPOS, 'validar_economia'))
+    COLUNAS = ('contrato', 'codigo', 'quant_prevista', 'errors', 'is_ok')
+    __slots__ = ('contrato', 'codigo', 'quant_prevista', 'errors', 'is_ok')
+
+    def __init__(self, data, contrato=None, validar=True):
         self.contrato = contrato
         self.codigo = data.get('codigo')
         self.quant_prevista = data.get('quant_prevista')
-        self.errors, self.is_ok = self.validate()
+        self.errors, self.is_ok = self.validate() if validar else (None, None)
+
+    def linha(self):
+        """
+        Valores do registro na ordem de COLUNAS (ver dataframe_validado).
+        """
+        return (self.contrato, self.codigo, self.quant_prevista, self.errors, self.is_ok)
 
     def to_dict(self):
         return {
@@ -282,10 +348,7 @@ class Economia:
         }
     
     def validate(self):
-        errors = []
-        errors.extend(Campo('codigo', str, True).validar(self.codigo))
-        errors.extend(Campo('quant_prevista', int, True).validar(self.quant_prevista))
-        return errors, len(errors) == 0
+        return self._validar(self)
 
 
 # =============================================================================
@@ -325,8 +388,29 @@ def load_municipios(json_path):
         raise
 
 municipios_json_path = os.getenv("MUNICIPIOS_JSON_PATH", "municipios.json")
-municipios = load_municipios(municipios_json_path)
-df_municipios = pd.DataFrame(list(municipios.items()), columns=["cod", "Municipio"])
+
+# Tabelas de referência carregadas no primeiro uso e mantidas durante o processo
+_referencias = {}
+
+
+def carregar_municipios():
+    """
+    Retorna o DataFrame de municípios (cod, Municipio), lendo o JSON apenas
+    na primeira chamada.
+    """
+    if 'df_municipios' not in _referencias:
+        municipios = load_municipios(municipios_json_path)
+        _referencias['municipios'] = municipios
+        _referencias['df_municipios'] = pd.DataFrame(list(municipios.items()), columns=["cod", "Municipio"])
+    return _referencias['df_municipios']
+
+
+def __getattr__(nome):
+    # Compatibilidade com os antigos atributos do módulo, agora carregados sob demanda
+    if nome in ('municipios', 'df_municipios'):
+        carregar_municipios()
+        return _referencias[nome]
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
 
 
 # =============================================================================
@@ -334,83 +418,249 @@ df_municipios = pd.DataFrame(list(municipios.items()), columns=["cod", "Municipi
 # =============================================================================
 
 # certos contratos seguem um padrão no código wbs: item(8) + D2(fator fisico d(2)) + D3(tipo obra d(2)) + Municipio(d(3))
-from bd import conectar_bd, executar_select
+CAMINHO_SNAPSHOT_INTEGRA = os.getenv("CONTRATOS_INTEGRA_SNAPSHOT", os.path.join(".cache_referencias", "contratos_integra.json"))
+TTL_CONTRATOS_INTEGRA = 24 * 3600  # segundos até consultar o banco novamente
 
-def contratos_integra():
-    # conectar ao bd, e pegar os dados dessa query
-    conn = conectar_bd()
 
-    query = "SELECT DISTINCT CONTRATO FROM FIN_BD_WBS WHERE CADASTRO_APROVADO_UN IS NOT NULL;"
-    return list(executar_select(query, conn)['CONTRATO'])
+def _ler_snapshot_integra(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
 
-def find_municipio_code(row):
-    # Exemplo simples: remove zeros à direita e pega 3 dígitos do final
-    if row['integra']:
-        if pd.isna(row['codigo']) or not isinstance(row['codigo'], str):
-            return ""
-        else:
-            return row['codigo'][12:15]
+
+def _salvar_snapshot_integra(caminho, contratos):
+    try:
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        temporario = caminho + ".tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'atualizado_em': time.time(), 'contratos': contratos}, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+    except OSError as e:
+        logging.warning(f"Não foi possível gravar o snapshot de contratos integra: {e}")
+
+
+@instrumentar('contratos_integra')
+def contratos_integra():
+    """
+    Lista dos contratos com cadastro aprovado. O resultado é guardado durante o
+    processo e em um snapshot local (CAMINHO_SNAPSHOT_INTEGRA); o banco só é
+    consultado quando o snapshot tem mais de TTL_CONTRATOS_INTEGRA segundos.
+    Se a consulta falhar, um snapshot vencido ainda é usado.
+    """
+    if 'contratos_integra' in _referencias:
+        return _referencias['contratos_integra']
+
+    snapshot = _ler_snapshot_integra(CAMINHO_SNAPSHOT_INTEGRA)
+    if snapshot is not None and time.time() - snapshot['atualizado_em'] < TTL_CONTRATOS_INTEGRA:
+        contratos = snapshot['contratos']
     else:
-        return ""
+        # Importado aqui para que importar este módulo não dependa do banco
+        from bd import consultar
+        try:
+            query = "SELECT DISTINCT CONTRATO FROM FIN_BD_WBS WHERE CADASTRO_APROVADO_UN IS NOT NULL;"
+            with medir('consulta_bd'):
+                contratos = list(consultar(query)['CONTRATO'])
+        except Exception as e:
+            if snapshot is None:
+                raise
+            logging.warning(f"Falha ao consultar os contratos integra, usando o snapshot anterior: {e}")
+            contratos = snapshot['contratos']
+        else:
+            _salvar_snapshot_integra(CAMINHO_SNAPSHOT_INTEGRA, contratos)
+
+    _referencias['contratos_integra'] = contratos
+    return contratos
+
+def enriquecer_municipios(df, integra, df_municipios):
+    """
+    Acrescenta, por coluna, 'integra' (contrato na lista de contratos
+    integra), 'cod' (dígitos 12 a 15 do código WBS, só para contratos integra
+    com código em texto; "" caso contrário) e 'Municipio' (nome do município
+    do cod, ou NaN).
+    """
+    if df.empty:
+        return df
+    df = df.copy()
+    integra = df['contrato'].isin(set(integra)).to_numpy()
+    # Só os códigos em texto são fatiados (a coluna pode não ter nenhum)
+    codigos = df['codigo'].to_numpy(dtype=object)
+    fatiar = integra & np.fromiter((isinstance(codigo, str) for codigo in codigos), dtype=bool,
+                                   count=len(codigos))
+    cod = np.full(len(codigos), "", dtype=object)
+    cod[fatiar] = [codigo[12:15] for codigo in codigos[fatiar]]
+
+    # Junção pelo código da categoria: cada cod vira a posição do município na tabela
+    categorias = pd.Categorical(cod, categories=df_municipios['cod'])
+    nomes = np.append(df_municipios['Municipio'].to_numpy(dtype=object), np.nan)
+
+    df['integra'] = integra
+    df['cod'] = cod
+    df['Municipio'] = nomes[categorias.codes]
+    return df
 
 
 
 # =============================================================================
 # Processamento dos Dados Previstos
 # =============================================================================
-def process_previsto(file_path):
+# Listas percorridas em cada contrato do arquivo de previsto
+CAMINHO_PREVISTO = {'linear': None, 'localizada': None, 'ramais': None, 'economias': None}
+
+
+def iterar_registros(file_path):
     """
-    Processa os dados previstos a partir do arquivo JSON especificado.
-    Retorna DataFrames com os dados de Linear, Trechos, Localizada, Ramais e Economias.
+    Percorre o arquivo de previsto de forma incremental, gerando tuplas
+    (chave, contrato, registro), em que chave é 'linear', 'localizada',
+    'ramais' ou 'economias'.
+    """
+    for chave, contexto, registro in iterar_json(file_path, CAMINHO_PREVISTO):
+        yield chave, contexto.get('contrato'), registro
+
+
+def _iterar_registros_carregados(data):
+    """
+    Equivalente a iterar_registros para dados já carregados com load_json.
     """
-    logging.info("Iniciando o processamento dos dados previstos.")
-    data = load_json(file_path)
-    
-    # Listas para armazenar os registros processados
-    linear = []
-    linear_trechos = []
-    localizada = []
-    ramais = []
-    economias = []
-    
     for contrato_item in data:
         contrato = contrato_item.get('contrato')
-        
+        for chave in CAMINHO_PREVISTO:
+            for registro in contrato_item.get(chave, []):
+                yield chave, contrato, registro
+
+
+def _peso_contrato(contrato_item):
+    """
+    Estimativa do custo de processar um contrato (registros + trechos).
+    """
+    peso = sum(len(contrato_item.get(chave, [])) for chave in CAMINHO_PREVISTO)
+    return peso + sum(len(linear_item.get('trechos', [])) for linear_item in contrato_item.get('linear', []))
+
+
+def _processar_registros(registros, linear, linear_trechos, localizada, ramais, economias):
+    """
+    Extrai os registros (chave, contrato, registro) e acrescenta as linhas nos
+    destinos correspondentes. Os objetos apenas extraem os campos; a validação
+    é feita por coluna sobre os DataFrames (ver json_para_df.validacao).
+    """
+    for chave, contrato, registro in registros:
         # Processamento de itens lineares e seus trechos
-        for linear_item in contrato_item.get('linear', []):
-            linear_obj = Linear(linear_item, contrato)
-            linear.append(linear_obj.to_dict())
-            for trecho_item in linear_item.get('trechos', []):
-                trecho_obj = Trecho(trecho_item, contrato, linear_item.get('codigo'))
-                linear_trechos.append(trecho_obj.to_dict())
-        
+        if chave == 'linear':
+            linear_obj = Linear(registro, contrato, validar=False)
+            linear.append(linear_obj.linha())
+            for trecho_item in registro.get('trechos', []):
+                trecho_obj = Trecho(trecho_item, contrato, registro.get('codigo'), validar=False)
+                linear_trechos.append(trecho_obj.linha())
+
         # Processamento de itens localizados
-        for localizada_item in contrato_item.get('localizada', []):
-            localizada_obj = Localizada(localizada_item, contrato)
-            localizada.append(localizada_obj.to_dict())
-        
+        elif chave == 'localizada':
+            localizada_obj = Localizada(registro, contrato, validar=False)
+            localizada.append(localizada_obj.linha())
+
         # Processamento de ramais
-        for ramal_item in contrato_item.get('ramais', []):
-            ramal_obj = Ramal(ramal_item, contrato)
-            ramais.append(ramal_obj.to_dict())
-        
+        elif chave == 'ramais':
+            ramal_obj = Ramal(registro, contrato, validar=False)
+            ramais.append(ramal_obj.linha())
+
         # Processamento de economias
-        for economia_item in contrato_item.get('economias', []):
-            economia_obj = Economia(economia_item, contrato)
-            economias.append(economia_obj.to_dict())
+        elif chave == 'economias':
+            economia_obj = Economia(registro, contrato, validar=False)
+            economias.append(economia_obj.linha())
+
+
+def _acumulador(tamanho_bloco, classe):
+    """
+    Acumulador das linhas (tuplas de classe.linha()) de uma tabela no modo
+    streaming; os tipos são inferidos só no DataFrame final.
+    """
+    return AcumuladorBlocos(tamanho_bloco, partial(dataframe_validado, campos=classe.CAMPOS,
+                                                   colunas=classe.COLUNAS, inferir_tipos=False))
+
+
+def _processar_contratos(contratos, inferir_tipos=True):
+    """
+    Extrai e valida uma lista de contratos já carregados. Retorna os DataFrames
+    de Linear, Trechos, Localizada, Ramais e Economias.
+    """
+    # Listas para armazenar os registros processados
+    linear = []
+    linear_trechos = []
+    localizada = []
+    ramais = []
+    economias = []
+    with medir('extracao') as medida:
+        _processar_registros(_iterar_registros_carregados(contratos), linear, linear_trechos, localizada, ramais, economias)
+        medida.adicionar_linhas(len(linear) + len(linear_trechos) + len(localizada) + len(ramais) + len(economias))
 
     # Criação dos DataFrames com os dados processados
-    df_linear = pd.DataFrame(linear)
-    df_linear_trechos = pd.DataFrame(linear_trechos)
-    df_localizada = pd.DataFrame(localizada)
-    df_ramais = pd.DataFrame(ramais)
-    df_economias = pd.DataFrame(economias)
+    return (dataframe_validado(linear, Linear.CAMPOS, inferir_tipos, Linear.COLUNAS),
+            dataframe_validado(linear_trechos, Trecho.CAMPOS, inferir_tipos, Trecho.COLUNAS),
+            dataframe_validado(localizada, Localizada.CAMPOS, inferir_tipos, Localizada.COLUNAS),
+            dataframe_validado(ramais, Ramal.CAMPOS, inferir_tipos, Ramal.COLUNAS),
+            dataframe_validado(economias, Economia.CAMPOS, inferir_tipos, Economia.COLUNAS))
+
+
+def _versao_regras():
+    """
+    Identifica a versão da extração e das regras de validação, usada na
+    chave do cache de validação.
+    """
+    return ['previsto', VERSAO_CACHE, [[vars(campo) for campo in classe.CAMPOS]
+                                       for classe in (Linear, Trecho, Localizada, Ramal, Economia)]]
 
-    integra = contratos_integra()
 
-    df_localizada['integra'] = df_localizada['contrato'].apply(lambda x: x in integra)
-    df_localizada['cod'] = df_localizada.apply(find_municipio_code, axis=1)
-    df_localizada = pd.merge(df_localizada, df_municipios, on='cod', how='left')
+@instrumentar('previsto')
+def process_previsto(file_path, streaming=False, tamanho_bloco=TAMANHO_BLOCO_PADRAO, workers=1,
+                     cache_dir=None):
+    """
+    Processa os dados previstos a partir do arquivo JSON especificado.
+    Retorna DataFrames com os dados de Linear, Trechos, Localizada, Ramais e Economias.
+
+    Com streaming=True o arquivo é lido de forma incremental e as linhas são
+    convertidas em DataFrame a cada `tamanho_bloco` registros.
+
+    Com workers > 1 (e streaming=False) os contratos são divididos em fatias
+    validadas em processos separados; o resultado é o mesmo do sequencial.
+
+    Com cache_dir (e streaming=False) os contratos que não mudaram desde uma
+    execução anterior são lidos do cache de validação em vez de revalidados.
+    """
+    logging.info("Iniciando o processamento dos dados previstos.")
+
+    if streaming:
+        if workers > 1:
+            logging.warning("O modo streaming é sequencial; o parâmetro workers será ignorado.")
+        linear = _acumulador(tamanho_bloco, Linear)
+        linear_trechos = _acumulador(tamanho_bloco, Trecho)
+        localizada = _acumulador(tamanho_bloco, Localizada)
+        ramais = _acumulador(tamanho_bloco, Ramal)
+        economias = _acumulador(tamanho_bloco, Economia)
+        with medir('extracao'):
+            _processar_registros(iterar_registros(file_path), linear, linear_trechos, localizada, ramais, economias)
+
+        df_linear = linear.dataframe()
+        df_linear_trechos = linear_trechos.dataframe()
+        df_localizada = localizada.dataframe()
+        df_ramais = ramais.dataframe()
+        df_economias = economias.dataframe()
+    else:
+        with medir('carregar_json'):
+            data = load_json(file_path)
+        if cache_dir:
+            tabelas = processar_com_cache(CacheValidacao(cache_dir), _versao_regras(), data,
+                                          _processar_contratos, workers)
+        else:
+            tabelas = processar_por_contrato(_processar_contratos, data, workers, _peso_contrato)
+        df_linear, df_linear_trechos, df_localizada, df_ramais, df_economias = tabelas
+
+    # Contrato integra e município, pelo padrão do código WBS
+    integra = contratos_integra()
+    df_municipios = carregar_municipios()
+    with medir('municipios', len(df_linear) + len(df_localizada) + len(df_ramais)):
+        df_linear = enriquecer_municipios(df_linear, integra, df_municipios)
+        df_localizada = enriquecer_municipios(df_localizada, integra, df_municipios)
+        df_ramais = enriquecer_municipios(df_ramais, integra, df_municipios)
 
     logging.info("Processamento de dados previstos concluído.")
     return df_linear, df_linear_trechos, df_localizada, df_ramais, df_economias
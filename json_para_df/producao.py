@@ -3,14 +3,26 @@
 # =============================================================================
 import json
 import logging
+from functools import partial
+
+import numpy as np
 import pandas as pd
 
+from json_para_df.leitura_incremental import AcumuladorBlocos, TAMANHO_BLOCO_PADRAO, iterar_json
+from json_para_df.cache_validacao import CacheValidacao, processar_com_cache
+from json_para_df.instrumentacao import contar, instrumentar, medir
+from json_para_df.paralelo import processar_por_contrato
+from json_para_df.validacao import (FORA_OPCOES, NAO_NUMERO, NAO_TEXTO, NEGATIVO, NULO, VAZIO, compilar_validador,
+                                    dataframe_validado, validador_do_campo)
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 
 # =============================================================================
 # Configurações Globais
 # =============================================================================
+# Incrementar quando a extração dos registros mudar, para invalidar o cache de validação
+VERSAO_CACHE = 2
 
 
 # =============================================================================
@@ -27,53 +39,34 @@ class Campo:
         self.obrigatorio = obrigatorio
         self.opcoes = opcoes
 
-    def validar(self, valor, pattern=None):
+    def validar(self, valor):
+        """
+        Retorna a lista de erros do valor (ver regras).
+        """
+        return validador_do_campo(self)(valor)
+
+    def regras(self):
+        """
+        Pares (verificação, mensagem) aplicados ao valor do campo, em ordem
+        (ver json_para_df.validacao).
+        """
+        erro_tipo = lambda valor: self._erro(f"Valo com tipo {type(valor)}, mas deveria ser {self.tipo}")
+
         if self.tipo in [int, float]:
-            return self.validar_numero(valor)
+            return [(NULO, lambda valor: self._erro("Valor nulo")),
+                    (NAO_NUMERO, erro_tipo),
+                    (NEGATIVO, lambda valor: self._erro("Valor negativo"))]
         elif self.tipo == str:
-            return self.validar_texto(valor, pattern)
+            regras = [(NAO_TEXTO, erro_tipo)]
+            if self.obrigatorio:
+                regras.append((VAZIO, lambda valor: self._erro("Campo é obrigatório, mas tem valor vazio")))
+            if self.opcoes:
+                regras.append((FORA_OPCOES, lambda valor: self._erro(f"Valor inválido. Opções válidas: {self.opcoes}")))
+            return regras
         return []
 
-    def validar_numero(self, valor):
-        erros = []
-        if pd.isna(valor) or type(valor) == type(None):
-            # erros.append(f'Campo: {self.nome}, valor nulo')
-            erros.append({'campo': self.nome, 'erro': "Valor nulo"})
-            return erros
-
-        if not isinstance(valor, (int, float)):
-            # erros.append(f'Campo: {self.nome}, tipo errado {self.tipo} -> {type(valor)}')
-            erros.append({'campo': self.nome, 'erro': f"Valo com tipo {type(valor)}, mas deveria ser {self.tipo}"})
-
-        
-        if round(valor, 3) < 0:
-            # erros.append(f'Campo: {self.nome}, valor negativo')
-            erros.append({'campo': self.nome, 'erro': "Valor negativo"})
-
-
-        return erros
-
-    def validar_texto(self, valor, pattern=None):
-        erros = []
-        if pattern:
-            print('regex')  # Implementar a validação com regex se necessário
-
-        if not isinstance(valor, str):
-            # erros.append(f'Campo: {self.nome}, tipo errado {self.tipo} -> {type(valor)}')
-            erros.append({'campo': self.nome, 'erro': f"Valo com tipo {type(valor)}, mas deveria ser {self.tipo}"})
-
-            return erros
-        
-        if self.obrigatorio and valor.strip() == "":
-            # erros.append(f'Campo: {self.nome}, está vazio')
-            erros.append({'campo': self.nome, 'erro': "Campo é obrigatório, mas tem valor vazio"})
-
-        if self.opcoes and valor not in self.opcoes:
-            # erros.append(f'Campo: {self.nome}, valor inválido. Opções válidas: {self.opcoes}')
-            erros.append({'campo': self.nome, 'erro': f"Valor inválido. Opções válidas: {self.opcoes}"})
-
-
-        return erros
+    def _erro(self, mensagem):
+        return {'campo': self.nome, 'erro': mensagem}
 
 
 class Item:
@@ -81,15 +74,31 @@ class Item:
     Representa um item de produção, contendo dados básicos e métodos
     para validação e conversão para dicionário.
     """
-    def __init__(self, data):
+    CAMPOS = [
+        Campo('executado', float, True),
+    ]
+    _validar = staticmethod(compilar_validador(CAMPOS, 'validar_item'))
+    COLUNAS = ('mes_ref', 'contrato', 'codigo', 'executado', 'concluido', 'errors', 'is_ok', 'merged')
+    __slots__ = ('mes_ref', 'contrato', 'codigo', 'executado', 'concluido', 'errors', 'is_ok')
+
+    def __init__(self, data, validar=True):
+        self.mes_ref = data.get('mes_ref')
         self.contrato = data.get('contrato')
         self.codigo = data.get('codigo')
         self.executado = data.get('executado')
         self.concluido = data.get('concluido')
-        self.errors, self.is_ok = self.validate()
+        self.errors, self.is_ok = self.validate() if validar else (None, None)
     
+    def linha(self):
+        """
+        Valores do registro na ordem de COLUNAS (ver dataframe_validado).
+        """
+        return (self.mes_ref, self.contrato, self.codigo, self.executado, self.concluido, self.errors, self.is_ok,
+                self.contrato + " | " + self.codigo)
+
     def to_dict(self):
         return {
+            'mes_ref': self.mes_ref,
             'contrato': self.contrato,
             'codigo': self.codigo,
             'executado': self.executado,
@@ -100,9 +109,7 @@ class Item:
         }
     
     def validate(self):
-        errors = []
-        errors.extend(Campo('executado', float, True).validar(self.executado))
-        return errors, len(errors) == 0
+        return self._validar(self)
 
 
 class Trecho:
@@ -111,7 +118,24 @@ class Trecho:
     como jusante, montante, extensão, diâmetro, material, método de execução
     e endereço.
     """
-    def __init__(self, data, contrato=None, codigo=None):
+    CAMPOS = [
+        Campo('jusante', str, True),
+        Campo('montante', str, True),
+        Campo('extensao', float, True),
+        Campo('diametro', int, True),
+        Campo('material', str, True, ['PVC', 'PEAD', 'CA', 'MBV', 'FoFo', 'ACO']),
+        Campo('metodo_exec', str, True, ['VCA', 'MND', 'AE']),
+        Campo('endereco', str, True),
+    ]
+    _validar = staticmethod(compilar_validador(CAMPOS, 'validar_trecho'))
+    TIPO = 'linear'
+    COLUNAS = ('mes_ref', 'contrato', 'codigo', 'tipo', 'jusante', 'montante', 'extensao', 'diametro', 'material',
+               'metodo_exec', 'endereco', 'errors', 'is_ok', 'merged')
+    __slots__ = ('mes_ref', 'contrato', 'codigo', 'jusante', 'montante', 'extensao', 'diametro', 'material',
+                 'metodo_exec', 'detalhe_metodo', 'endereco', 'errors', 'is_ok')
+
+    def __init__(self, data, contrato=None, codigo=None, mes_ref=None, validar=True):
+        self.mes_ref = mes_ref
         self.contrato = contrato
         self.codigo = codigo
         self.jusante = data['jusante']['id'] if isinstance(data.get('jusante'), dict) else data.get('jusante')
@@ -122,10 +146,21 @@ class Trecho:
         self.metodo_exec = data.get('metodo_exec')
         self.detalhe_metodo = data.get('detalhe_metodo')
         self.endereco = data.get('endereco')
-        self.errors, self.is_ok = self.validate()
+        self.errors, self.is_ok = self.validate() if validar else (None, None)
+
+    def linha(self):
+        """
+        Valores do registro na ordem de COLUNAS (ver dataframe_validado).
+        """
+        return (self.mes_ref, self.contrato, self.codigo, self.TIPO, self.jusante, self.montante, self.extensao, self.diametro,
+                self.material, self.metodo_exec, self.endereco, self.errors, self.is_ok,
+                str(self.contrato) + " | " + str(self.codigo) + " | " + str(self.jusante) + " | " +
+                str(self.montante) + " | " + str(self.material) + " | " + str(self.metodo_exec) + " | " +
+                str(self.detalhe_metodo))
 
     def to_dict(self):
         return {
+            'mes_ref': self.mes_ref,
             'contrato': self.contrato,
             'codigo': self.codigo,
             'jusante': self.jusante,
@@ -142,15 +177,7 @@ class Trecho:
         }
     
     def validate(self):
-        errors = []
-        errors.extend(Campo('jusante', str, True).validar(self.jusante))
-        errors.extend(Campo('montante', str, True).validar(self.montante))
-        errors.extend(Campo('extensao', float, True).validar(self.extensao))
-        errors.extend(Campo('diametro', int, True).validar(self.diametro))
-        errors.extend(Campo('material', str, True, ['PVC', 'PEAD', 'CA', 'MBV', 'FoFo', 'ACO']).validar(self.material))
-        errors.extend(Campo('metodo_exec', str, True, ['VCA', 'MND', 'AE']).validar(self.metodo_exec))
-        errors.extend(Campo('endereco', str, True).validar(self.endereco))
-        return errors, len(errors) == 0
+        return self._validar(self)
 
 
 class Localizada:
@@ -158,15 +185,32 @@ class Localizada:
     Representa uma localizada na produção, validando os campos descrição
     e número de inventário.
     """
-    def __init__(self, data, contrato=None, codigo=None):
+    CAMPOS = [
+        Campo('descricao', str, True),
+        Campo('num_inventario', str, False),
+    ]
+    _validar = staticmethod(compilar_validador(CAMPOS, 'validar_localizada'))
+    TIPO = 'localizada'
+    COLUNAS = ('mes_ref', 'contrato', 'codigo', 'tipo', 'descricao', 'num_inventario', 'errors', 'is_ok')
+    __slots__ = ('mes_ref', 'contrato', 'codigo', 'descricao', 'num_inventario', 'errors', 'is_ok')
+
+    def __init__(self, data, contrato=None, codigo=None, mes_ref=None, validar=True):
+        self.mes_ref = mes_ref
         self.contrato = contrato
         self.codigo = codigo
         self.descricao = data.get('descricao')
         self.num_inventario = data.get('num_inventario')
-        self.errors, self.is_ok = self.validate()
+        self.errors, self.is_ok = self.validate() if validar else (None, None)
+
+    def linha(self):
+        """
+        Valores do registro na ordem de COLUNAS (ver dataframe_validado).
+        """
+        return (self.mes_ref, self.contrato, self.codigo, self.TIPO, self.descricao, self.num_inventario, self.errors, self.is_ok)
 
     def to_dict(self):
         return {
+            'mes_ref': self.mes_ref,
             'contrato': self.contrato,
             'codigo': self.codigo,
             'descricao': self.descricao,
@@ -176,10 +220,7 @@ class Localizada:
         }
     
     def validate(self):
-        errors = []
-        errors.extend(Campo('descricao', str, True).validar(self.descricao))
-        errors.extend(Campo('num_inventario', str, False).validar(self.num_inventario))
-        return errors, len(errors) == 0
+        return self._validar(self)
 
 
 class Ramal:
@@ -187,16 +228,34 @@ class Ramal:
     Representa um ramal na produção, validando campos de posição, completo
     e endereço.
     """
-    def __init__(self, data, contrato=None, codigo=None):
+    CAMPOS = [
+        Campo('posicao', str, False),
+        Campo('endereco', str, False),
+    ]
+    _validar = staticmethod(compilar_validador(CAMPOS, 'validar_ramal'))
+    TIPO = 'ramal'
+    COLUNAS = ('mes_ref', 'contrato', 'codigo', 'tipo', 'posicao', 'completo', 'endereco', 'errors', 'is_ok')
+    __slots__ = ('mes_ref', 'contrato', 'codigo', 'posicao', 'completo', 'endereco', 'errors', 'is_ok')
+
+    def __init__(self, data, contrato=None, codigo=None, mes_ref=None, validar=True):
+        self.mes_ref = mes_ref
         self.contrato = contrato
         self.codigo = codigo
         self.posicao = data.get('posicao')
         self.completo = data.get('completo')
         self.endereco = data.get('endereco')
-        self.errors, self.is_ok = self.validate()
+        self.errors, self.is_ok = self.validate() if validar else (None, None)
+
+    def linha(self):
+        """
+        Valores do registro na ordem de COLUNAS (ver dataframe_validado).
+        """
+        return (self.mes_ref, self.contrato, self.codigo, self.TIPO, self.posicao, self.completo, self.endereco, self.errors,
+                self.is_ok)
 
     def to_dict(self):
         return {
+            'mes_ref': self.mes_ref,
             'contrato': self.contrato,
             'codigo': self.codigo,
             'posicao': self.posicao,
@@ -207,10 +266,7 @@ class Ramal:
         }
     
     def validate(self):
-        errors = []
-        errors.extend(Campo('posicao', str, False).validar(self.posicao))
-        errors.extend(Campo('endereco', str, False).validar(self.endereco))
-        return errors, len(errors) == 0
+        return self._validar(self)
 
 # =============================================================================
 # Funções Auxiliares
@@ -231,92 +287,207 @@ def load_json(file_path):
         return None
 
 
-def identificar_classe(data, contrato=None, codigo=None):
+def classe_do_detalhe(data):
     """
-    Identifica a classe apropriada (Trecho, Localizada ou Ramal) a partir de um
-    dicionário de dados, conforme as chaves encontradas.
+    Classe (Trecho, Localizada ou Ramal) de um detalhe de produção, conforme
+    as chaves encontradas, ou None se não corresponde a nenhuma.
     """
     if 'jusante' in data and 'montante' in data:
-        return Trecho(data, contrato=contrato, codigo=codigo)
+        return Trecho
     elif 'descricao' in data and 'num_inventario' in data:
-        return Localizada(data, contrato=contrato, codigo=codigo)
+        return Localizada
     elif 'posicao' in data and 'completo' in data:
-        return Ramal(data, contrato=contrato, codigo=codigo)
-    else:
-        raise ValueError("Dados não correspondem a nenhuma classe conhecida.")
+        return Ramal
+    return None
 
 
-def merged_count(df, valor):
+def marcar_duplicados(df, coluna='merged'):
     """
-    Conta as ocorrências de um valor específico na coluna 'merged' de um DataFrame.
+    Marca as linhas duplicadas de um DataFrame a partir da chave em `coluna`,
+    em uma única passada com hash (pd.factorize) em vez de reescanear o
+    DataFrame a cada linha.
+
+    Adiciona as colunas:
+        - 'ocorrencias': quantidade de linhas com a mesma chave;
+        - 'primeira_ocorrencia': índice da primeira linha em que a chave aparece;
+        - 'duplicado': True quando a chave aparece mais de uma vez.
     """
-    return len(df[df['merged'] == valor])
+    if coluna not in df.columns:
+        return df
+
+    grupos, _ = pd.factorize(df[coluna], use_na_sentinel=False)
+    ocorrencias = np.bincount(grupos, minlength=1)
+    # grupos é numerado na ordem de aparição, então o primeiro índice de cada grupo
+    # é justamente a primeira ocorrência da chave
+    _, primeiras = np.unique(grupos, return_index=True)
+
+    df['ocorrencias'] = ocorrencias[grupos]
+    df['primeira_ocorrencia'] = df.index.to_numpy()[primeiras[grupos]]
+    df['duplicado'] = df['ocorrencias'] > 1
+    return df
 
 
-def process_production(file_path):
+def iterar_itens(file_path):
     """
-    Processa os dados de produção a partir do arquivo JSON especificado, extrai
-    os códigos e detalhes referentes aos itens, trechos, ramais e localizadas.
-    Retorna os DataFrames correspondentes.
+    Percorre o arquivo de produção de forma incremental, gerando tuplas
+    (mes_ref, contrato, item) sem carregar o JSON inteiro em memória.
+    """
+    for _, contexto, item in iterar_json(file_path, {'producao': {'itens': None}}):
+        yield contexto.get('mes_ref'), contexto.get('contrato'), item
+
+
+def _blocos_contrato(data):
+    """
+    Lista os blocos (mes_ref, bloco do contrato) de dados já carregados com
+    load_json, na ordem do arquivo.
+    """
+    return [(entry.get('mes_ref'), prod) for entry in data for prod in entry.get('producao', [])]
+
+
+def _peso_bloco(bloco):
+    """
+    Estimativa do custo de processar um bloco de contrato (itens + detalhes).
+    """
+    _, prod = bloco
+    return sum(1 + len(item.get('producao', [])) for item in prod.get('itens', []))
+
+
+def _destinos_detalhes(details_trechos, details_ramais, details_localizadas):
+    """
+    Destino das linhas de detalhe de cada classe.
+    """
+    return {Trecho: details_trechos, Ramal: details_ramais, Localizada: details_localizadas}
+
+
+def _processar_item(mes_ref, contrato, item, codes, destinos, details_unknown):
+    """
+    Extrai um item de produção e seus detalhes, acrescentando as linhas
+    resultantes nos destinos correspondentes (ver _destinos_detalhes). A
+    validação é feita depois, por coluna, sobre os DataFrames (ver
+    json_para_df.validacao).
+    """
+    codigo = item.get('codigo')
+    detalhes = item.get('producao', [])
+    item_temp = Item({
+        'mes_ref': mes_ref,
+        'contrato': contrato,
+        'codigo': codigo,
+        'executado': item.get('executado'),
+        'concluido': item.get('concluido'),
+        'n_detalhes': len(detalhes)
+    }, validar=False)
+    codes.append(item_temp.linha())
+
+    for det in detalhes:
+        classe = classe_do_detalhe(det)
+        if classe is None:
+            details_unknown.append({'mes_ref': mes_ref, 'contrato': contrato, 'codigo': codigo, 'tipo': 'desconhecido', 'raw': det})
+            continue
+        destinos[classe].append(classe(det, contrato=contrato, codigo=codigo, mes_ref=mes_ref,
+                                       validar=False).linha())
+
+
+def _acumulador(tamanho_bloco, classe):
     """
-    data = load_json(file_path)
-    if data is None:
-        raise ValueError("Os dados não puderam ser carregados. Verifique o arquivo JSON.")
+    Acumulador das linhas (tuplas de classe.linha()) de uma tabela no modo
+    streaming; os tipos são inferidos só no DataFrame final.
+    """
+    return AcumuladorBlocos(tamanho_bloco, partial(dataframe_validado, campos=classe.CAMPOS,
+                                                   colunas=classe.COLUNAS, inferir_tipos=False))
+
 
+def _processar_contratos(blocos, inferir_tipos=True):
+    """
+    Extrai e valida os itens de uma lista de blocos (mes_ref, bloco do contrato).
+    Retorna os DataFrames de códigos, trechos, ramais e localizadas, ainda sem
+    a marcação de duplicados (que depende do arquivo inteiro).
+    """
     codes = []
     details_trechos = []
     details_ramais = []
     details_localizadas = []
     details_unknown = []  # Opcional: para itens que não se encaixam em nenhuma classe conhecida
 
+    destinos = _destinos_detalhes(details_trechos, details_ramais, details_localizadas)
+    with medir('extracao') as medida:
+        for mes_ref, prod in blocos:
+            contrato = prod.get('contrato')
+            for item in prod.get('itens', []):
+                _processar_item(mes_ref, contrato, item, codes, destinos, details_unknown)
+        medida.adicionar_linhas(len(codes) + len(details_trechos) + len(details_ramais) + len(details_localizadas))
+    contar('producao.detalhes_desconhecidos', len(details_unknown))
+
+    return (dataframe_validado(codes, Item.CAMPOS, inferir_tipos, Item.COLUNAS),
+            dataframe_validado(details_trechos, Trecho.CAMPOS, inferir_tipos, Trecho.COLUNAS),
+            dataframe_validado(details_ramais, Ramal.CAMPOS, inferir_tipos, Ramal.COLUNAS),
+            dataframe_validado(details_localizadas, Localizada.CAMPOS, inferir_tipos, Localizada.COLUNAS))
+
+
+def _versao_regras():
+    """
+    Identifica a versão da extração e das regras de validação, usada na
+    chave do cache de validação.
+    """
+    return ['producao', VERSAO_CACHE, [[vars(campo) for campo in classe.CAMPOS]
+                                       for classe in (Item, Trecho, Ramal, Localizada)]]
+
+
+@instrumentar('producao')
+def process_production(file_path, streaming=False, tamanho_bloco=TAMANHO_BLOCO_PADRAO, workers=1,
+                       cache_dir=None):
+    """
+    Processa os dados de produção a partir do arquivo JSON especificado, extrai
+    os códigos e detalhes referentes aos itens, trechos, ramais e localizadas.
+    Retorna os DataFrames correspondentes.
+
+    Com streaming=True o arquivo é lido de forma incremental e as linhas são
+    convertidas em DataFrame a cada `tamanho_bloco` registros, de modo que a
+    memória não cresce com o tamanho do JSON bruto.
+
+    Com workers > 1 (e streaming=False) os contratos são divididos em fatias
+    validadas em processos separados; o resultado é o mesmo do sequencial.
+
+    Com cache_dir (e streaming=False) os contratos que não mudaram desde uma
+    execução anterior são lidos do cache de validação em vez de revalidados.
+    """
     logging.info("Iniciando o processamento dos dados de produção.")
     logging.info(f"Caminho do arquivo: {file_path}")
 
-    for entry in data:
-        mes_ref = entry.get('mes_ref')
-        for prod in entry.get('producao', []):
-            contrato = prod.get('contrato')
-            for item in prod.get('itens', []):
-                n_detalhes = len(item.get('producao', []))
-                item_temp = Item({
-                    'mes_ref': mes_ref,
-                    'contrato': contrato,
-                    'codigo': item.get('codigo'),
-                    'executado': item.get('executado'),
-                    'concluido': item.get('concluido'),
-                    'n_detalhes': n_detalhes
-                })
-                code_temp = item_temp.to_dict()
-                code_temp['merged'] = code_temp['contrato'] + " | " + code_temp['codigo']
-                codes.append(code_temp)
-
-                for det in item.get('producao', []):
-                    detail_entry = {'contrato': contrato, 'codigo': item.get('codigo')}
-                    try:
-                        # Identifica a classe adequada e instancia o objeto correspondente
-                        obj = identificar_classe(det, contrato=contrato, codigo=item.get('codigo'))
-                        if isinstance(obj, Trecho):
-                            detail_entry.update({'tipo': 'linear', **obj.to_dict()})
-                            details_trechos.append(detail_entry)
-                        elif isinstance(obj, Ramal):
-                            detail_entry.update({'tipo': 'ramal', **obj.to_dict()})
-                            details_ramais.append(detail_entry)
-                        elif isinstance(obj, Localizada):
-                            detail_entry.update({'tipo': 'localizada', **obj.to_dict()})
-                            details_localizadas.append(detail_entry)
-                    except ValueError:
-                        detail_entry.update({'tipo': 'desconhecido', 'raw': det})
-                        details_unknown.append(detail_entry)
-
-    df_codes = pd.DataFrame(codes)
-    df_trechos = pd.DataFrame(details_trechos)
-    df_ramais = pd.DataFrame(details_ramais)
-    df_localizadas = pd.DataFrame(details_localizadas)
-
-    df_codes['duplicado'] = df_codes.apply(lambda x: merged_count(df_codes, x['merged']) > 1, axis=1)
-
-    # Muito complicado saber se tem trecho duplicado. Vou não fazer isso por enquanto. srry :-(
-    # df_trechos['ocorrencias'] = df_trechos.apply(lambda x: merged_count(df_trechos, x['merged']),axis=1)
+    if streaming:
+        if workers > 1:
+            logging.warning("O modo streaming é sequencial; o parâmetro workers será ignorado.")
+        codes = _acumulador(tamanho_bloco, Item)
+        details_trechos = _acumulador(tamanho_bloco, Trecho)
+        details_ramais = _acumulador(tamanho_bloco, Ramal)
+        details_localizadas = _acumulador(tamanho_bloco, Localizada)
+        details_unknown = []
+        destinos = _destinos_detalhes(details_trechos, details_ramais, details_localizadas)
+
+        with medir('extracao'):
+            for mes_ref, contrato, item in iterar_itens(file_path):
+                _processar_item(mes_ref, contrato, item, codes, destinos, details_unknown)
+        contar('producao.detalhes_desconhecidos', len(details_unknown))
+
+        df_codes = codes.dataframe()
+        df_trechos = details_trechos.dataframe()
+        df_ramais = details_ramais.dataframe()
+        df_localizadas = details_localizadas.dataframe()
+    else:
+        with medir('carregar_json'):
+            data = load_json(file_path)
+        if data is None:
+            raise ValueError("Os dados não puderam ser carregados. Verifique o arquivo JSON.")
+        blocos = _blocos_contrato(data)
+        if cache_dir:
+            tabelas = processar_com_cache(CacheValidacao(cache_dir), _versao_regras(), blocos,
+                                          _processar_contratos, workers)
+        else:
+            tabelas = processar_por_contrato(_processar_contratos, blocos, workers, _peso_bloco)
+        df_codes, df_trechos, df_ramais, df_localizadas = tabelas
+
+    with medir('duplicados', len(df_codes) + len(df_trechos)):
+        df_codes = marcar_duplicados(df_codes)
+        df_trechos = marcar_duplicados(df_trechos)
     
     logging.info(f"Processamento concluído: {len(df_codes)} códigos, {len(df_trechos)} trechos, "
                  f"{len(df_ramais)} ramais e {len(df_localizadas)} localizadas extraídos.")
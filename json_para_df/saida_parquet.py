@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Saída dos resultados da validação em Parquet.
+
+Grava todos os DataFrames devolvidos por process_production,
+process_previsto e process_planejado (inclusive as linhas sem erro) como
+datasets Parquet particionados por mes_ref e contrato (no formato hive,
+ex.: producao_trechos/mes_ref=ago%2F25/contrato=00013%2F24/parte-0.parquet).
+A coluna 'errors' é gravada como coluna de listas, preservando a estrutura
+de cada erro.
+
+Os datasets podem ser lidos depois com ler_tabela, sem reprocessar o JSON.
+A ordem das linhas e os dtypes de cada coluna ficam gravados (coluna
+COLUNA_ORDEM e metadados do schema), então ler_tabela devolve o mesmo
+DataFrame que foi gravado.
+O pyarrow só é importado quando a saída em Parquet é usada.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# Configurações Globais
+# =============================================================================
+PARTICOES = ['mes_ref', 'contrato']
+
+# Posição original de cada linha, já que as partições mudam a ordem dos arquivos
+COLUNA_ORDEM = '__linha'
+
+# Nomes dos datasets, na ordem dos DataFrames devolvidos por cada processamento
+TABELAS_PRODUCAO = ('producao_codigos', 'producao_trechos', 'producao_ramais', 'producao_localizadas')
+TABELAS_PREVISTO = ('previsto_linear', 'previsto_linear_trechos', 'previsto_localizadas',
+                    'previsto_ramais', 'previsto_economias')
+TABELA_PLANEJADO = 'planejado'
+
+
+# =============================================================================
+# Funções Auxiliares
+# =============================================================================
+def _importar_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.fs as fs
+    except ImportError as e:
+        raise ImportError("A saída em Parquet requer o pacote 'pyarrow' (pip install pyarrow).") from e
+    return pa, ds, fs
+
+
+def _coluna_arrow(pa, serie):
+    """
+    Converte a coluna para Arrow. Retorna a coluna e se ela foi gravada como
+    JSON: colunas com tipos misturados (comuns nos campos com erro de tipo)
+    viram o texto JSON de cada valor, que ler_tabela decodifica.
+    """
+    try:
+        return pa.array(serie, from_pandas=True), False
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        nulos = serie.isna().to_numpy()
+        textos = [None if nulo else json.dumps(valor, ensure_ascii=False, default=str)
+                  for valor, nulo in zip(serie.to_numpy(dtype=object), nulos)]
+        return pa.array(textos, type=pa.string()), True
+
+
+def _tabela_arrow(pa, df):
+    """
+    Monta a tabela Arrow guardando nos metadados a ordem original das
+    colunas (as colunas de partição vão para o caminho dos arquivos), o dtype
+    de cada uma, as colunas gravadas como JSON e as colunas object cujos
+    nulos são NaN (e não None). A posição de cada linha vai na coluna
+    COLUNA_ORDEM.
+    """
+    nomes = [str(col) for col in df.columns]
+    colunas, em_json, nulos_nan = [], [], []
+    for nome, col in zip(nomes, df.columns):
+        coluna, como_json = _coluna_arrow(pa, df[col])
+        colunas.append(coluna)
+        if como_json:
+            em_json.append(nome)
+        if df[col].dtype == object:
+            nulos = df[col].to_numpy()[df[col].isna().to_numpy()]
+            if len(nulos) and all(isinstance(valor, float) for valor in nulos):
+                nulos_nan.append(nome)
+    tabela = pa.Table.from_arrays(colunas + [pa.array(range(len(df)), type=pa.int64())],
+                                  names=nomes + [COLUNA_ORDEM])
+    return tabela.replace_schema_metadata({
+        'colunas': json.dumps(nomes),
+        'tipos': json.dumps({nome: str(df[col].dtype) for nome, col in zip(nomes, df.columns)}),
+        'json': json.dumps(em_json),
+        'nulos_nan': json.dumps(nulos_nan),
+    })
+
+
+def _restaurar_coluna(serie, tipo, como_json, nulo=None):
+    """
+    Devolve a coluna lida do Parquet com os valores e o dtype da gravação:
+    decodifica as colunas em JSON, volta as listas (lidas como arrays) a
+    listas e converte as partições (categóricas) e os demais tipos. Nas
+    colunas object os nulos viram `nulo`.
+    """
+    if como_json:
+        return serie.map(json.loads, na_action='ignore').astype(object).where(serie.notna(), nulo)
+    if tipo == 'object':
+        valores = serie.to_numpy(dtype=object)
+        nulos = serie.isna().to_numpy()
+        if nulos.any():
+            valores = valores.copy()
+            valores[nulos] = nulo
+        lista = [valor.tolist() if isinstance(valor, np.ndarray) else valor for valor in valores]
+        return pd.Series(lista, index=serie.index, name=serie.name, dtype=object)
+    if tipo is not None and str(serie.dtype) != tipo:
+        return serie.astype(tipo)
+    return serie
+
+
+# =============================================================================
+# Escrita e Leitura
+# =============================================================================
+def escrever_tabela(df, diretorio, nome):
+    """
+    Grava o DataFrame em <diretorio>/<nome>, particionado pelas colunas de
+    PARTICOES presentes nele, substituindo o conteúdo anterior do dataset.
+    Cada linha vai para a partição do seu próprio mes_ref, então exportações
+    com vários meses de referência ficam separadas corretamente.
+    """
+    if df.empty:
+        logging.info(f"DataFrame vazio. Não gravando o dataset '{nome}'.")
+        return
+
+    pa, ds, _ = _importar_pyarrow()
+
+    tabela = _tabela_arrow(pa, df)
+    particoes = [col for col in PARTICOES if col in df.columns]
+    caminho = os.path.join(diretorio, nome)
+    if os.path.isdir(caminho):
+        shutil.rmtree(caminho)
+
+    ds.write_dataset(
+        tabela, caminho, format='parquet',
+        partitioning=ds.partitioning(pa.schema([tabela.schema.field(col) for col in particoes]), flavor='hive'),
+        basename_template='parte-{i}.parquet',
+    )
+    logging.info(f"Dataset '{nome}' gravado em {caminho} ({len(df)} linhas).")
+
+
+def escrever_resultados(diretorio, nomes, tabelas):
+    """
+    Grava cada DataFrame de `tabelas` no dataset de mesmo índice em `nomes`.
+    """
+    for nome, df in zip(nomes, tabelas):
+        escrever_tabela(df, diretorio, nome)
+
+
+def ler_tabela(diretorio, nome, filtro=None, colunas=None):
+    """
+    Lê o dataset <diretorio>/<nome> como DataFrame, com as colunas, a ordem
+    das linhas e os dtypes da gravação (vazio se o dataset não existir, já
+    que DataFrames vazios não são gravados). `filtro` é uma expressão do pyarrow.dataset, aplicada antes da
+    leitura (ex.: pyarrow.compute.field('contrato') == '00013/24'), de modo
+    que só as partições necessárias são abertas. Os arquivos são mapeados em
+    memória em vez de copiados.
+    """
+    _, ds, fs = _importar_pyarrow()
+    if not os.path.isdir(os.path.join(diretorio, nome)):
+        return pd.DataFrame()
+    dataset = ds.dataset(os.path.abspath(os.path.join(diretorio, nome)), format='parquet',
+                         partitioning='hive', filesystem=fs.LocalFileSystem(use_mmap=True))
+
+    metadados = dataset.schema.metadata or {}
+    ordem = json.loads(metadados.get(b'colunas', b'[]'))
+    tipos = json.loads(metadados.get(b'tipos', b'{}'))
+    em_json = set(json.loads(metadados.get(b'json', b'[]')))
+    nulos_nan = set(json.loads(metadados.get(b'nulos_nan', b'[]')))
+    if colunas is None:
+        colunas = [col for col in ordem if col in dataset.schema.names]
+        colunas += [col for col in dataset.schema.names if col not in colunas and col != COLUNA_ORDEM]
+
+    ordenar = COLUNA_ORDEM in dataset.schema.names
+    tabela = dataset.to_table(columns=list(colunas) + [COLUNA_ORDEM] * ordenar, filter=filtro)
+    if ordenar:
+        tabela = tabela.sort_by(COLUNA_ORDEM).drop_columns([COLUNA_ORDEM])
+    # Inteiros com nulos continuam inteiros (None) nas colunas object
+    df = tabela.to_pandas(integer_object_nulls=True)
+    for col in df.columns:
+        df[col] = _restaurar_coluna(df[col], tipos.get(col), col in em_json, np.nan if col in nulos_nan else None)
+    return df
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Validação vetorizada por coluna e validadores linha a linha.
+
+Cada módulo (producao, previsto, planejado) declara os campos de suas
+entidades uma única vez, como listas de Campo. As regras de cada campo são declaradas uma única vez, em Campo.regras(), como
+pares (verificação, mensagem), em que a verificação é uma das constantes
+abaixo (NULO, NAO_NUMERO, ...). Das mesmas regras saem as duas validações:
+  - por coluna (aplicar_validacao), em que cada verificação vira uma máscara
+    booleana e as mensagens só são geradas para as linhas com erro;
+  - linha a linha (validate() de cada entidade e Campo.validar), com uma
+    função gerada uma vez por lista de campos (compilar_validador), que usa
+    apenas isinstance, comparações e frozenset das opções, sem criar objetos
+    intermediários por chamada.
+"""
+
+# =============================================================================
+# Imports
+# =============================================================================
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from json_para_df.instrumentacao import medir
+
+# Resultados de pd.api.types.infer_dtype em que todos os valores não nulos
+# são instâncias de int/float (bool é subclasse de int)
+_TIPOS_NUMERICOS = {'integer', 'floating', 'mixed-integer-float', 'boolean'}
+
+# Os mesmos tipos, para a classificação valor a valor das colunas misturadas
+_CLASSES_NUMERICAS = (int, float, np.integer, np.floating, np.bool_)
+
+# Verificações usadas em Campo.regras()
+NULO = 'nulo'                                    # valor nulo (pd.isna)
+NAO_NUMERO = 'nao_numero'                        # não nulo e não numérico
+NAO_TEXTO = 'nao_texto'                          # não é texto (inclusive nulo)
+NAO_TEXTO_NEM_NULO = 'nao_texto_nem_nulo'        # não nulo e não é texto
+NEGATIVO = 'negativo'                            # número com round(valor, 3) < 0
+VAZIO = 'vazio'                                  # texto vazio após strip()
+FORA_OPCOES = 'fora_opcoes'                      # texto fora de campo.opcoes
+FORA_OPCOES_NAO_VAZIO = 'fora_opcoes_nao_vazio'  # texto não vazio fora de campo.opcoes
+
+
+# =============================================================================
+# Classificação dos Valores
+# =============================================================================
+class ClassesValores:
+    """
+    Máscaras de uma coluna: valores nulos (pd.isna), textos (str) e
+    números (int/float).
+    """
+    __slots__ = ('nulo', 'texto', 'numero')
+
+    def __init__(self, valores):
+        n = len(valores)
+        self.nulo = np.asarray(pd.isna(valores), dtype=bool)
+        tipo = pd.api.types.infer_dtype(valores, skipna=True)
+
+        if tipo == 'string':
+            self.texto = ~self.nulo
+            self.numero = np.zeros(n, dtype=bool)
+        elif tipo in _TIPOS_NUMERICOS:
+            self.texto = np.zeros(n, dtype=bool)
+            self.numero = ~self.nulo
+        elif tipo == 'empty':
+            self.texto = np.zeros(n, dtype=bool)
+            self.numero = np.zeros(n, dtype=bool)
+        else:
+            # Coluna com tipos misturados: classifica valor a valor
+            self.texto = np.fromiter((isinstance(v, str) for v in valores), dtype=bool, count=n)
+            self.numero = np.fromiter((isinstance(v, _CLASSES_NUMERICAS) for v in valores), dtype=bool,
+                                     count=n)
+            self.numero &= ~self.nulo
+
+
+def mascara_vazio(valores, texto):
+    """
+    Máscara das linhas de texto cujo valor é vazio após strip().
+    """
+    mascara = np.zeros(len(valores), dtype=bool)
+    if texto.any():
+        # Os textos se repetem muito (materiais, métodos...), então o strip é
+        # avaliado uma vez por valor distinto
+        codigos, unicos = pd.factorize(valores[texto])
+        vazios = np.fromiter((u.strip() == "" for u in unicos), dtype=bool, count=len(unicos))
+        mascara[texto] = vazios[codigos]
+    return mascara
+
+
+def mascara_fora_opcoes(valores, texto, opcoes):
+    """
+    Máscara das linhas de texto cujo valor não está entre as opções.
+    """
+    mascara = np.zeros(len(valores), dtype=bool)
+    if texto.any():
+        mascara[texto] = ~pd.Series(valores[texto], dtype=object).isin(opcoes).to_numpy()
+    return mascara
+
+
+def mascara_negativo(valores, numero):
+    """
+    Máscara das linhas numéricas em que round(valor, 3) < 0. Apenas os
+    candidatos negativos passam pelo round do Python, que é o critério exato
+    usado na validação linha a linha.
+    """
+    mascara = np.zeros(len(valores), dtype=bool)
+    if numero.any():
+        posicoes = np.flatnonzero(numero)
+        candidatos = posicoes[valores[posicoes].astype(float) < 0]
+        mascara[candidatos] = [round(valores[i], 3) < 0 for i in candidatos]
+    return mascara
+
+
+# =============================================================================
+# Aplicação das Regras
+# =============================================================================
+def mascaras_regras(campo, valores, classes):
+    """
+    Gera, para cada regra do campo, o par (máscara das linhas com erro,
+    mensagem), em que mensagem(valor) monta o erro de uma linha.
+    """
+    vazio = None
+    for verificacao, mensagem in campo.regras():
+        if verificacao == NULO:
+            mascara = classes.nulo
+        elif verificacao == NAO_NUMERO:
+            mascara = ~classes.nulo & ~classes.numero
+        elif verificacao == NAO_TEXTO:
+            mascara = ~classes.texto
+        elif verificacao == NAO_TEXTO_NEM_NULO:
+            mascara = ~classes.nulo & ~classes.texto
+        elif verificacao == NEGATIVO:
+            mascara = mascara_negativo(valores, classes.numero)
+        elif verificacao == FORA_OPCOES:
+            mascara = mascara_fora_opcoes(valores, classes.texto, campo.opcoes)
+        else:
+            if vazio is None:
+                vazio = mascara_vazio(valores, classes.texto)
+            if verificacao == VAZIO:
+                mascara = vazio
+            elif verificacao == FORA_OPCOES_NAO_VAZIO:
+                mascara = mascara_fora_opcoes(valores, classes.texto, campo.opcoes) & ~vazio
+            else:
+                raise ValueError(f"Verificação desconhecida: {verificacao}")
+        yield mascara, mensagem
+
+
+def aplicar_validacao(df, campos):
+    """
+    Valida as colunas de `df` conforme a lista de campos e preenche as colunas
+    'errors' (lista de erros por linha) e 'is_ok'.
+
+    As regras de cada campo (campo.regras()) são aplicadas em ordem, como na
+    validação linha a linha, de modo que a ordem dos erros de cada linha é
+    preservada.
+    """
+    n = len(df)
+    erros = [[] for _ in range(n)]
+    com_erro = np.zeros(n, dtype=bool)
+
+    for campo in campos:
+        if campo.nome in df.columns:
+            valores = df[campo.nome].to_numpy(dtype=object)
+        else:
+            valores = np.full(n, None, dtype=object)
+
+        for mascara, mensagem in mascaras_regras(campo, valores, ClassesValores(valores)):
+            com_erro |= mascara
+            for i in np.flatnonzero(mascara):
+                erros[i].append(mensagem(valores[i]))
+
+    df['errors'] = pd.Series(erros, index=df.index, dtype=object)
+    df['is_ok'] = ~com_erro
+    return df
+
+
+def dataframe_validado(linhas, campos, inferir_tipos=True, colunas=None):
+    """
+    Monta o DataFrame a partir das linhas (dicionários) e aplica a validação
+    vetorizada. As colunas são validadas com os valores originais (dtype
+    object) e só depois convertidas para os tipos inferidos pelo pandas.
+
+    Com `colunas`, as linhas são tuplas com os valores nessa ordem (ver
+    linha() das entidades), que o pandas converte direto em colunas, sem
+    um dicionário por linha.
+
+    Com inferir_tipos=False as colunas ficam como object, para que partes
+    concatenadas depois tenham os tipos inferidos uma única vez.
+    """
+    with medir('dataframe') as medida:
+        if colunas is None:
+            df = pd.DataFrame(linhas, dtype=object)
+        else:
+            df = pd.DataFrame(linhas, columns=list(colunas), dtype=object)
+        medida.adicionar_linhas(len(df))
+    if df.empty:
+        return pd.DataFrame(linhas)
+    with medir('validacao', len(df)):
+        aplicar_validacao(df, campos)
+    return df.infer_objects() if inferir_tipos else df
+
+
+# =============================================================================
+# Validadores Compilados (linha a linha)
+# =============================================================================
+# Tipos para os quais pd.isna é sempre falso. Para float a verificação é
+# valor != valor; os demais tipos (numpy, pd.NA...) passam por _nulo
+_TIPOS_NAO_NULOS = frozenset({str, int, bool, dict, list, tuple})
+
+# Expressão equivalente a pd.isna aplicado a uma coluna com o valor
+EXPRESSAO_NULO = ("valor is None or (valor != valor if type(valor) is float "
+                  "else (type(valor) not in _TIPOS_NAO_NULOS and _nulo(valor)))")
+
+# Condição de cada verificação no código gerado, em função de valor, nulo,
+# texto e numero (as mesmas máscaras de mascaras_regras)
+_CONDICOES = {
+    NULO: "nulo",
+    NAO_NUMERO: "not nulo and not numero",
+    NAO_TEXTO: "not texto",
+    NAO_TEXTO_NEM_NULO: "not nulo and not texto",
+    NEGATIVO: "numero and valor < 0 and round(valor, 3) < 0",
+    VAZIO: "texto and valor.strip() == ''",
+    FORA_OPCOES: "texto and valor not in {opcoes}",
+    FORA_OPCOES_NAO_VAZIO: "texto and valor not in {opcoes} and valor.strip() != ''",
+}
+
+# Validadores de um único campo (Campo.validar), gerados no primeiro uso
+_validadores_campo = weakref.WeakKeyDictionary()
+
+
+def _nulo(valor):
+    # pd.isna de objetos não escalares devolve um array; na coluna eles não são nulos
+    resultado = pd.isna(valor)
+    return bool(resultado) if isinstance(resultado, (bool, np.bool_)) else False
+
+
+def _codigo_campo(campo, indice, constantes):
+    """
+    Linhas de código que validam `valor` conforme campo.regras(),
+    acrescentando as mensagens em `erros`. As mensagens e as opções
+    (frozenset) vão para `constantes`.
+    """
+    linhas = [f"nulo = {EXPRESSAO_NULO}",
+              "texto = not nulo and isinstance(valor, str)",
+              "numero = not nulo and isinstance(valor, _CLASSES_NUMERICAS)"]
+    for j, (verificacao, mensagem) in enumerate(campo.regras()):
+        constantes[f'MENSAGEM_{indice}_{j}'] = mensagem
+        condicao = _CONDICOES[verificacao]
+        if '{opcoes}' in condicao:
+            constantes[f'OPCOES_{indice}'] = frozenset(campo.opcoes)
+            condicao = condicao.format(opcoes=f'OPCOES_{indice}')
+        linhas += [f"if {condicao}:", f"    erros.append(MENSAGEM_{indice}_{j}(valor))"]
+    return linhas
+
+
+def _gerar(nome, parametro, codigo, retorno, constantes):
+    fonte = "\n".join([f"def {nome}({parametro}):", "    erros = []"] +
+                      ["    " + linha for linha in codigo] + [f"    return {retorno}"]) + "\n"
+    constantes.update({'_nulo': _nulo, '_TIPOS_NAO_NULOS': _TIPOS_NAO_NULOS,
+                       '_CLASSES_NUMERICAS': _CLASSES_NUMERICAS})
+    exec(compile(fonte, f"<validador {nome}>", "exec"), constantes)
+    funcao = constantes[nome]
+    funcao.fonte = fonte
+    return funcao
+
+
+def compilar_validador(campos, nome='validar'):
+    """
+    Gera, uma vez, a função validar(obj) -> (erros, is_ok) que aplica as
+    regras de cada campo ao atributo de mesmo nome de `obj`, em ordem, com as
+    mesmas mensagens da validação por coluna. O código gerado fica em
+    validar.fonte.
+    """
+    codigo, constantes = [], {}
+    for indice, campo in enumerate(campos):
+        if campo.nome.isidentifier():
+            codigo.append(f"valor = obj.{campo.nome}")
+        else:
+            codigo.append(f"valor = getattr(obj, {campo.nome!r})")
+        codigo += _codigo_campo(campo, indice, constantes)
+    return _gerar(nome, 'obj', codigo, "erros, len(erros) == 0", constantes)
+
+
+def validador_do_campo(campo):
+    """
+    Função validar(valor) -> lista de erros de um único campo, gerada no
+    primeiro uso e guardada enquanto o campo existir.
+    """
+    validar = _validadores_campo.get(campo)
+    if validar is None:
+        constantes = {}
+        validar = _gerar('validar_campo', 'valor', _codigo_campo(campo, 0, constantes), "erros", constantes)
+        _validadores_campo[campo] = validar
+    return validar
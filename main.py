@@ -2,16 +2,23 @@
 # -*- coding: utf-8 -*-
 
 # Imports padrão e de terceiros
-from bd import conectar_bd, executar_select
+import numpy as np
 import pandas as pd
+import xlsxwriter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
+import argparse
 import os
 
 # Imports dos módulos de processamento
+from json_para_df import instrumentacao
+from json_para_df.enderecos import NAO_ENCONTRADO, carregar_indice_enderecos, marcar_enderecos
+from json_para_df.instrumentacao import instrumentar, medir
 from json_para_df.planejado import process_planejado
 from json_para_df.previsto import process_previsto
 from json_para_df.producao import process_production
+from json_para_df.saida_parquet import TABELA_PLANEJADO, TABELAS_PREVISTO, TABELAS_PRODUCAO, escrever_resultados
 
 # Carrega as variáveis do arquivo .env
 load_dotenv(dotenv_path=".env")
@@ -22,20 +29,90 @@ PRODUCAO_FILE = os.getenv("PRODUCAO_FILE_PATH")
 PLANEJADO_FILE = os.getenv("PLANEJADO_FILE_PATH")
 
 
+# Linhas amostradas para estimar a largura das colunas do Excel
+AMOSTRA_LARGURA = 1000
+
+
+def _estimar_larguras(df):
+    """
+    Estima a largura de cada coluna pelo maior texto de uma amostra de linhas
+    espaçadas igualmente (todas, se o DataFrame for pequeno).
+    """
+    n = len(df)
+    posicoes = np.unique(np.linspace(0, n - 1, min(n, AMOSTRA_LARGURA)).astype(int))
+    amostra = df.iloc[posicoes]
+    return [max(amostra[col].astype(str).str.len().max(), len(col)) + 2 for col in df.columns]
+
+
+def _coluna_para_escrita(serie, worksheet):
+    """
+    Converte a coluna em uma lista de valores Python (None nas células vazias)
+    e escolhe o método de escrita do xlsxwriter. Colunas homogêneas usam o
+    método do tipo diretamente; as demais são despachadas célula a célula.
+    """
+    valores = serie.to_numpy()
+    vazios = serie.isna().to_numpy()
+
+    if valores.dtype == bool:
+        return valores.tolist(), worksheet.write_boolean
+    if valores.dtype.kind in 'iu':
+        return valores.tolist(), worksheet.write_number
+    if valores.dtype.kind == 'f' and not np.isinf(valores).any():
+        lista = valores.tolist()
+        for i in np.flatnonzero(vazios):
+            lista[i] = None
+        return lista, worksheet.write_number
+
+    # Textos vazios também ficam sem valor, como no to_excel do pandas
+    lista = valores.astype(object)
+    lista[vazios | (lista == '')] = None
+    lista = lista.tolist()
+    if pd.api.types.infer_dtype(serie, skipna=True) == 'string':
+        return lista, worksheet.write_string
+
+    def escrever(linha, coluna, valor):
+        if isinstance(valor, str):
+            worksheet.write_string(linha, coluna, valor)
+        elif isinstance(valor, (bool, np.bool_)):
+            worksheet.write_boolean(linha, coluna, bool(valor))
+        elif isinstance(valor, (int, float, np.integer, np.floating)):
+            if np.isinf(valor):
+                worksheet.write_string(linha, coluna, 'inf' if valor > 0 else '-inf')
+            else:
+                worksheet.write_number(linha, coluna, valor)
+        else:
+            worksheet.write_string(linha, coluna, str(valor))
+    return lista, escrever
+
+
 # Definição da classe para criação e formatação do arquivo Excel
 class ExcelCreator:
     def __init__(self, file_name="output.xlsx"):
         """
-        Inicializa a classe definindo o nome do arquivo e o objeto ExcelWriter
-        utilizando o engine 'xlsxwriter'.
+        Inicializa a classe definindo o nome do arquivo e o workbook do
+        xlsxwriter em modo constant_memory: cada linha vai para o disco assim
+        que a seguinte começa, então a memória não cresce com as planilhas.
         """
         self.file_name = file_name
-        self.writer = pd.ExcelWriter(self.file_name, engine='xlsxwriter')
+        self.workbook = xlsxwriter.Workbook(self.file_name, {'constant_memory': True})
+
+        # Define o formato do cabeçalho da tabela
+        self.header_format = self.workbook.add_format({
+            'bold': True,
+            'text_wrap': True,
+            'valign': 'bottom',
+            'fg_color': '#D7E4BC',
+            'border': 1
+        })
 
     def add_dataframe(self, df, sheet_name="Sheet1"):
         """
-        Adiciona um DataFrame à planilha Excel com formatação de tabela e ajuste
-        automático da largura das colunas.
+        Adiciona um DataFrame à planilha Excel com cabeçalho formatado, filtro
+        e largura das colunas ajustada aos dados.
+
+        As linhas são escritas em ordem, a partir das colunas convertidas de uma
+        só vez (o modo constant_memory não permite voltar a linhas anteriores
+        nem criar tabelas, por isso o cabeçalho recebe um autofiltro).
         
         Parâmetros:
             df : pandas.DataFrame
@@ -46,45 +123,34 @@ class ExcelCreator:
         if df.empty:
             print(f"DataFrame vazio. Não adicionando a planilha '{sheet_name}'.")
             return
-        
-        # Escreve o DataFrame na planilha sem cabeçalho, iniciando na linha 1 (para cabeçalho customizado)
-        df.to_excel(self.writer, sheet_name=sheet_name, index=False, startrow=1, header=False)
-        
-        # Acessa o workbook e a worksheet criados pelo ExcelWriter
-        workbook = self.writer.book
-        worksheet = self.writer.sheets[sheet_name]
-        
-        # Define o formato do cabeçalho da tabela
-        header_format = workbook.add_format({
-            'bold': True,
-            'text_wrap': True,
-            'valign': 'bottom',
-            'fg_color': '#D7E4BC',
-            'border': 1
-        })
-        
-        # Escreve os cabeçalhos na primeira linha com o formato definido
-        for col_num, header in enumerate(df.columns):
-            worksheet.write(0, col_num, header, header_format)
-        
-        # Define o intervalo da tabela (linha inicial, coluna inicial, linha final, coluna final)
-        max_row, max_col = df.shape
-        table_range = [0, 0, max_row, max_col - 1]
-        
-        # Cria a tabela formatada com os cabeçalhos
-        worksheet.add_table(table_range[0], table_range[1], table_range[2], table_range[3],
-                              {'columns': [{'header': col} for col in df.columns]})
-        
-        # Ajusta a largura de cada coluna para acomodar os dados
-        for i, col in enumerate(df.columns):
-            max_length = max(df[col].astype(str).map(len).max(), len(col)) + 2
-            worksheet.set_column(i, i, max_length)
+
+        with medir('excel.add_dataframe', len(df)):
+            worksheet = self.workbook.add_worksheet(sheet_name)
+            max_row, max_col = df.shape
+
+            # Ajusta a largura de cada coluna para acomodar os dados
+            for i, largura in enumerate(_estimar_larguras(df)):
+                worksheet.set_column(i, i, largura)
+
+            # Escreve os cabeçalhos na primeira linha com o formato definido
+            for col_num, header in enumerate(df.columns):
+                worksheet.write_string(0, col_num, str(header), self.header_format)
+            worksheet.autofilter(0, 0, max_row, max_col - 1)
+
+            # Escreve os dados linha a linha a partir da linha 1
+            colunas = [_coluna_para_escrita(df[col], worksheet) for col in df.columns]
+            for linha in range(max_row):
+                for col_num, (valores, escrever) in enumerate(colunas):
+                    valor = valores[linha]
+                    if valor is not None:
+                        escrever(linha + 1, col_num, valor)
 
     def save(self):
         """
         Salva o arquivo Excel criado com todas as planilhas adicionadas.
         """
-        self.writer.close()
+        with medir('excel.save'):
+            self.workbook.close()
 
 
 def get_errors(df):
@@ -105,31 +171,55 @@ def get_errors(df):
     return df[~df["is_ok"]].copy()
 
 
-def process_producao(excel_creator):
+def process_producao(excel_creator, resultado=None, cache_dir=None, indice_enderecos=None, workers=1):
     """
     Processa os dados de produção e adiciona as planilhas de erros ao Excel.
+    Se `resultado` for informado (DataFrames já processados), apenas escreve
+    as planilhas. Com workers > 1 os contratos são validados em até `workers`
+    processos. Com `indice_enderecos`, os endereços de trechos e ramais são
+    verificados no cadastro do ArcGIS (coluna 'endereco_cadastro').
     """
     # Processa os dados de produção
-    df_codes, df_trechos, df_ramais, df_localizadas = process_production(PRODUCAO_FILE)
+    if resultado is None:
+        resultado = process_production(PRODUCAO_FILE, workers=workers, cache_dir=cache_dir)
+    df_codes, df_trechos, df_ramais, df_localizadas = resultado
+
+    if indice_enderecos is not None:
+        with medir('enderecos', len(df_trechos) + len(df_ramais)):
+            marcar_enderecos(indice_enderecos, df_trechos, df_ramais)
     
     # Filtra os códigos com erro ou duplicados
     df_codes_erros = df_codes[(~df_codes["is_ok"]) | (df_codes["duplicado"] == True)]
     excel_creator.add_dataframe(df_codes_erros, sheet_name="Produção CodWBS")
 
+    # Filtra os trechos com erro ou duplicados
+    if df_trechos.empty:
+        df_trechos_erros = df_trechos
+    else:
+        df_trechos_erros = df_trechos[(~df_trechos["is_ok"]) | (df_trechos["duplicado"] == True)]
+    excel_creator.add_dataframe(df_trechos_erros, sheet_name="Produção Trechos")
 
-    
     # Adiciona as demais planilhas de erros
-    excel_creator.add_dataframe(get_errors(df_trechos), sheet_name="Produção Trechos")
     excel_creator.add_dataframe(get_errors(df_ramais), sheet_name="Produção Ramais")
     excel_creator.add_dataframe(get_errors(df_localizadas), sheet_name="Produção Localizadas")
+
+    # Adiciona os trechos e ramais com endereço fora do cadastro
+    if indice_enderecos is not None:
+        sem_cadastro = [df[df["endereco_cadastro"] == NAO_ENCONTRADO] for df in (df_trechos, df_ramais) if not df.empty]
+        if sem_cadastro:
+            excel_creator.add_dataframe(pd.concat(sem_cadastro, ignore_index=True), sheet_name="Produção Endereços")
     return df_codes, df_trechos, df_ramais, df_localizadas
 
 
-def process_previsto_data(excel_creator):
+def process_previsto_data(excel_creator, resultado=None, cache_dir=None, workers=1):
     """
     Processa os dados previstos e adiciona as planilhas de erros ao Excel.
+    Se `resultado` for informado, apenas escreve as planilhas. Com workers > 1
+    os contratos são validados em até `workers` processos.
     """
-    df_linear, df_linear_trechos, df_localizada, df_ramais, df_economias = process_previsto(PREVISTO_FILE)
+    if resultado is None:
+        resultado = process_previsto(PREVISTO_FILE, workers=workers, cache_dir=cache_dir)
+    df_linear, df_linear_trechos, df_localizada, df_ramais, df_economias = resultado
     
     excel_creator.add_dataframe(get_errors(df_linear), sheet_name="Previsto Linear")
     excel_creator.add_dataframe(get_errors(df_linear_trechos), sheet_name="Previsto Linear Trechos")
@@ -139,20 +229,80 @@ def process_previsto_data(excel_creator):
     return df_linear, df_linear_trechos, df_localizada, df_ramais, df_economias
 
 
-def process_planejado_data(excel_creator):
+def process_planejado_data(excel_creator, resultado=None):
     """
     Processa os dados planejados e adiciona a planilha de erros ao Excel.
+    Se `resultado` for informado, apenas escreve a planilha.
     """
 
-    df_planejado = process_planejado(PLANEJADO_FILE)
+    df_planejado = process_planejado(PLANEJADO_FILE) if resultado is None else resultado
     excel_creator.add_dataframe(get_errors(df_planejado), sheet_name="Planejado")
     return df_planejado
 
 
-def main():
+def processar_em_paralelo(workers, cache_dir=None):
+    """
+    Executa a leitura e validação de Produção, Previsto e Planejado em
+    processos separados. Apenas os DataFrames resultantes voltam para o
+    processo principal, que fica responsável pela escrita do Excel.
+
+    Retorna uma tupla (producao, previsto, planejado) com os resultados de
+    process_production, process_previsto e process_planejado.
+    """
+    with ProcessPoolExecutor(max_workers=min(workers, 3)) as executor:
+        producao = executor.submit(process_production, PRODUCAO_FILE, cache_dir=cache_dir)
+        previsto = executor.submit(process_previsto, PREVISTO_FILE, cache_dir=cache_dir)
+        planejado = executor.submit(process_planejado, PLANEJADO_FILE)
+        return producao.result(), previsto.result(), planejado.result()
+
+
+@instrumentar('parquet')
+def salvar_parquet(diretorio, resultado_producao, resultado_previsto, df_planejado):
+    """
+    Grava todos os DataFrames processados (não apenas os erros) como datasets
+    Parquet em `diretorio` (ver json_para_df.saida_parquet). Produção e
+    Planejado são particionados pela coluna mes_ref de cada linha.
+    """
+    escrever_resultados(diretorio, TABELAS_PRODUCAO, resultado_producao)
+    escrever_resultados(diretorio, TABELAS_PREVISTO, resultado_previsto)
+    escrever_resultados(diretorio, [TABELA_PLANEJADO], [df_planejado])
+    print(f"Resultados gravados em Parquet em '{diretorio}'.")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Valida os JSON de Produção, Previsto e Planejado e gera o relatório de erros.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processos usados para Produção, Previsto e Planejado (1 = sequencial, até 3).")
+    parser.add_argument("--workers-contrato", type=int, default=1,
+                        help="Processos usados para validar os contratos de Produção e Previsto, um arquivo por vez "
+                             "(1 = sequencial, limitado ao número de núcleos). Não pode ser combinado com --workers.")
+    parser.add_argument("--cache", dest="cache_dir", default=None,
+                        help="Diretório do cache de validação: contratos sem alteração desde a última execução não são revalidados.")
+    parser.add_argument("--enderecos", action="store_true",
+                        help="Verifica os endereços de trechos e ramais da produção no cadastro do ArcGIS.")
+    parser.add_argument("--parquet", default=None,
+                        help="Diretório onde gravar todos os resultados (inclusive linhas sem erro) em Parquet, por mes_ref e contrato.")
+    parser.add_argument("--metricas", default=None,
+                        help="Diretório onde gravar o tempo, as linhas e os contadores de cada etapa (metricas.json e metricas.prom). "
+                             "Com --workers > 1, as etapas executadas nos processos auxiliares não são detalhadas.")
+    parser.add_argument("--metricas-memoria", action="store_true",
+                        help="Com --metricas, mede também o pico de memória de cada etapa (tracemalloc; deixa a execução mais lenta).")
+    args = parser.parse_args(argv)
+    # Cada processo de --workers abriria o seu próprio pool por contrato
+    if args.workers > 1 and args.workers_contrato > 1:
+        parser.error("use --workers ou --workers-contrato, não os dois.")
+    args.workers_contrato = max(1, min(args.workers_contrato, os.cpu_count() or 1))
+    return args
+
+
+def main(argv=None):
     """
     Função principal que orquestra o processamento dos dados e a geração do arquivo Excel.
     """
+    args = parse_args(argv)
+    if args.metricas:
+        instrumentacao.ativar(memoria=args.metricas_memoria)
+
     # Obtém a data atual para incluir no nome do arquivo
     current_datetime = datetime.now().strftime("%Y-%m-%d_%H-%M")
     output_file = f"Erros_json_{current_datetime}.xlsx"
@@ -161,9 +311,24 @@ def main():
     excel_creator = ExcelCreator(output_file)
     
     # Processa os dados de Produção, Previsto e Planejado
-    process_producao(excel_creator)
-    df_linear, df_linear_trechos, df_localizada, df_ramais, df_economias = process_previsto_data(excel_creator)
-    df_planejado = process_planejado_data(excel_creator)
+    resultado_producao = resultado_previsto = resultado_planejado = None
+    if args.workers > 1:
+        with medir('paralelo'):
+            resultado_producao, resultado_previsto, resultado_planejado = processar_em_paralelo(args.workers, args.cache_dir)
+
+    indice_enderecos = None
+    if args.enderecos:
+        with medir('indice_enderecos'):
+            indice_enderecos = carregar_indice_enderecos()
+    resultado_producao = process_producao(excel_creator, resultado_producao, args.cache_dir, indice_enderecos,
+                                          args.workers_contrato)
+    resultado_previsto = process_previsto_data(excel_creator, resultado_previsto, args.cache_dir,
+                                               args.workers_contrato)
+    df_linear, df_linear_trechos, df_localizada, df_ramais, df_economias = resultado_previsto
+    df_planejado = process_planejado_data(excel_creator, resultado_planejado)
+
+    if args.parquet:
+        salvar_parquet(args.parquet, resultado_producao, resultado_previsto, df_planejado)
 
     # pegar todos os conjuntos de contrato, codigo dos previstos e planejados
     df_codigos_previstos = pd.concat([df_linear, df_linear_trechos, df_localizada, df_ramais, df_economias], ignore_index=True)
@@ -184,6 +349,11 @@ def main():
     excel_creator.save()
     print(f"Arquivo '{output_file}' gerado com sucesso.")
 
+    if args.metricas:
+        instrumentacao.gravar_json(os.path.join(args.metricas, "metricas.json"))
+        instrumentacao.gravar_prometheus(os.path.join(args.metricas, "metricas.prom"))
+        print(f"Métricas da execução gravadas em '{args.metricas}'.")
+
 
 if __name__ == '__main__':
     main()
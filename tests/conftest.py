@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Fixtures compartilhadas: uma exportação sintética pequena (gerada com
+benchmarks/gerar_exportacoes.py, semente fixa e dois meses de referência) e
+o snapshot de contratos integra correspondente, para que process_previsto
+não dependa do banco de dados.
+"""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from benchmarks.gerar_exportacoes import ARQUIVOS, gerar  # noqa: E402
+
+TAMANHO_EXPORTACAO = 150 * 1024
+SEMENTE = 7
+
+
+@pytest.fixture(autouse=True)
+def _diretorio_raiz(monkeypatch):
+    # municipios.json é lido do diretório de trabalho
+    monkeypatch.chdir(RAIZ)
+
+
+@pytest.fixture(scope='session')
+def exportacao(tmp_path_factory):
+    """
+    Diretório com producao.json, previsto.json e planejado.json sintéticos.
+    Retorna um dicionário com os caminhos de cada arquivo e os parâmetros.
+    """
+    destino = tmp_path_factory.mktemp('exportacao')
+    parametros = gerar(str(destino), TAMANHO_EXPORTACAO, semente=SEMENTE, meses_ref=2)
+
+    from json_para_df import previsto
+    snapshot = destino / 'contratos_integra.json'
+    snapshot.write_text(json.dumps({'atualizado_em': time.time(), 'contratos': parametros['contratos_integra']}))
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(previsto, 'CAMINHO_SNAPSHOT_INTEGRA', str(snapshot))
+        mp.delitem(previsto._referencias, 'contratos_integra', raising=False)
+        yield {'parametros': parametros, **{nome: str(destino / arquivo) for nome, arquivo in ARQUIVOS.items()}}
+        previsto._referencias.pop('contratos_integra', None)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Consulta paginada de camadas ArcGIS contra um serviço falso (http.server em
+uma thread): ordem das páginas, novas tentativas e falhas definitivas. E o
+cache local das camadas, com arcgis._get_json substituído.
+"""
+
+import json
+import pickle
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import arcgis
+from arcgis import ErroConsultaArcGIS, consultar_arcgis_camada
+
+TOTAL = 10
+
+
+class ServicoFalso:
+    """
+    Camada com TOTAL registros. Sem orderByFields as páginas vêm em ordem
+    inversa, como pode acontecer em um serviço real sem ordenação explícita.
+    """
+    def __init__(self):
+        self.registros = [{'OBJECTID': i, 'NOME': f'r{i}'} for i in range(1, TOTAL + 1)]
+        self.max_record_count = 1000
+        self.falhas = {}        # offset -> quantidade de respostas 500 antes do sucesso
+        self.requisicoes = []   # parâmetros de cada requisição de página
+        self.trava = threading.Lock()
+
+    def responder(self, parametros):
+        if parametros.get('returnCountOnly') == 'true':
+            return 200, {'count': len(self.registros)}
+
+        offset = int(parametros['resultOffset'])
+        with self.trava:
+            self.requisicoes.append(parametros)
+            if self.falhas.get(offset, 0) > 0:
+                self.falhas[offset] -= 1
+                return 500, {}
+
+        registros = self.registros
+        if parametros.get('orderByFields') != 'OBJECTID':
+            registros = registros[::-1]
+        quantidade = min(int(parametros['resultRecordCount']), self.max_record_count)
+        pagina = registros[offset:offset + quantidade]
+        return 200, {'features': [{'attributes': registro} for registro in pagina]}
+
+
+@pytest.fixture
+def servico():
+    falso = ServicoFalso()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            consulta = urllib.parse.urlsplit(self.path).query
+            status, corpo = falso.responder(dict(urllib.parse.parse_qsl(consulta)))
+            dados = json.dumps(corpo).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=servidor.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+    thread.start()
+    falso.url = f'http://127.0.0.1:{servidor.server_address[1]}/FeatureServer/0'
+    yield falso
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def consultar(servico, **kwargs):
+    return consultar_arcgis_camada(servico.url, batch_size=4, verbose=False, backoff=0, **kwargs)
+
+
+@pytest.mark.parametrize('max_workers', [1, 3])
+def test_paginas_ordenadas_por_objectid(servico, max_workers):
+    df = consultar(servico, max_workers=max_workers)
+
+    assert df['OBJECTID'].tolist() == list(range(1, TOTAL + 1))
+    assert servico.requisicoes
+    assert all(parametros['orderByFields'] == 'OBJECTID' for parametros in servico.requisicoes)
+
+
+@pytest.mark.parametrize('max_workers', [1, 3])
+def test_nova_tentativa_apos_erro_500(servico, max_workers):
+    servico.falhas[4] = 1
+    df = consultar(servico, max_workers=max_workers, retries=2)
+
+    assert df['OBJECTID'].tolist() == list(range(1, TOTAL + 1))
+    assert [int(p['resultOffset']) for p in servico.requisicoes].count(4) == 2
+
+
+@pytest.mark.parametrize('max_workers', [1, 3])
+def test_falha_definitiva_interrompe_a_consulta(servico, max_workers):
+    servico.falhas[4] = 10
+    with pytest.raises(ErroConsultaArcGIS, match='após 2 tentativas'):
+        consultar(servico, max_workers=max_workers, retries=1)
+
+
+def test_quantidade_divergente_em_paralelo(servico):
+    # Serviço com limite por consulta menor que batch_size
+    servico.max_record_count = 3
+    with pytest.raises(ErroConsultaArcGIS, match=f'Esperados {TOTAL} registros, recebidos 8'):
+        consultar(servico, max_workers=3)
+
+
+# =============================================================================
+# Cache local das camadas (consultar_camada_em_cache)
+# =============================================================================
+class CamadaFalsa:
+    """
+    Substituto de arcgis._get_json: responde às consultas (where simplificado)
+    a partir de `registros` e guarda as cláusulas WHERE recebidas.
+    """
+    def __init__(self, registros):
+        self.registros = registros
+        self.consultas = []
+        self.falhar = False
+
+    def __call__(self, session, url, timeout, retries, backoff):
+        parametros = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+        if self.falhar:
+            raise ErroConsultaArcGIS('serviço indisponível')
+
+        where = parametros['where']
+        if 'resultOffset' not in parametros or parametros['resultOffset'] == '0':
+            self.consultas.append(where)
+        registros = [r for r in self.registros if self._atende(r, where)]
+        if parametros.get('returnCountOnly') == 'true':
+            return {'count': len(registros)}
+        offset, quantidade = int(parametros['resultOffset']), int(parametros['resultRecordCount'])
+        return {'features': [{'attributes': r} for r in registros[offset:offset + quantidade]]}
+
+    @staticmethod
+    def _atende(registro, where):
+        if 'EditDate >=' in where:
+            return registro['EditDate'] >= EDICAO_SNAPSHOT
+        if 'OBJECTID >' in where:
+            return registro['OBJECTID'] > int(where.rsplit('>', 1)[1])
+        return True
+
+
+# Datas de edição em milissegundos UTC, como no ArcGIS
+EDICAO_SNAPSHOT = 1_700_000_000_000
+EDICAO_NOVA = EDICAO_SNAPSHOT + 3_600_000
+
+
+def _registros(com_edicao=True):
+    registros = [{'OBJECTID': i, 'NOME': f'r{i}', 'EditDate': EDICAO_SNAPSHOT - 1000 * i} for i in (1, 2, 3)]
+    registros[0]['EditDate'] = EDICAO_SNAPSHOT
+    if not com_edicao:
+        for registro in registros:
+            del registro['EditDate']
+    return registros
+
+
+@pytest.fixture
+def camada(monkeypatch, tmp_path):
+    monkeypatch.setattr(arcgis, 'ARCGIS_CACHE_DIR', str(tmp_path))
+    falsa = CamadaFalsa(_registros())
+    monkeypatch.setattr(arcgis, '_get_json', falsa)
+    return falsa
+
+
+def consultar_cache(**kwargs):
+    return arcgis.consultar_camada_em_cache('https://servico/FeatureServer/0', verbose=False, **kwargs)
+
+
+def _snapshot():
+    with open(arcgis._caminho_cache('https://servico/FeatureServer/0', '1=1', None), 'rb') as f:
+        return pickle.load(f)
+
+
+def test_cache_dentro_do_ttl_nao_consulta(camada):
+    primeiro = consultar_cache()
+    assert camada.consultas == ['1=1']
+
+    segundo = consultar_cache()
+    assert camada.consultas == ['1=1']
+    pd.testing.assert_frame_equal(primeiro, segundo)
+
+
+@pytest.mark.parametrize('com_edicao', [True, False], ids=['EditDate', 'OBJECTID'])
+def test_atualizacao_incremental_mescla_pelo_id(camada, com_edicao):
+    camada.registros = _registros(com_edicao)
+    consultar_cache()
+    atualizado_em = _snapshot()['atualizado_em']
+
+    # Registro 1 editado e registro 4 criado no serviço
+    camada.registros[0] = {**camada.registros[0], 'NOME': 'r1 editado'}
+    novo = {'OBJECTID': 4, 'NOME': 'r4'}
+    if com_edicao:
+        camada.registros[0]['EditDate'] = novo['EditDate'] = EDICAO_NOVA
+    camada.registros.append(novo)
+
+    df = consultar_cache(ttl=0)
+
+    filtro = "EditDate >= TIMESTAMP" if com_edicao else "OBJECTID > 3"
+    assert filtro in camada.consultas[-1]
+    assert sorted(df['OBJECTID']) == [1, 2, 3, 4]
+    assert df['OBJECTID'].is_unique
+    nomes = dict(zip(df['OBJECTID'], df['NOME']))
+    assert nomes[4] == 'r4'
+    if com_edicao:
+        assert nomes[1] == 'r1 editado'
+    assert _snapshot()['atualizado_em'] > atualizado_em
+
+
+@pytest.mark.parametrize('ttl_completo', [arcgis.TTL_CACHE_COMPLETO, 0], ids=['incremental', 'completa'])
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_falha_na_atualizacao_usa_o_snapshot(camada, capsys, max_workers, ttl_completo):
+    esperado = consultar_cache()
+    snapshot = _snapshot()
+
+    camada.falhar = True
+    df = consultar_cache(ttl=0, ttl_completo=ttl_completo, max_workers=max_workers)
+
+    pd.testing.assert_frame_equal(df, esperado)
+    assert 'Falha ao atualizar a camada' in capsys.readouterr().out
+    assert _snapshot()['atualizado_em'] == snapshot['atualizado_em']
+
+
+def test_falha_sem_snapshot_propaga_o_erro(camada):
+    camada.falhar = True
+    with pytest.raises(ErroConsultaArcGIS):
+        consultar_cache()
+
+
+def test_recarga_completa_descarta_excluidos(camada):
+    consultar_cache()
+    completo_em = _snapshot()['completo_em']
+    del camada.registros[1]
+
+    df = consultar_cache(ttl=0, ttl_completo=0)
+
+    assert camada.consultas[-1] == '1=1'
+    assert df['OBJECTID'].tolist() == [1, 3]
+    assert _snapshot()['completo_em'] > completo_em
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pool de conexões e cache de consultas (bd.py), com conexões SQLite em
+memória no lugar do SQL Server.
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from bd import CacheConsultas, PoolConexoes
+
+CONSULTA = "SELECT ? AS contrato, 1 AS integra"
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+class Fabrica:
+    """
+    Cria conexões SQLite e guarda as conexões criadas.
+    """
+    def __init__(self):
+        self.conexoes = []
+
+    def __call__(self):
+        conexao = sqlite3.connect(':memory:', check_same_thread=False)
+        self.conexoes.append(conexao)
+        return conexao
+
+
+def test_pool_reaproveita_conexoes():
+    fabrica = Fabrica()
+    pool = PoolConexoes(fabrica, tamanho_maximo=2)
+    for _ in range(3):
+        with pool.conexao() as conexao:
+            conexao.execute("SELECT 1")
+    assert len(fabrica.conexoes) == 1
+
+
+def test_pool_esgotado_falha_apos_timeout():
+    pool = PoolConexoes(Fabrica(), tamanho_maximo=1, timeout=0.05)
+    with pool.conexao():
+        with pytest.raises(TimeoutError):
+            with pool.conexao():
+                pass
+    # Com a conexão devolvida, o pool volta a atender
+    with pool.conexao() as conexao:
+        assert conexao.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_pool_esgotado_atende_quando_uma_conexao_volta():
+    pool = PoolConexoes(Fabrica(), tamanho_maximo=1, timeout=5)
+    emprestada = threading.Event()
+    devolver = threading.Event()
+
+    def segurar():
+        with pool.conexao():
+            emprestada.set()
+            devolver.wait()
+
+    thread = threading.Thread(target=segurar)
+    thread.start()
+    emprestada.wait()
+    threading.Timer(0.05, devolver.set).start()
+    with pool.conexao() as conexao:
+        assert conexao.execute("SELECT 1").fetchone() == (1,)
+    thread.join()
+
+
+def test_conexao_com_erro_e_descartada():
+    fabrica = Fabrica()
+    pool = PoolConexoes(fabrica, tamanho_maximo=1)
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.conexao() as conexao:
+            conexao.execute("SELECT * FROM tabela_inexistente")
+
+    # A conexão com erro foi fechada e não volta ao pool
+    with pytest.raises(sqlite3.ProgrammingError):
+        fabrica.conexoes[0].execute("SELECT 1")
+    with pool.conexao() as conexao:
+        assert conexao is fabrica.conexoes[1]
+
+
+def test_cache_expira_e_remove_resultados():
+    fabrica = Fabrica()
+    relogio = Relogio()
+    cache = CacheConsultas(PoolConexoes(fabrica), ttl=10, relogio=relogio)
+
+    df = cache.consultar(CONSULTA, ['00013/24'])
+    assert df.to_dict('records') == [{'contrato': '00013/24', 'integra': 1}]
+    df.loc[0, 'contrato'] = 'alterado'  # o cache devolve cópias
+    assert cache.consultar(CONSULTA, ['00013/24'])['contrato'][0] == '00013/24'
+
+    relogio.agora = 10
+    cache.consultar(CONSULTA, ['00014/24'])
+    # O resultado expirado é removido na inserção seguinte
+    assert len(cache) == 1
+
+
+def test_cache_limita_entradas():
+    cache = CacheConsultas(PoolConexoes(Fabrica()), ttl=100, maximo_entradas=2, relogio=Relogio())
+    for contrato in ['a', 'b', 'a', 'c']:
+        cache.consultar(CONSULTA, [contrato])
+    assert len(cache) == 2
+    assert set(chave[1][0] for chave in cache._resultados) == {'a', 'c'}
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cache dos índices de erros usados pelo app (json_para_df.consulta_erros).
+"""
+
+import pandas as pd
+
+from json_para_df.consulta_erros import CacheIndices, IndiceErros
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def _indices(linhas):
+    df = pd.DataFrame({'contrato': ['c'] * linhas, 'codigo': [str(i) for i in range(linhas)],
+                       'errors': [['Campo: x, valor negativo']] * linhas, 'is_ok': [False] * linhas})
+    return (IndiceErros(df),)
+
+
+def test_entrada_expira_apos_ttl():
+    relogio = Relogio()
+    cache = CacheIndices(ttl=10, limite_bytes=10**9, relogio=relogio)
+    montagens = []
+
+    def montar():
+        montagens.append(1)
+        return _indices(10)
+
+    primeiro = cache.obter('a', montar)
+    relogio.agora = 9
+    assert cache.obter('a', montar) is primeiro
+    relogio.agora = 10
+    assert cache.obter('a', montar) is not primeiro
+    assert len(montagens) == 2
+
+
+def test_limite_de_memoria_descarta_as_menos_usadas():
+    tamanho = _indices(1000)[0].memoria()
+    cache = CacheIndices(ttl=100, limite_bytes=int(tamanho * 2.5), relogio=Relogio())
+    montadas = []
+
+    def obter(chave, linhas=1000):
+        def montar():
+            montadas.append(chave)
+            return _indices(linhas)
+        return cache.obter(chave, montar)
+
+    obter('a')
+    obter('b')
+    obter('a')  # 'a' passa a ser a mais recente
+    obter('c')
+    assert len(cache) == 2
+    assert cache.memoria <= cache.limite_bytes
+    obter('a')
+    assert montadas == ['a', 'b', 'c']
+    obter('b')  # 'b' foi descartada e é remontada
+    assert montadas == ['a', 'b', 'c', 'b']
+
+    # Uma entrada maior que o limite é mantida sozinha
+    grande = obter('d', 10000)
+    assert len(cache) == 1 and obter('d') is grande
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Verificação dos endereços da produção no cadastro do ArcGIS
+(json_para_df.enderecos), com endereços reais de uma exportação.
+"""
+
+import json
+import os
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from json_para_df.enderecos import (INCOMPLETO, MESMO_WBS, NAO_ENCONTRADO, OUTRO_WBS, IndiceEnderecos,
+                                    carregar_indice_enderecos)
+
+AMOSTRA = os.path.join('FILTRO MENSAL', 'JSON 202508', 'producao-2025-08-04.json')
+
+# Tipos de logradouro como aparecem na produção e por extenso, como no cadastro
+TIPOS_CADASTRO = {'r.': 'RUA', 'r': 'RUA', 'av.': 'AVENIDA', 'estr.': 'ESTRADA', 'tv.': 'TRAVESSA',
+                  'rod.': 'RODOVIA'}
+
+
+def _cadastro(municipio, bairro, logradouro, wbs=None):
+    return {'MUNICIPIO': municipio, 'BAIRRO': bairro, 'LOGRADOURO': logradouro, 'WBS_TEXT': wbs}
+
+
+def _sem_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+
+@pytest.fixture(scope='module')
+def enderecos_reais():
+    """
+    Pares (codigo, endereco) distintos dos detalhes da exportação de amostra.
+    """
+    with open(AMOSTRA, encoding='utf-8') as f:
+        dados = json.load(f)
+    pares = {(item.get('codigo'), detalhe['endereco'])
+             for bloco in dados for contrato in bloco['producao'] for item in contrato.get('itens', [])
+             for detalhe in item.get('producao', []) if detalhe.get('endereco')}
+    return pd.DataFrame(sorted(pares), columns=['codigo', 'endereco'])
+
+
+def test_numero_e_tipo_do_logradouro_nao_impedem_a_busca():
+    indice = IndiceEnderecos.de_dataframe(pd.DataFrame([
+        _cadastro('SAO PAULO', 'CJ HAB VOITH', 'RUA CAMILLO ZANOTTI', '1.01.02'),
+        _cadastro('GUARULHOS', 'ITAPEGICA', 'R BRASILEIRA'),
+        _cadastro('ITAPECERICA DA SERRA', 'SAO PEDRO', 'ESTRADA JOAO RODRIGUES DE MORAES'),
+    ]))
+    df = pd.DataFrame({
+        'codigo': ['1.01.02', '9.99', '9.99', '9.99', '9.99', '9.99', '9.99', '9.99'],
+        'endereco': [
+            'SÃO PAULO, CJ HAB VOITH, Rua Camillo Zanotti, 299',
+            'São Paulo, CJ HAB VOITH, R. Camillo Zanotti, 12a',
+            'GUARULHOS, ITAPEGICA, R. Brasileira, 576',
+            'ITAPECERICA DA SERRA, SAO PEDRO, Estr. João Rodrigues De Moraes, 250',
+            'GUARULHOS, R. Brasileira, 10',
+            'MAIRIPORÃ, JARDIM SPADA, R. Angela Cristina, 13',
+            'SÃO PAULO, PARADA INGLESA',
+            None,
+        ],
+    })
+    assert indice.verificar(df).tolist() == [MESMO_WBS, OUTRO_WBS, OUTRO_WBS, OUTRO_WBS, OUTRO_WBS,
+                                             NAO_ENCONTRADO, INCOMPLETO, None]
+
+
+def test_enderecos_reais_encontrados_no_cadastro(enderecos_reais):
+    """
+    Monta um cadastro no formato do ArcGIS (maiúsculas, sem acentos, tipo
+    por extenso e sem número) a partir de metade dos endereços reais
+    completos: todos eles devem ser encontrados, no mesmo WBS.
+    """
+    linhas = []
+    no_cadastro = []
+    for i, (codigo, endereco) in enumerate(enderecos_reais.itertuples(index=False)):
+        partes = [parte.strip() for parte in endereco.split(',')]
+        if len(partes) != 4 or not partes[3].isdigit():
+            no_cadastro.append(False)
+            continue
+        municipio, bairro, logradouro, _ = partes
+        tipo, _, nome = logradouro.partition(' ')
+        if tipo.lower() not in TIPOS_CADASTRO or i % 2:
+            no_cadastro.append(False)
+            continue
+        logradouro = TIPOS_CADASTRO[tipo.lower()] + ' ' + nome
+        linhas.append(_cadastro(*(_sem_acentos(parte).upper() for parte in (municipio, bairro, logradouro)),
+                                codigo))
+        no_cadastro.append(True)
+    no_cadastro = np.array(no_cadastro)
+    assert no_cadastro.sum() > 1000
+
+    situacao = IndiceEnderecos.de_dataframe(pd.DataFrame(linhas)).verificar(enderecos_reais).to_numpy()
+    assert (situacao[no_cadastro] == MESMO_WBS).all()
+    assert INCOMPLETO in set(situacao[~no_cadastro])
+    # Os endereços sem logradouro nunca são apontados como não encontrados
+    so_municipio = enderecos_reais['endereco'].str.count(',').to_numpy() == 0
+    assert (situacao[so_municipio] == INCOMPLETO).all()
+
+
+def test_indice_de_versao_anterior_e_refeito(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'indice.npz')
+    np.savez(caminho, enderecos=np.zeros(1, dtype=np.uint64), pares=np.zeros(1, dtype=np.uint64))
+    assert IndiceEnderecos.carregar(caminho) is None
+
+    cadastro = pd.DataFrame([_cadastro('SAO PAULO', 'X', 'RUA UM')])
+    monkeypatch.setattr('json_para_df.enderecos.create_enderecos_df', lambda: cadastro)
+    indice = carregar_indice_enderecos(caminho)
+    assert len(indice.enderecos) == 1
+    assert len(IndiceEnderecos.carregar(caminho).enderecos) == 1
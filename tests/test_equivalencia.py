@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Os modos de processamento (sequencial, streaming, por contrato em processos
+separados e com cache de validação) devem produzir exatamente os mesmos
+DataFrames. São as mesmas verificações que benchmarks/executar.py faz contra
+a baseline, aqui sobre uma exportação sintética pequena.
+"""
+
+import pandas as pd
+import pytest
+
+from benchmarks.executar import assinatura_dataframe
+from json_para_df.planejado import process_planejado
+from json_para_df.previsto import process_previsto
+from json_para_df.producao import process_production
+
+# Pequeno o bastante para que a exportação de teste gere vários blocos
+TAMANHO_BLOCO = 500
+
+PROCESSAMENTOS = {
+    'producao': process_production,
+    'previsto': process_previsto,
+}
+
+
+def assert_resultados_iguais(esperado, obtido):
+    esperado = esperado if isinstance(esperado, tuple) else (esperado,)
+    obtido = obtido if isinstance(obtido, tuple) else (obtido,)
+    assert len(esperado) == len(obtido)
+    for df_esperado, df_obtido in zip(esperado, obtido):
+        pd.testing.assert_frame_equal(df_esperado, df_obtido)
+        assert assinatura_dataframe(df_esperado) == assinatura_dataframe(df_obtido)
+
+
+@pytest.fixture(scope='module')
+def sequencial(exportacao):
+    resultados = {nome: processar(exportacao[nome]) for nome, processar in PROCESSAMENTOS.items()}
+    resultados['planejado'] = process_planejado(exportacao['planejado'])
+    return resultados
+
+
+@pytest.mark.parametrize('nome', sorted(PROCESSAMENTOS))
+def test_resultado_tem_linhas_com_e_sem_erro(sequencial, nome):
+    for df in sequencial[nome]:
+        if not df.empty:
+            assert df['is_ok'].any()
+    assert any((~df['is_ok']).any() for df in sequencial[nome] if not df.empty)
+
+
+@pytest.mark.parametrize('nome', sorted(PROCESSAMENTOS))
+def test_streaming_igual_ao_sequencial(exportacao, sequencial, nome):
+    obtido = PROCESSAMENTOS[nome](exportacao[nome], streaming=True, tamanho_bloco=TAMANHO_BLOCO)
+    assert_resultados_iguais(sequencial[nome], obtido)
+
+
+@pytest.mark.parametrize('nome', sorted(PROCESSAMENTOS))
+def test_por_contrato_igual_ao_sequencial(exportacao, sequencial, nome):
+    obtido = PROCESSAMENTOS[nome](exportacao[nome], workers=2)
+    assert_resultados_iguais(sequencial[nome], obtido)
+
+
+@pytest.mark.parametrize('nome', sorted(PROCESSAMENTOS))
+@pytest.mark.parametrize('workers', [1, 2])
+def test_cache_igual_ao_sequencial(exportacao, sequencial, tmp_path, nome, workers):
+    # Primeira execução preenche o cache; a segunda reaproveita todos os contratos
+    for _ in range(2):
+        obtido = PROCESSAMENTOS[nome](exportacao[nome], workers=workers, cache_dir=str(tmp_path))
+        assert_resultados_iguais(sequencial[nome], obtido)
+
+
+def test_planejado_streaming_igual_ao_sequencial(exportacao, sequencial):
+    obtido = process_planejado(exportacao['planejado'], streaming=True, tamanho_bloco=TAMANHO_BLOCO)
+    assert_resultados_iguais(sequencial['planejado'], obtido)
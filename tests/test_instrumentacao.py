@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Instrumentação das etapas: nomes aninhados, linhas, formato textfile do
+Prometheus e ausência de registros com a instrumentação desligada.
+"""
+
+import json
+import re
+
+import pytest
+
+from json_para_df import instrumentacao
+from json_para_df.instrumentacao import contar, instrumentar, medir
+from json_para_df.planejado import process_planejado
+
+PREFIXO = instrumentacao.PREFIXO_PROMETHEUS
+
+# Amostra do formato de exposição: nome{rotulo="valor"} numero
+AMOSTRA = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*"\})? -?[0-9.e+-]+$')
+
+
+@pytest.fixture(autouse=True)
+def _instrumentacao_limpa():
+    instrumentacao.desativar()
+    instrumentacao.reiniciar()
+    yield
+    instrumentacao.desativar()
+    instrumentacao.reiniciar()
+
+
+@instrumentar('teste')
+def processar(linhas):
+    with medir('extracao', len(linhas)):
+        extraidas = [linha * 2 for linha in linhas]
+    with medir('validacao') as medida:
+        medida.adicionar_linhas(len(extraidas))
+        contar('validadas', len(extraidas))
+    return extraidas
+
+
+def test_desligada_nao_registra():
+    assert processar([1, 2, 3]) == [2, 4, 6]
+
+    dados = instrumentacao.resumo()
+    assert dados['etapas'] == {}
+    assert dados['contadores'] == {}
+    assert dados['inicio'] is None
+
+
+def test_etapas_aninhadas_e_linhas():
+    instrumentacao.ativar()
+    processar([1, 2, 3])
+    processar([4, 5])
+
+    etapas = instrumentacao.resumo()['etapas']
+    assert set(etapas) == {'teste', 'teste/extracao', 'teste/validacao'}
+    assert {nome: dados['chamadas'] for nome, dados in etapas.items()} == dict.fromkeys(etapas, 2)
+    assert etapas['teste']['linhas'] is None
+    assert etapas['teste/extracao']['linhas'] == 5
+    assert etapas['teste/validacao']['linhas'] == 5
+    assert instrumentacao.resumo()['contadores'] == {'validadas': 5}
+
+    # Depois de desligada, nada mais é acumulado
+    instrumentacao.desativar()
+    processar([6])
+    assert instrumentacao.resumo()['etapas']['teste/extracao']['linhas'] == 5
+
+
+def test_formato_prometheus(tmp_path):
+    instrumentacao.ativar()
+    processar([1, 2, 3])
+    caminho = tmp_path / 'metricas' / 'metricas.prom'
+    instrumentacao.gravar_prometheus(str(caminho))
+
+    texto = caminho.read_text(encoding='utf-8')
+    assert texto.endswith('\n')
+    declaradas = set()
+    for linha in texto.splitlines():
+        if linha.startswith('# HELP ') or linha.startswith('# TYPE '):
+            _, tipo, nome, resto = linha.split(' ', 3)
+            if tipo == 'TYPE':
+                assert resto == 'gauge'
+                declaradas.add(nome)
+            continue
+        assert AMOSTRA.match(linha), linha
+        # Toda amostra vem depois do TYPE da sua métrica
+        assert re.split(r'[{ ]', linha, maxsplit=1)[0] in declaradas, linha
+
+    assert f'{PREFIXO}_etapa_linhas{{etapa="teste/extracao"}} 3' in texto
+    assert f'{PREFIXO}_etapa_chamadas{{etapa="teste"}} 1' in texto
+    assert f'{PREFIXO}_contador{{nome="validadas"}} 3' in texto
+    assert f'{PREFIXO}_etapa_pico_memoria_bytes' not in texto
+    assert f'{PREFIXO}_execucao_segundos ' in texto
+
+
+def test_gravar_json(tmp_path):
+    instrumentacao.ativar(memoria=True)
+    processar(list(range(1000)))
+    caminho = tmp_path / 'metricas.json'
+    instrumentacao.gravar_json(str(caminho))
+
+    dados = json.loads(caminho.read_text(encoding='utf-8'))
+    assert dados['memoria'] is True
+    assert dados['etapas']['teste/extracao']['pico_bytes'] > 0
+
+
+def test_etapas_do_planejado(exportacao):
+    instrumentacao.ativar()
+    df = process_planejado(exportacao['planejado'])
+
+    etapas = instrumentacao.resumo()['etapas']
+    assert {'planejado', 'planejado/carregar_json', 'planejado/extracao', 'planejado/dataframe',
+            'planejado/validacao'} <= set(etapas)
+    for nome in ('extracao', 'dataframe', 'validacao'):
+        assert etapas[f'planejado/{nome}']['linhas'] == len(df)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Opções de linha de comando de main.py.
+"""
+
+import pytest
+
+import main
+
+
+def test_workers_e_workers_contrato_nao_combinam():
+    with pytest.raises(SystemExit):
+        main.parse_args(['--workers', '3', '--workers-contrato', '2'])
+
+
+def test_workers_contrato_limitado_aos_nucleos(monkeypatch):
+    monkeypatch.setattr(main.os, 'cpu_count', lambda: 4)
+    assert main.parse_args(['--workers-contrato', '16']).workers_contrato == 4
+    assert main.parse_args(['--workers-contrato', '2']).workers_contrato == 2
+    assert main.parse_args([]).workers_contrato == 1
+
+
+def test_workers_contrato_chega_ao_processamento(monkeypatch, exportacao, tmp_path):
+    chamadas = {}
+
+    def registrar(processar):
+        def funcao(caminho, **kwargs):
+            chamadas[processar.__name__] = kwargs['workers']
+            return processar(caminho, **kwargs)
+        return funcao
+
+    monkeypatch.setattr(main, 'PRODUCAO_FILE', exportacao['producao'])
+    monkeypatch.setattr(main, 'PREVISTO_FILE', exportacao['previsto'])
+    monkeypatch.setattr(main, 'process_production', registrar(main.process_production))
+    monkeypatch.setattr(main, 'process_previsto', registrar(main.process_previsto))
+
+    excel = main.ExcelCreator(str(tmp_path / 'erros.xlsx'))
+    main.process_producao(excel, workers=2)
+    main.process_previsto_data(excel, workers=2)
+    excel.save()
+    assert chamadas == {'process_production': 2, 'process_previsto': 2}
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Enriquecimento dos registros previstos com o município do código WBS.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from json_para_df.previsto import enriquecer_municipios
+
+MUNICIPIOS = pd.DataFrame({'cod': ['100', '200'], 'Municipio': ['São Paulo', 'Santos']})
+
+
+def test_enriquecer_municipios_com_codigos_de_texto():
+    df = pd.DataFrame({'contrato': ['A', 'A', 'B', 'A'],
+                       'codigo': ['WBS-00000000100', 'WBS-00000000200', 'WBS-00000000100', 'curto']})
+    resultado = enriquecer_municipios(df, ['A'], MUNICIPIOS)
+
+    assert resultado['integra'].tolist() == [True, True, False, True]
+    assert resultado['cod'].tolist() == ['100', '200', '', '']
+    assert resultado['Municipio'].tolist()[:2] == ['São Paulo', 'Santos']
+    assert resultado['Municipio'].iloc[2:].isna().all()
+
+
+@pytest.mark.parametrize('codigos', [
+    [None, None, None],
+    [np.nan, np.nan, np.nan],
+    [1234567890123456, 2.5, 7],
+    [None, 1234567890123456, 'WBS-00000000200'],
+], ids=['nulos', 'nan', 'numeros', 'misturados'])
+def test_enriquecer_municipios_com_codigos_que_nao_sao_texto(codigos):
+    df = pd.DataFrame({'contrato': ['A', 'A', 'A'], 'codigo': codigos})
+    resultado = enriquecer_municipios(df, ['A'], MUNICIPIOS)
+
+    esperado = [codigo[12:15] if isinstance(codigo, str) else '' for codigo in codigos]
+    assert resultado['cod'].tolist() == esperado
+    assert resultado['Municipio'].notna().tolist() == [cod == '200' for cod in esperado]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Gravação e leitura dos resultados em Parquet (json_para_df.saida_parquet).
+"""
+
+import pandas as pd
+import pyarrow.compute as pc
+import pytest
+
+from benchmarks.executar import assinatura_dataframe
+from json_para_df.planejado import process_planejado
+from json_para_df.previsto import process_previsto
+from json_para_df.producao import process_production
+from json_para_df.saida_parquet import (TABELA_PLANEJADO, TABELAS_PREVISTO, TABELAS_PRODUCAO, escrever_resultados,
+                                        ler_tabela)
+
+
+@pytest.fixture(scope='module')
+def producao(exportacao):
+    return process_production(exportacao['producao'])
+
+
+def test_producao_tem_mes_ref_de_cada_bloco(exportacao, producao):
+    meses = {'jan/25', 'fev/25'}
+    assert exportacao['parametros']['meses_ref'] == len(meses)
+    for df in producao:
+        assert list(df.columns[:2]) == ['mes_ref', 'contrato']
+        assert set(df['mes_ref']) == meses
+
+
+def test_particiona_pelo_mes_ref_de_cada_linha(exportacao, producao, tmp_path):
+    planejado = process_planejado(exportacao['planejado'])
+    escrever_resultados(str(tmp_path), TABELAS_PRODUCAO, producao)
+    escrever_resultados(str(tmp_path), [TABELA_PLANEJADO], [planejado])
+
+    for nome, df in [*zip(TABELAS_PRODUCAO, producao), (TABELA_PLANEJADO, planejado)]:
+        for mes_ref, esperado in df.groupby('mes_ref'):
+            lido = ler_tabela(str(tmp_path), nome, filtro=pc.field('mes_ref') == mes_ref)
+            assert len(lido) == len(esperado)
+            assert set(lido['mes_ref']) == {mes_ref}
+            assert sorted(lido['codigo']) == sorted(esperado['codigo'])
+
+
+@pytest.mark.parametrize('nome', ['producao', 'previsto', 'planejado'])
+def test_leitura_devolve_o_dataframe_gravado(exportacao, producao, tmp_path, nome):
+    tabelas, nomes = {
+        'producao': lambda: (producao, TABELAS_PRODUCAO),
+        'previsto': lambda: (process_previsto(exportacao['previsto']), TABELAS_PREVISTO),
+        'planejado': lambda: ((process_planejado(exportacao['planejado']),), (TABELA_PLANEJADO,)),
+    }[nome]()
+    escrever_resultados(str(tmp_path), nomes, tabelas)
+    for nome_tabela, df in zip(nomes, tabelas):
+        if not df.empty:
+            lido = ler_tabela(str(tmp_path), nome_tabela)
+            pd.testing.assert_frame_equal(lido, df)
+            assert assinatura_dataframe(lido) == assinatura_dataframe(df)
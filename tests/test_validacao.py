@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A validação linha a linha (validate() das entidades e Campo.validar, com os
+validadores gerados por compilar_validador) e a validação por coluna
+(dataframe_validado) devem gerar os mesmos erros, na mesma ordem.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from json_para_df import planejado, previsto, producao
+from json_para_df.validacao import dataframe_validado, validador_do_campo
+
+CLASSES = [producao.Item, producao.Trecho, producao.Localizada, producao.Ramal,
+           previsto.Linear, previsto.Trecho, previsto.Localizada, previsto.Ramal, previsto.Economia]
+
+# Valores válidos e inválidos para campos de texto e numéricos
+VALORES = [None, np.nan, pd.NA, '', '   ', 'x', 'PVC', 'VCA', 'RCE', '12', -1, -0.0004, -0.0006, 0, 1.5, 3,
+           True, np.int64(-2), np.float64(2.5), np.float64('nan'), np.bool_(False), np.str_('RD'), pd.NaT,
+           [1], {'id': 1}]
+
+
+def _registros(classe):
+    """
+    Objetos da classe sem passar pelo construtor, combinando os VALORES nos
+    campos (cada valor aparece em todos os campos).
+    """
+    registros = []
+    for deslocamento in range(len(VALORES)):
+        obj = object.__new__(classe)
+        for i, campo in enumerate(classe.CAMPOS):
+            setattr(obj, campo.nome, VALORES[(deslocamento + i * 7) % len(VALORES)])
+        registros.append(obj)
+    return registros
+
+
+@pytest.mark.parametrize('classe', CLASSES, ids=lambda c: f'{c.__module__}.{c.__name__}')
+def test_validate_igual_a_validacao_por_coluna(classe):
+    registros = _registros(classe)
+    linhas = [{campo.nome: getattr(obj, campo.nome) for campo in classe.CAMPOS} for obj in registros]
+    df = dataframe_validado(linhas, classe.CAMPOS)
+
+    assert not df['is_ok'].all()
+    for obj, erros, is_ok in zip(registros, df['errors'], df['is_ok']):
+        assert obj.validate() == (erros, is_ok)
+
+
+def test_validar_campo_igual_a_validacao_por_coluna():
+    campos = planejado.CAMPOS_PLANEJADO
+    linhas = [{campo.nome: VALORES[(i + j * 7) % len(VALORES)] for j, campo in enumerate(campos)}
+              for i in range(len(VALORES))]
+    df = dataframe_validado(linhas, campos)
+    for linha, erros in zip(linhas, df['errors']):
+        assert [erro for campo in campos for erro in campo.validar(linha[campo.nome])] == erros
+
+
+@pytest.mark.parametrize('campo', [campo for classe in CLASSES for campo in classe.CAMPOS] + planejado.CAMPOS_PLANEJADO,
+                         ids=lambda c: f'{type(c).__module__}.{c.nome}')
+def test_validar_valor_isolado_igual_a_coluna(campo):
+    for valor in VALORES:
+        df = dataframe_validado([{campo.nome: valor}], [campo])
+        assert campo.validar(valor) == df['errors'][0], valor
+
+
+@pytest.mark.parametrize('classe', CLASSES, ids=lambda c: f'{c.__module__}.{c.__name__}')
+def test_validadores_gerados_uma_vez(classe):
+    assert 'def validar_' in classe._validar.fonte
+    campo = classe.CAMPOS[0]
+    campo.validar(None)
+    assert validador_do_campo(campo) is validador_do_campo(campo)
+
+
+@pytest.mark.parametrize('valor', [-1, '-1', None, 'abc', [1]])
+def test_negativo_em_texto_e_erro_de_tipo(valor):
+    campo = producao.Campo('executado', float, True)
+    erros = campo.validar(valor)
+    df = dataframe_validado([{'executado': valor}], [campo])
+    assert erros == df['errors'][0]
+    if isinstance(valor, str):
+        assert [erro['erro'] for erro in erros] == [f"Valo com tipo {str}, mas deveria ser {float}"]